@@ -1,129 +1,637 @@
-from flask import Flask, request, jsonify
-from database.db_setup import db, Transaction
-from fraud_detection.ml_model import predict_fraud
+from flask import Flask, Response, request, jsonify
+from database.db_setup import db, FeedState, Transaction
+from database.migrations import run_migrations
+from database import rollups
+from fraud_detection.ml_model import predict_fraud, predict_fraud_batch, card_state, velocity_engine
+from fraud_detection import ml_model
+from fraud_detection.velocity import WINDOWS
+from serving.micro_batcher import MicroBatcher
+from serving.write_behind import WriteBehindWriter
+from serving.broadcaster import Broadcaster
+from serving.dedup import DedupIndex
+from serving.model_watcher import ModelWatcher
+from serving.shadow import ShadowScorer
+import config
+from sqlalchemy import func, text
+from sqlalchemy.exc import IntegrityError
+import atexit
+import json
+import queue
 import traceback
 
 app = Flask(__name__)
 
 # Configure SQLite Database
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///transactions.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = config.DATABASE_URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Initialize the database
 db.init_app(app)
 
+# Pushes every stored transaction to open /stream connections
+broadcaster = Broadcaster(buffer_size=config.STREAM_BUFFER_SIZE)
+
+# Optional scheduler that scores concurrent /detect_fraud requests together. Items are
+# (transaction, undo_log) pairs, so each request can revert its card state if not stored
+batcher = MicroBatcher(
+    lambda items: predict_fraud_batch([data for data, _ in items], [undo_log for _, undo_log in items]),
+    max_batch_size=config.MICRO_BATCH_MAX_SIZE,
+    max_wait_ms=config.MICRO_BATCH_MAX_WAIT_MS
+) if config.MICRO_BATCH_ENABLED else None
+if batcher is not None:
+    atexit.register(batcher.shutdown)
+
+# Optional second model scoring the same traffic in the background, for comparison
+shadow = ShadowScorer(
+    lambda: ml_model.load_model(config.SHADOW_MODEL_PATH, config.SHADOW_ENGINE),
+    log_path=config.SHADOW_LOG_PATH,
+    max_queue_size=config.SHADOW_QUEUE_SIZE
+) if config.SHADOW_MODEL_PATH else None
+
+# Stored trans_nums, so duplicates are answered before scoring (seeded at startup)
+dedup = DedupIndex(
+    lambda trans_nums: fetch_stored_results(trans_nums),  # Defined below
+    capacity=config.DEDUP_CAPACITY,
+    false_positive_rate=config.DEDUP_FALSE_POSITIVE_RATE,
+    recent_size=config.DEDUP_RECENT_SIZE
+) if config.DEDUP_ENABLED else None
+
+
+def transaction_row(data, fraud_score, is_fraud):
+    """Column values of a Transaction row from the request payload and its fraud result."""
+    return {
+        "trans_date_trans_time": data['trans_date_trans_time'],
+        "cc_num": data['cc_num'],
+        "merchant": data['merchant'],
+        "category": data['category'],
+        "amt": data['amt'],
+        "first": data['first'],
+        "last": data['last'],
+        "gender": data['gender'],
+        "street": data['street'],
+        "city": data['city'],
+        "state": data['state'],
+        "zip": data['zip'],
+        "lat": data['lat'],
+        "long": data['long'],
+        "city_pop": data['city_pop'],
+        "job": data['job'],
+        "dob": data['dob'],
+        "trans_num": data['trans_num'],
+        "unix_time": data['unix_time'],
+        "merch_lat": data['merch_lat'],
+        "merch_long": data['merch_long'],
+        "is_fraud": is_fraud,
+        "fraud_score": fraud_score  # Add the calculated fraud score
+    }
+
+
+def store_transactions(rows, undo_logs=None):
+    """
+    Persists transaction row dicts: one commit in "sync" mode, or handed to the
+    write-behind writer for the next group commit in "group" mode. Stored rows are
+    pushed to /stream subscribers: here in "sync" mode, by the writer once they are
+    committed in "group" mode (see publish_stored).
+    :param undo_logs: Per row, the card state updates of its scoring, reverted by
+                      writer_rejected if the group commit does not store it.
+    """
+    if writer is not None:
+        writer.enqueue(rows, undo_logs)
+    else:
+        db.session.add_all([Transaction(**row) for row in rows])
+        db.session.commit()
+        publish_stored(rows)
+
+
+def publish_stored(rows):
+    """Pushes committed transaction rows to /stream subscribers, if there are any."""
+    if len(broadcaster):
+        broadcaster.publish(rows)
+
+
+def writer_rejected(row, stored, undo_log):
+    """
+    Called by the write-behind writer for a row it did not store, after the client
+    already got its result: reverts the row's card state and, for a duplicate of a
+    stored transaction, makes the index return the stored result from now on.
+    """
+    if undo_log:
+        ml_model.rollback_observed([undo_log])
+    if stored is not None and dedup is not None:
+        dedup.add([(row['trans_num'], float(stored[0]), int(stored[1]))])
+
+
+def fetch_stored_results(trans_nums):
+    """{trans_num: (fraud_score, is_fraud)} of the given trans_nums that are already stored."""
+    trans_nums = [trans_num for trans_num in trans_nums if trans_num is not None]
+    if not trans_nums:
+        return {}
+    rows = (
+        db.session.query(Transaction.trans_num, Transaction.fraud_score, Transaction.is_fraud)
+        .filter(Transaction.trans_num.in_(trans_nums))
+        .all()
+    )
+    return {trans_num: (float(fraud_score), int(is_fraud)) for trans_num, fraud_score, is_fraud in rows}
+
+
+def feed_version():
+    """
+    (generation, newest id) of the transaction table. Ids are reused after /clear_db,
+    which bumps the generation stored in the database, so together they identify the
+    table's contents in every server process and across restarts.
+    """
+    generation, max_id = db.session.execute(text(
+        f'SELECT (SELECT generation FROM {FeedState.__tablename__} WHERE id = 1), '
+        f'(SELECT MAX(id) FROM "{Transaction.__tablename__}")'
+    )).one()
+    return generation or 0, max_id or 0
+
+
+def duplicate_response(stored):
+    fraud_score, is_fraud = stored
+    return jsonify({"message": "Transaction already received, returning its stored result",
+                    "fraud_score": fraud_score, "is_fraud": is_fraud, "duplicate": True}), 200
+
+
 @app.route('/detect_fraud', methods=['POST'])
 def detect_fraud_endpoint():
     data = request.get_json()
+    trans_num = data.get('trans_num') if isinstance(data, dict) else None
+    # Card state updates of the scoring, reverted if the transaction is not stored
+    undo_log = []
 
     try:
-        fraud_result = predict_fraud(data)
+        # A retried transaction gets its stored result back without being scored again
+        stored = dedup.lookup([trans_num]).get(trans_num) if dedup is not None else None
+        if stored is not None:
+            return duplicate_response(stored)
+
+        fraud_result = batcher.submit((data, undo_log)) if batcher else predict_fraud(data, undo_log)
+        if "error" in fraud_result:
+            return jsonify({"message": "Failed to process transaction", "error": fraud_result["error"]}), 400
         fraud_score = float(fraud_result["fraud_score"])  # Convert to float
         is_fraud = int(fraud_result["is_fraud"])  # Convert to int
-        # Prepare transaction data to store in the database
-        transaction = Transaction(
-            trans_date_trans_time=data['trans_date_trans_time'],
-            cc_num=data['cc_num'],
-            merchant=data['merchant'],
-            category=data['category'],
-            amt=data['amt'],
-            first=data['first'],
-            last=data['last'],
-            gender=data['gender'],
-            street=data['street'],
-            city=data['city'],
-            state=data['state'],
-            zip=data['zip'],
-            lat=data['lat'],
-            long=data['long'],
-            city_pop=data['city_pop'],
-            job=data['job'],
-            dob=data['dob'],
-            trans_num=data['trans_num'],
-            unix_time=data['unix_time'],
-            merch_lat=data['merch_lat'],
-            merch_long=data['merch_long'],
-            is_fraud=is_fraud,
-            fraud_score=fraud_score  # Add the calculated fraud score
-        )
-
-        # Add the transaction object to the session and commit to save in the database
-        db.session.add(transaction)
-        db.session.commit()
+        # Prepare transaction data and store it (now, or via the write-behind writer)
+        store_transactions([transaction_row(data, fraud_score, is_fraud)], [undo_log])
+        if dedup is not None:
+            dedup.add([(trans_num, fraud_score, is_fraud)])
+        if shadow is not None:
+            shadow.submit([data], [fraud_result], ml_model.get_bundle().version)
 
         return jsonify({"message": "Transaction received and added successfully!", "fraud_score": fraud_score}), 200
 
+    except queue.Full:
+        ml_model.rollback_observed([undo_log])
+        return jsonify({"message": "Write queue is full, retry later"}), 503
+
+    except IntegrityError:
+        # Stored meanwhile by a concurrent request (or a backfill the index has not seen)
+        db.session.rollback()
+        ml_model.rollback_observed([undo_log])
+        stored = fetch_stored_results([trans_num]).get(trans_num)
+        if stored is not None:
+            return duplicate_response(stored)
+        return jsonify({"message": "Failed to process transaction", "error": "Integrity error"}), 400
+
     except Exception as e:
-        # Capture the full traceback
-        error_traceback = traceback.format_exc()
+        # The traceback goes to the server log, not to the client
+        db.session.rollback()
+        ml_model.rollback_observed([undo_log])
+        print(f"[ERROR] Failed to process transaction {trans_num}\n{traceback.format_exc()}")
+        return jsonify({"message": "Failed to process transaction", "error": str(e)}), 400
+
+
+@app.route('/detect_fraud/batch', methods=['POST'])
+def detect_fraud_batch_endpoint():
+    """
+    Score a list of transactions with one model call and store them in one commit.
+    Transactions already stored (or repeated within the batch) are not scored again:
+    they get their stored result back, flagged as duplicate. Rows that fail (bad
+    payload) are reported individually and leave no card state behind.
+    """
+    data = request.get_json()
+    if isinstance(data, dict):
+        data = data.get("transactions")
+    if not isinstance(data, list):
+        return jsonify({"message": "Expected a list of transactions"}), 400
+
+    # Card state updates of the scored rows, reverted for rows that end up not stored
+    undo_logs = []
+
+    try:
+        # Look duplicates up before scoring, so they cost neither model time nor a
+        # rolled-back commit, and only score the first of any repeated trans_num
+        trans_nums = [txn.get('trans_num') if isinstance(txn, dict) else None for txn in data]
+        stored = dedup.lookup(trans_nums) if dedup is not None else fetch_stored_results(trans_nums)
+        to_score = []
+        invalid = {}
+        first_seen = set()
+        for i, trans_num in enumerate(trans_nums):
+            if trans_num is not None and (trans_num in stored or trans_num in first_seen):
+                continue
+            # Rows that could not be stored are rejected before they update card state
+            try:
+                transaction_row(data[i], None, None)
+            except Exception as e:
+                invalid[i] = f"Invalid transaction: {e}"
+                continue
+            first_seen.add(trans_num)
+            to_score.append(i)
+        undo_logs = [[] for _ in to_score]
+        fraud_results = dict(zip(to_score, predict_fraud_batch([data[i] for i in to_score], undo_logs)))
+
+        results = []
+        rows = []
+        row_undo_logs = []
+        undo_log_of = dict(zip(to_score, undo_logs))
+        accepted = {}
+        for i, (txn, trans_num) in enumerate(zip(data, trans_nums)):
+            fraud_result = fraud_results.get(i)
+            if i in invalid:
+                results.append({"trans_num": trans_num, "error": invalid[i]})
+                continue
+            if fraud_result is None:
+                previous = stored.get(trans_num) or accepted.get(trans_num)
+                if previous is None:
+                    results.append({"trans_num": trans_num, "error": "Duplicate trans_num"})
+                else:
+                    results.append({"trans_num": trans_num, "fraud_score": previous[0], "is_fraud": previous[1],
+                                    "duplicate": True})
+                continue
+            if "error" in fraud_result:
+                results.append({"trans_num": trans_num, "error": fraud_result["error"]})
+                continue
+
+            fraud_score = float(fraud_result["fraud_score"])
+            is_fraud = int(fraud_result["is_fraud"])
+            rows.append(transaction_row(txn, fraud_score, is_fraud))
+            row_undo_logs.append(undo_log_of[i])
+            accepted[trans_num] = (fraud_score, is_fraud)
+            results.append({"trans_num": trans_num, "fraud_score": fraud_score, "is_fraud": is_fraud})
+
+        # One commit for the whole batch
+        if rows:
+            store_transactions(rows, row_undo_logs)
+            if dedup is not None:
+                dedup.add((trans_num, fraud_score, is_fraud)
+                          for trans_num, (fraud_score, is_fraud) in accepted.items())
+        if shadow is not None:
+            shadow.submit([data[i] for i in to_score], [fraud_results[i] for i in to_score],
+                          ml_model.get_bundle().version)
+
+        duplicates = sum(1 for result in results if result.get("duplicate"))
         return jsonify({
-            "message": "Failed to process transaction",
-            "error": str(e),
-            "traceback": error_traceback  # Include the full traceback in the response
-        }), 400
+            "message": "Batch processed",
+            "inserted": len(rows),
+            "duplicates": duplicates,
+            "failed": len(results) - len(rows) - duplicates,
+            "results": results
+        }), 200
+
+    except queue.Full:
+        ml_model.rollback_observed(undo_logs)
+        return jsonify({"message": "Write queue is full, retry later"}), 503
+
+    except Exception as e:
+        # The traceback goes to the server log, not to the client
+        db.session.rollback()
+        ml_model.rollback_observed(undo_logs)
+        print(f"[ERROR] Failed to process batch of {len(data)} transactions\n{traceback.format_exc()}")
+        return jsonify({"message": "Failed to process batch", "error": str(e)}), 400
+
+
+@app.route('/stream', methods=['GET'])
+def stream_transactions():
+    """
+    Server-Sent Events stream of transactions as they are scored and stored.
+
+    Events: "transaction" (one JSON transaction each) and "lag" ({"dropped": n})
+    when this client fell behind and lost events - it should reload /transactions.
+    """
+    subscription = broadcaster.subscribe()
+
+    def events():
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                transactions, dropped = subscription.wait(timeout=config.STREAM_KEEPALIVE_SECONDS)
+                if dropped:
+                    yield f"event: lag\ndata: {json.dumps({'dropped': dropped})}\n\n"
+                for t in transactions:
+                    yield f"event: transaction\ndata: {json.dumps(t)}\n\n"
+                if not transactions and not dropped:
+                    yield ": keep-alive\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route('/metrics/batcher', methods=['GET'])
+def batcher_metrics():
+    """
+    Batch sizes achieved by the micro-batching scheduler.
+    """
+    if batcher is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **batcher.stats()}), 200
+
+
+@app.route('/metrics/writer', methods=['GET'])
+def writer_metrics():
+    """
+    Queue depth and group commit counters of the write-behind writer. rows_ignored
+    counts duplicates skipped at commit, which their clients were not told about.
+    """
+    if writer is None:
+        return jsonify({"mode": config.PERSISTENCE_MODE}), 200
+    return jsonify({"mode": config.PERSISTENCE_MODE, **writer.stats()}), 200
+
+
+@app.route('/metrics/cascade', methods=['GET'])
+def cascade_metrics():
+    """
+    Transactions cleared by the cascade's prescreen without running the full model.
+    """
+    if ml_model.prescreen is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, "threshold": ml_model.prescreen.threshold,
+                    **ml_model.cascade_stats.stats()}), 200
+
+
+@app.route('/metrics/model', methods=['GET'])
+def model_metrics():
+    """
+    Model currently serving requests, and the hot-reload watcher's counters.
+    """
+    bundle = ml_model.get_bundle()
+    return jsonify({
+        "version": bundle.version,
+        "path": bundle.path,
+        "engine": config.MODEL_ENGINE,
+        "reload": watcher.stats() if watcher is not None else {"enabled": False}
+    }), 200
+
+
+@app.route('/metrics/shadow', methods=['GET'])
+def shadow_metrics():
+    """
+    Shadow model queue and how its scores compare with the primary model's.
+    """
+    if shadow is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **shadow.stats()}), 200
+
+
+@app.route('/metrics/dedup', methods=['GET'])
+def dedup_metrics():
+    """
+    Size of the duplicate index and how its lookups were answered.
+    """
+    if dedup is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **dedup.stats()}), 200
+
 
-    
 @app.route('/clear_db', methods=['POST'])
 def clear_db():
     try:
-        # Delete all transactions from the database
+        # Let queued writes land first so they are cleared too
+        if writer is not None:
+            writer.flush()
+
+        # Delete all transactions (and their rollups) from the database
         db.session.query(Transaction).delete()
+        rollups.clear(db.session.connection())
+        db.session.execute(text(
+            f"INSERT INTO {FeedState.__tablename__} (id, generation) VALUES (1, 1) "
+            f"ON CONFLICT (id) DO UPDATE SET generation = generation + 1"
+        ))
         db.session.commit()
+
+        card_state.clear()
+        velocity_engine.clear()
+        if dedup is not None:
+            dedup.clear()
         return jsonify({"message": "All transactions cleared successfully!"}), 200
     except Exception as e:
         return jsonify({"message": "Failed to clear database", "error": str(e)}), 400
 
 
 
+def serialize_transaction(t):
+    """Converts a Transaction row to the JSON shape served by /transactions."""
+    return {
+        "id": t.id,
+        "trans_date_trans_time": t.trans_date_trans_time,
+        "cc_num": t.cc_num,
+        "merchant": t.merchant,
+        "category": t.category,
+        "amt": t.amt,
+        "first": t.first,
+        "last": t.last,
+        "gender": t.gender,
+        "street": t.street,
+        "city": t.city,
+        "state": t.state,
+        "zip": t.zip,
+        "lat": t.lat,
+        "long": t.long,
+        "city_pop": t.city_pop,
+        "job": t.job,
+        "dob": t.dob,
+        "trans_num": t.trans_num,
+        "unix_time": t.unix_time,
+        "merch_lat": t.merch_lat,
+        "merch_long": t.merch_long,
+        "fraud_score": t.fraud_score,
+        "is_fraud": t.is_fraud,
+    }
+
+
+def parse_cursor(value):
+    """
+    (generation, id) of a /transactions cursor. A bare id (from before cursors carried
+    the generation) has generation None; a missing or malformed cursor is (None, None).
+    """
+    if value is None:
+        return None, None
+    generation, _, since_id = value.rpartition(":")
+    try:
+        return (int(generation) if generation else None), int(since_id)
+    except ValueError:
+        return None, None
+
+
 @app.route('/transactions', methods=['GET'])
 def get_transactions():
     """
     Fetch transactions from the database and return as JSON.
+
+    Without parameters, returns the latest TRANSACTIONS_PAGE_SIZE transactions.
+    With ?since_id=<cursor>, returns only rows newer than the cursor (oldest first).
+    Every response carries the new "cursor" ("<generation>:<id>") and an ETag, so a
+    poll with nothing new costs one MAX(id) lookup (see feed_version) and a 304.
     """
     try:
-        # Fetch latest 50 transactions (modify as needed)
-        transactions = Transaction.query.order_by(Transaction.trans_date_trans_time.desc()).limit(1000).all()
-        
-        # Convert transactions to a list of dictionaries
-        transactions_list = [
-            {
-                "trans_date_trans_time": t.trans_date_trans_time,
-                "cc_num": t.cc_num,
-                "merchant": t.merchant,
-                "category": t.category,
-                "amt": t.amt,
-                "first": t.first,
-                "last": t.last,
-                "gender": t.gender,
-                "street": t.street,
-                "city": t.city,
-                "state": t.state,
-                "zip": t.zip,
-                "lat": t.lat,
-                "long": t.long,
-                "city_pop": t.city_pop,
-                "job": t.job,
-                "dob": t.dob,
-                "trans_num": t.trans_num,
-                "unix_time": t.unix_time,
-                "merch_lat": t.merch_lat,
-                "merch_long": t.merch_long,
-                "fraud_score": t.fraud_score,
-                "is_fraud": t.is_fraud,
-            }
-            for t in transactions
-        ]
-
-        return jsonify({"transactions": transactions_list}), 200
+        since_generation, since_id = parse_cursor(request.args.get("since_id"))
+        generation, max_id = feed_version()
+
+        # The generation changes on /clear_db, so ids reused after a clear get a new ETag
+        etag = f"{generation}-{max_id}-{since_generation}:{since_id}"
+        if request.if_none_match.contains(etag):
+            return "", 304, {"ETag": f'"{etag}"'}
+
+        # A cursor from another generation (or, without one, beyond the newest id) was
+        # taken before a /clear_db: start over
+        reset = since_id is not None and (
+            since_id > max_id or (since_generation is not None and since_generation != generation))
+
+        if since_id is None or reset:
+            transactions = (
+                Transaction.query
+                .order_by(Transaction.trans_ts.desc(), Transaction.id.desc())  # Walks ix_transaction_trans_ts
+                .limit(config.TRANSACTIONS_PAGE_SIZE)
+                .all()
+            )
+        else:
+            transactions = (
+                Transaction.query
+                .filter(Transaction.id > since_id)
+                .order_by(Transaction.id)  # Primary key range scan
+                .limit(config.TRANSACTIONS_PAGE_SIZE)
+                .all()
+            )
+
+        transactions_list = [serialize_transaction(t) for t in transactions]
+
+        # Full loads jump straight to the newest id; pages continue from their last row
+        if since_id is None or reset:
+            cursor = max_id
+        else:
+            cursor = transactions[-1].id if transactions else since_id
+
+        response = jsonify({
+            "transactions": transactions_list,
+            "cursor": f"{generation}:{cursor}",
+            "has_more": cursor < max_id,
+            "reset": reset
+        })
+        response.set_etag(etag)
+        return response, 200
 
     except Exception as e:
         return jsonify({"message": "Failed to fetch transactions", "error": str(e)}), 500
 
 
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    """
+    Totals, fraud percentage, category/state breakdowns, day x hour counts and the
+    amount time series, read from the rollup tables - cost depends on the number of
+    buckets, not rows.
+
+    Optional parameters: resolution (minute, hour, day or auto), since/until
+    (epoch seconds) to limit the time series, and max_points to merge its buckets
+    down to a chart's point budget.
+    """
+    try:
+        resolution = request.args.get("resolution", "auto")
+        since = request.args.get("since", type=int)
+        until = request.args.get("until", type=int)
+        max_points = request.args.get("max_points", type=int)
+
+        # Rollups only change with inserts and /clear_db
+        generation, max_id = feed_version()
+        etag = f"stats-{generation}-{max_id}-{resolution}-{since}-{until}-{max_points}"
+        if request.if_none_match.contains(etag):
+            return "", 304, {"ETag": f'"{etag}"'}
+
+        stats = rollups.read_stats(db.session.connection(), resolution=resolution, since=since,
+                                   until=until, max_buckets=config.STATS_MAX_BUCKETS,
+                                   max_points=max_points)
+        response = jsonify(stats)
+        response.set_etag(etag)
+        return response, 200
+
+    except ValueError as e:
+        return jsonify({"message": "Invalid stats request", "error": str(e)}), 400
+
+    except Exception as e:
+        return jsonify({"message": "Failed to fetch stats", "error": str(e)}), 500
+
+
 # Create the tables in the database (if they don't exist)
 with app.app_context():
     print("Creating database......")
     db.create_all()  # Create tables if they don't exist
+    run_migrations(db.engine)  # Bring older transactions.db files up to the current schema
+
+    # Warm the per-card last-seen store, most recently active cards last
+    last_seen = (
+        db.session.query(Transaction.cc_num, func.max(Transaction.unix_time).label("last_time"))
+        .group_by(Transaction.cc_num)
+        .order_by(func.max(Transaction.unix_time).desc())
+        .limit(card_state.max_cards)
+        .all()
+    )
+    card_state.warm_start(reversed(last_seen))
+    print(f"Card state warmed with {len(card_state)} cards")
+
+    if dedup is not None:
+        dedup.seed(row[0] for row in db.session.query(Transaction.trans_num).yield_per(100_000))
+        print(f"Duplicate index seeded with {len(dedup)} transactions")
+
+    # Watch the model path from before the load, so a model written meanwhile is picked up.
+    # New models are loaded by the watcher thread and swapped in between requests
+    watcher = None
+    shadow_watcher = None
+    if config.MODEL_RELOAD_INTERVAL > 0:
+        watcher = ModelWatcher(config.MODEL_PATH, ml_model.load_model, ml_model.set_bundle,
+                               interval=config.MODEL_RELOAD_INTERVAL)
+        if shadow is not None:
+            shadow_watcher = ModelWatcher(
+                config.SHADOW_MODEL_PATH,
+                lambda path: ml_model.load_model(path, config.SHADOW_ENGINE),
+                shadow.set_bundle,
+                interval=config.MODEL_RELOAD_INTERVAL,
+                name="shadow-model-watcher"
+            )
+
+    # Load the model now rather than on the first request
+    bundle = ml_model.get_bundle()
+    print(f"Model {bundle.version} loaded")
+
+    # Replay the longest velocity window so rolling features are right from the first request
+    if bundle.velocity_enabled:
+        latest_time = db.session.query(func.max(Transaction.unix_time)).scalar()
+        if latest_time is not None:
+            recent = (
+                db.session.query(Transaction.cc_num, Transaction.unix_time, Transaction.amt, Transaction.merchant)
+                .filter(Transaction.unix_time > latest_time - max(window for _, window in WINDOWS))
+                .order_by(Transaction.unix_time)
+                .yield_per(10_000)
+            )
+            for row in recent:
+                velocity_engine.update(*row)
+        print(f"Velocity state warmed with {len(velocity_engine)} cards")
+
+    # Background group-commit writer (flushed on shutdown)
+    writer = None
+    if config.PERSISTENCE_MODE == "group":
+        writer = WriteBehindWriter(
+            db.engine,
+            Transaction.__table__,
+            max_queue_size=config.WRITE_BEHIND_QUEUE_SIZE,
+            flush_interval_ms=config.WRITE_BEHIND_FLUSH_MS,
+            max_batch_size=config.WRITE_BEHIND_MAX_BATCH,
+            on_rejected=writer_rejected,
+            on_stored=publish_stored
+        )
+        atexit.register(writer.shutdown)
+    elif config.PERSISTENCE_MODE != "sync":
+        raise ValueError(f"Unknown PERSISTENCE_MODE: {config.PERSISTENCE_MODE}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,73 @@
+"""
+Benchmark: process cold start, from a fresh interpreter to the first scored transaction.
+
+Each run is a new Python process that imports fraud_detection.ml_model and scores
+one transaction. The import and the first prediction (which loads the model) are
+timed separately, for every model path and engine given.
+
+Run from the backend directory:
+    python benchmarks/bench_cold_start.py --model ../data/fraud_model --model ../data/fraud_model.pkl
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import time
+start = time.perf_counter()
+from fraud_detection import ml_model
+imported = time.perf_counter()
+result = ml_model.predict_fraud({
+    "cc_num": "4000123412341234", "merchant": "fraud_Kub-Mann", "amt": 42.5, "unix_time": 1371816865,
+    "lat": 40.7, "long": -74.0, "merch_lat": 40.9, "merch_long": -73.6, "city_pop": 8000000,
+})
+scored = time.perf_counter()
+assert "fraud_score" in result, result
+import sys
+print(imported - start, scored - imported, "sklearn" in sys.modules, "xgboost" in sys.modules)
+"""
+
+
+def cold_start(model_path, engine):
+    """(import seconds, first prediction seconds, sklearn imported, xgboost imported) of one process."""
+    env = dict(os.environ, MODEL_PATH=os.path.abspath(model_path), MODEL_ENGINE=engine)
+    output = subprocess.run([sys.executable, "-c", CHILD], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout.split()
+    return float(output[0]), float(output[1]), output[2] == "True", output[3] == "True"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", action="append", help="Model artifact directory or .pkl (repeatable)")
+    parser.add_argument("--engine", action="append", choices=["xgboost", "native"],
+                        help="Engines to test (repeatable, default both)")
+    parser.add_argument("--runs", type=int, default=5, help="Processes per configuration")
+    parser.add_argument("--json-out", help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'model':<40}{'engine':<10}{'import ms':>12}{'first score ms':>16}{'total ms':>10}  imports")
+    for model_path in args.model or ["../data/fraud_model"]:
+        for engine in args.engine or ["xgboost", "native"]:
+            runs = [cold_start(model_path, engine) for _ in range(args.runs)]
+            import_ms = np.median([run[0] for run in runs]) * 1000
+            score_ms = np.median([run[1] for run in runs]) * 1000
+            imports = [name for name, loaded in zip(["sklearn", "xgboost"], runs[-1][2:]) if loaded]
+            print(f"{model_path[-40:]:<40}{engine:<10}{import_ms:>12.0f}{score_ms:>16.0f}"
+                  f"{import_ms + score_ms:>10.0f}  {', '.join(imports) or '-'}")
+            results.append({"model": model_path, "engine": engine, "import_ms": import_ms,
+                            "first_score_ms": score_ms, "imports": imports})
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
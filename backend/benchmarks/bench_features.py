@@ -0,0 +1,87 @@
+"""
+Benchmark of the shared feature pipeline (fraud_detection.features).
+
+Times the previous pandas implementation of model/generate_model.py against
+compute_batch over a transaction CSV (or synthetic transactions), with and without
+the velocity features (whose per-row engine both share). That the values match is
+checked separately by tests/test_features.py.
+
+Run from the backend directory:
+    python benchmarks/bench_features.py --csv ../data/fraudTest.csv
+    python benchmarks/bench_features.py --rows 50000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config  # noqa: E402
+from fraud_detection import features  # noqa: E402
+from fraud_detection.velocity import VelocityEngine, VELOCITY_FEATURES  # noqa: E402
+
+
+def pandas_reference(df, velocity=True):
+    """The feature engineering generate_model.load_data did before the shared pipeline."""
+    df = df.copy()
+    df['time_since_last_transaction'] = df.groupby('cc_num')['unix_time'].diff().fillna(0)
+    df['distance'] = np.sqrt((df['lat'] - df['merch_lat'])**2 + (df['long'] - df['merch_long'])**2)
+    df['amount_per_population'] = df['amt'] / (df['city_pop'] + 1)
+    df['log_amt'] = np.log1p(df['amt'])
+    df['transaction_hour'] = (df['unix_time'] // 3600) % 24
+    df['day_of_week'] = (df['unix_time'] // (3600 * 24)) % 7
+    df['high_amount_flag'] = (df['amt'] > 200).astype(int)
+    if velocity:
+        engine = VelocityEngine(history_size=config.VELOCITY_HISTORY_SIZE)
+        velocity_columns = engine.compute_batch(df['cc_num'].values, df['unix_time'].values,
+                                                df['amt'].values, df['merchant'].values)
+        for feat in VELOCITY_FEATURES:
+            df[feat] = velocity_columns[feat]
+    return df
+
+
+def load_frame(csv=None, rows=None, seed=7):
+    """The raw fields of a transaction CSV, or of `rows` synthetic transactions (20,000 by default)."""
+    fields = list(features.FIELDS)
+    if csv:
+        return pd.read_csv(csv, usecols=fields, nrows=rows)
+    from benchmarks.suite import synthetic_transactions
+    return pd.DataFrame(synthetic_transactions(rows or 20_000, seed))[fields]
+
+
+def best_time(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", help="Transaction CSV in the Kaggle schema (default: synthetic data)")
+    parser.add_argument("--rows", type=int, help="Rows to use (default: the whole CSV, or 20,000 synthetic)")
+    parser.add_argument("--repeats", type=int, default=3, help="Timing repeats (best is reported)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    df = load_frame(args.csv, args.rows, args.seed)
+    names = features.FEATURE_NAMES
+    columns = {field: df[field].to_numpy() for field in features.FIELDS}
+    print(f"{len(df):,} rows, {len(names)} features\n")
+
+    print(f"{'features':<22}{'pandas ms':>12}{'batch ms':>12}{'speedup':>10}")
+    stateless = [feat for feat in names if feat not in VELOCITY_FEATURES]
+    for label, subset, velocity in [("without velocity", stateless, False), ("all", names, True)]:
+        pandas_seconds = best_time(lambda: pandas_reference(df, velocity), args.repeats)
+        batch_seconds = best_time(lambda: features.compute_batch(columns, subset), args.repeats)
+        print(f"{label:<22}{pandas_seconds * 1000:>12.1f}{batch_seconds * 1000:>12.1f}"
+              f"{pandas_seconds / batch_seconds:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
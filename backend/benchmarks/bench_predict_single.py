@@ -0,0 +1,137 @@
+"""
+Micro-benchmark: single-transaction scoring, pandas path vs the numpy fast path.
+With MODEL_ENGINE=xgboost the fast path is also timed with single rows on the
+booster's default thread pool, as before they went to a one-thread copy.
+
+Run from the backend directory (the model is loaded from MODEL_PATH):
+    python benchmarks/bench_predict_single.py --n 5000
+"""
+import argparse
+import functools
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraud_detection import ml_model  # noqa: E402
+
+
+@functools.lru_cache(maxsize=1)
+def fitted_scaler(bundle):
+    """A StandardScaler with the bundle's parameters, as the original pickle stored it."""
+    scaler = StandardScaler()
+    scaler.mean_, scaler.scale_ = bundle.scaler_mean, bundle.scaler_scale
+    scaler.var_ = bundle.scaler_scale ** 2
+    scaler.n_features_in_ = bundle.n_features
+    scaler.feature_names_in_ = np.array(bundle.feature_names, dtype=object)
+    return scaler
+
+
+def predict_fraud_pandas(transaction):
+    """
+    The original one-row DataFrame implementation through scaler.transform, kept here
+    as the reference. The prescreen cascade (if enabled) short-circuits it the same way
+    as predict_fraud, so both return the same score for every row.
+    """
+    bundle = ml_model.get_bundle()
+    transaction = ml_model.compute_derived_features(transaction, bundle=bundle)
+    transaction_df = pd.DataFrame([transaction])
+    transaction_scaled = fitted_scaler(bundle).transform(transaction_df[bundle.feature_names])
+    if bundle.prescreen is not None:
+        prescreen_probability = bundle.prescreen.predict_one(transaction_scaled[0])
+        if prescreen_probability < bundle.prescreen.threshold:
+            return {"fraud_score": min(prescreen_probability, bundle.best_threshold), "is_fraud": 0}
+    fraud_probability = bundle.model.predict_proba(transaction_scaled)[0][1]
+    return {
+        "fraud_score": float(fraud_probability),
+        "is_fraud": int(fraud_probability > bundle.best_threshold)
+    }
+
+
+def random_transaction(rng):
+    """A synthetic transaction with realistic ranges for the model inputs."""
+    lat, long = rng.uniform(25, 48), rng.uniform(-122, -70)
+    return {
+        "cc_num": str(rng.randint(10**15, 10**16 - 1)),
+        "merchant": f"fraud_merchant_{rng.randint(0, 700)}",
+        "amt": round(rng.lognormvariate(3.5, 1.2), 2),
+        "unix_time": rng.randint(1325376000, 1388534399),
+        "lat": lat,
+        "long": long,
+        "merch_lat": lat + rng.uniform(-1, 1),
+        "merch_long": long + rng.uniform(-1, 1),
+        "city_pop": rng.randint(20, 3_000_000),
+    }
+
+
+def predict_fraud_thread_pool(transaction):
+    """predict_fraud with single rows on the booster's default thread pool (the old path)."""
+    model = ml_model.get_bundle().model
+    single_row_booster, model.single_row_booster = model.single_row_booster, model.booster
+    try:
+        return ml_model.predict_fraud(transaction)
+    finally:
+        model.single_row_booster = single_row_booster
+
+
+def time_calls(fn, transactions):
+    """Returns per-call latencies in microseconds."""
+    latencies = np.empty(len(transactions))
+    for i, txn in enumerate(transactions):
+        start = time.perf_counter()
+        fn(dict(txn))
+        latencies[i] = (time.perf_counter() - start) * 1e6
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=5000, help="Number of transactions to score")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Stateful features are filled in once up front, so both paths score identical inputs
+    # instead of each updating the per-card stores
+    transactions = [ml_model.observe_card(random_transaction(rng)) for _ in range(args.n)]
+
+    # Parity check before timing anything
+    max_diff = max(
+        abs(predict_fraud_pandas(dict(txn))["fraud_score"] - ml_model.predict_fraud(dict(txn))["fraud_score"])
+        for txn in transactions
+    )
+    print(f"Max |score difference| over {args.n} transactions: {max_diff:.3e}")
+    if max_diff > 1e-6:
+        print("❌ Fast path does not match the pandas reference")
+        sys.exit(1)
+
+    paths = [("pandas", predict_fraud_pandas), ("fast", ml_model.predict_fraud)]
+    if hasattr(ml_model.model, "single_row_booster"):
+        paths.append(("fast, pool", predict_fraud_thread_pool))
+
+    # Warm up every path, then time them
+    for _, fn in paths:
+        time_calls(fn, transactions[:100])
+
+    print(f"\n{'path':<12}{'p50 (us)':>12}{'p99 (us)':>12}")
+    results = {}
+    for name, fn in paths:
+        latencies = time_calls(fn, transactions)
+        results[name] = np.percentile(latencies, [50, 99])
+        print(f"{name:<12}{results[name][0]:>12.1f}{results[name][1]:>12.1f}")
+
+    speedup = results["pandas"] / results["fast"]
+    print(f"\n🚀 Speedup: p50 {speedup[0]:.1f}x, p99 {speedup[1]:.1f}x")
+    if "fast, pool" in results:
+        speedup = results["fast, pool"] / results["fast"]
+        print(f"   One thread vs the thread pool: p50 {speedup[0]:.1f}x, p99 {speedup[1]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
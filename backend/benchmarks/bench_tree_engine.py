@@ -0,0 +1,86 @@
+"""
+Benchmark: XGBClassifier.predict_proba vs the flat-array CompiledTreeEnsemble.
+
+Checks that both produce the same fraud probabilities (within 1e-6), then reports
+single-row latency (p50/p99) and batch throughput for xgboost, the numpy traversal
+and (if numba is installed) the compiled traversal.
+
+Run from the backend directory:
+    python benchmarks/bench_tree_engine.py --model ../data/fraud_model
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fraud_detection.artifact import load_artifact, load_pickle  # noqa: E402
+from fraud_detection.tree_engine import CompiledTreeEnsemble, njit  # noqa: E402
+
+
+def single_row_latencies(predict_proba, X):
+    """Per-call latency in microseconds, scoring one row at a time."""
+    latencies = np.empty(len(X))
+    for i in range(len(X)):
+        row = X[i:i + 1]
+        start = time.perf_counter()
+        predict_proba(row)
+        latencies[i] = (time.perf_counter() - start) * 1e6
+    return latencies
+
+
+def batch_throughput(predict_proba, X, repeats=5):
+    """Best-of-N rows per second for one predict_proba call over the whole batch."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict_proba(X)
+        best = min(best, time.perf_counter() - start)
+    return len(X) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="../data/fraud_model", help="Model artifact directory or legacy .pkl")
+    parser.add_argument("--rows", type=int, default=2000, help="Rows for the single-row latency test")
+    parser.add_argument("--batch", type=int, default=1000, help="Rows per batch for the throughput test")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    model = (load_artifact if os.path.isdir(args.model) else load_pickle)(args.model).model
+
+    # Scaled features are roughly standard normal; sprinkle in a few missing values
+    rng = np.random.default_rng(args.seed)
+    n_features = model.get_booster().num_features()
+    X = rng.normal(size=(max(args.rows, args.batch), n_features)).astype(np.float32)
+    X[rng.random(X.shape) < 0.01] = np.nan
+
+    engines = {"xgboost": model.predict_proba}
+    engines["native-numpy"] = CompiledTreeEnsemble.from_booster(model, use_numba=False).predict_proba
+    if njit is not None:
+        engines["native-numba"] = CompiledTreeEnsemble.from_booster(model).predict_proba
+    else:
+        print("numba is not installed, skipping the compiled traversal")
+
+    # Parity check (also triggers numba compilation before timing)
+    expected = model.predict_proba(X)[:, 1]
+    for name, predict_proba in engines.items():
+        max_diff = np.abs(predict_proba(X)[:, 1] - expected).max()
+        print(f"{name:<14} max |probability difference|: {max_diff:.3e}")
+        if max_diff > 1e-6:
+            print(f"❌ {name} does not match xgboost")
+            sys.exit(1)
+
+    print(f"\n{'engine':<14}{'p50 (us)':>12}{'p99 (us)':>12}{'batch rows/s':>16}")
+    for name, predict_proba in engines.items():
+        single_row_latencies(predict_proba, X[:100])  # Warm up
+        p50, p99 = np.percentile(single_row_latencies(predict_proba, X[:args.rows]), [50, 99])
+        throughput = batch_throughput(predict_proba, X[:args.batch])
+        print(f"{name:<14}{p50:>12.1f}{p99:>12.1f}{throughput:>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
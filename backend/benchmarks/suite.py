@@ -0,0 +1,274 @@
+"""
+Offline benchmark suite for the scoring and storage hot paths.
+
+Needs no server and no data files: a synthetic model artifact (same features and
+tree shape as model/generate_model.py) and synthetic transactions (from
+scripts/generate_transactions.py) are created in a temporary directory, and the
+app is pointed at a scratch SQLite database there.
+
+Benchmarks: compute_derived_features, predict_fraud, predict_fraud_batch,
+rule_based.detect_fraud (single and batched), ORM vs Core inserts of Transaction
+rows, and GET /transactions through the Flask test client.
+
+Run from the backend directory:
+    python benchmarks/suite.py run --out results.json
+    python benchmarks/suite.py compare baseline.json results.json --threshold 0.10
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(BACKEND_DIR), "scripts"))
+
+from fraud_detection.artifact import save_artifact  # noqa: E402
+from generate_transactions import transaction_payloads  # noqa: E402
+
+
+# === Synthetic Inputs ===
+def synthetic_transactions(n, seed, cards=500):
+    """The first n payloads of scripts/generate_transactions.py for a seed, in time order."""
+    return list(itertools.islice(transaction_payloads(seed, cards, rows_per_day=1500), n))
+
+
+def feature_matrix(transactions):
+    """Training features computed by the shared pipeline, as in model/generate_model.py."""
+    from fraud_detection import features
+    names = features.FEATURE_NAMES
+    columns = {field: [txn[field] for txn in transactions] for field in features.required_fields(names)}
+    computed = features.compute_batch(columns, names)
+    return np.column_stack([computed[feat] for feat in names]).astype(np.float64)
+
+
+def build_model_artifact(path, trees, depth, seed, rows=20_000):
+    """Trains an XGBClassifier with the production shape on synthetic data and saves it as an artifact."""
+    import xgboost as xgb
+    from sklearn.preprocessing import StandardScaler
+    from fraud_detection import features
+
+    X = feature_matrix(synthetic_transactions(rows, seed))
+    rng = np.random.default_rng(seed)
+    # Big, night-time, far-from-home transactions are more likely labelled fraud
+    logit = -5 + 0.01 * X[:, 0] + 1.5 * np.isin(X[:, 11], [22, 23, 0, 1, 2, 3]) + 0.5 * X[:, 8]
+    y = (rng.random(rows) < 1 / (1 + np.exp(-logit))).astype(int)
+
+    scaler = StandardScaler().fit(X)
+    model = xgb.XGBClassifier(n_estimators=trees, max_depth=depth, learning_rate=0.03,
+                              tree_method="hist", random_state=seed)
+    model.fit(scaler.transform(X), y)
+
+    save_artifact(path, model, scaler.mean_, scaler.scale_, features.FEATURE_NAMES, 0.5)
+
+
+# === Timing ===
+def latency_result(fn, inputs, warmup=50):
+    """Per-call latency over the inputs: p50 (the compared value), p99 and calls/s."""
+    for item in inputs[:warmup]:
+        fn(item)
+    latencies = np.empty(len(inputs))
+    for i, item in enumerate(inputs):
+        start = time.perf_counter()
+        fn(item)
+        latencies[i] = (time.perf_counter() - start) * 1e6
+    p50, p99 = np.percentile(latencies, [50, 99])
+    return {"value": float(p50), "unit": "us", "higher_is_better": False,
+            "p99_us": float(p99), "calls_per_s": float(1e6 / latencies.mean())}
+
+
+def throughput_result(fn, rows, repeats):
+    """Best-of-N rows per second for fn(), which processes `rows` rows per call."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return {"value": rows / best, "unit": "rows/s", "higher_is_better": True}
+
+
+# === Benchmarks ===
+def run_benchmarks(args, workdir):
+    model_path = os.path.join(workdir, "fraud_model")
+
+    # Must be set before config is first imported (building the model imports it)
+    os.environ["MODEL_PATH"] = model_path
+    os.environ["DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["PERSISTENCE_MODE"] = "sync"
+    os.environ["MICRO_BATCH_ENABLED"] = "false"
+
+    print(f"Building synthetic model ({args.trees} trees, depth {args.depth}) in {workdir}")
+    build_model_artifact(model_path, args.trees, args.depth, args.seed)
+
+    from fraud_detection import ml_model, rule_based
+    from database import rollups
+    from database.db_setup import Transaction, db
+    import app as app_module
+
+    transactions = synthetic_transactions(args.rows, args.seed + 1)
+    copies = lambda: [dict(txn) for txn in transactions]  # noqa: E731 - scoring mutates its input
+    results = {}
+
+    def record(name, result):
+        results[name] = result
+        extra = f" (p99 {result['p99_us']:,.1f} us)" if "p99_us" in result else ""
+        print(f"  {name:<28}{result['value']:>14,.1f} {result['unit']}{extra}")
+
+    def reset_state():
+        ml_model.card_state.clear()
+        ml_model.velocity_engine.clear()
+
+    reset_state()
+    record("compute_derived_features", latency_result(ml_model.compute_derived_features, copies()))
+    reset_state()
+    record("predict_fraud", latency_result(ml_model.predict_fraud, copies()))
+
+    batch = transactions[:args.batch]
+
+    def score_batch():
+        reset_state()
+        ml_model.predict_fraud_batch([dict(txn) for txn in batch])
+    record("predict_fraud_batch", throughput_result(score_batch, len(batch), args.repeats))
+
+    record("rule_based.detect_fraud", latency_result(rule_based.detect_fraud, transactions))
+    record("rule_based.detect_fraud_batch",
+           throughput_result(lambda: rule_based.detect_fraud_batch(transactions), len(transactions), args.repeats))
+
+    # Storage: the same scored rows through the ORM and through Core executemany
+    rows = [app_module.transaction_row(txn, 0.1, 0) for txn in transactions[:args.insert_rows]]
+    flask_app = app_module.app
+
+    def clear_table():
+        with db.engine.begin() as conn:
+            conn.execute(Transaction.__table__.delete())
+            rollups.clear(conn)
+
+    def insert_orm():
+        clear_table()
+        db.session.add_all([Transaction(**row) for row in rows])
+        db.session.commit()
+
+    def insert_core():
+        clear_table()
+        with db.engine.begin() as conn:
+            conn.execute(Transaction.__table__.insert(), rows)
+
+    with flask_app.app_context():
+        record("insert_orm", throughput_result(insert_orm, len(rows), args.repeats))
+        record("insert_core", throughput_result(insert_core, len(rows), args.repeats))
+
+        # The table now holds insert_rows rows: serve the latest page repeatedly
+        client = flask_app.test_client()
+        page_rows = min(len(rows), app_module.config.TRANSACTIONS_PAGE_SIZE)
+        result = latency_result(lambda _: client.get("/transactions"), list(range(args.requests)), warmup=5)
+        result["rows_per_s"] = result["calls_per_s"] * page_rows
+        record("transactions_endpoint", result)
+        clear_table()
+
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    import sqlalchemy
+    import xgboost
+
+    workdir = tempfile.mkdtemp(prefix="fraud-bench-")
+    try:
+        results = run_benchmarks(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "xgboost": xgboost.__version__,
+            "sqlalchemy": sqlalchemy.__version__,
+            "settings": {key: value for key, value in vars(args).items() if key not in ("command", "out")},
+        },
+        "benchmarks": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Results written to {args.out}")
+
+
+def compare(args):
+    """Prints the change of every benchmark and exits 1 if any regressed beyond the threshold."""
+    with open(args.baseline) as f:
+        baseline = json.load(f)["benchmarks"]
+    with open(args.current) as f:
+        current = json.load(f)["benchmarks"]
+
+    regressions = []
+    print(f"{'benchmark':<28}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name in sorted(baseline.keys() | current.keys()):
+        if name not in baseline or name not in current:
+            print(f"{name:<28}{'(only in ' + ('current' if name in current else 'baseline') + ')':>38}")
+            continue
+        before, after = baseline[name], current[name]
+        change = (after["value"] - before["value"]) / before["value"]
+        worse = -change if after["higher_is_better"] else change
+        status = ""
+        if worse > args.threshold:
+            status = "  ❌ regression"
+            regressions.append(name)
+        elif worse < -args.threshold:
+            status = "  ✅ faster"
+        print(f"{name:<28}{before['value']:>14,.1f}{after['value']:>14,.1f}{change:>+10.1%} {after['unit']}{status}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: "
+              f"{', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run every benchmark")
+    run_parser.add_argument("--out", help="Write the results as JSON to this file")
+    run_parser.add_argument("--rows", type=int, default=5000, help="Transactions for the per-call benchmarks")
+    run_parser.add_argument("--batch", type=int, default=1000, help="Rows per predict_fraud_batch call")
+    run_parser.add_argument("--insert-rows", type=int, default=10_000, help="Rows per insert benchmark")
+    run_parser.add_argument("--requests", type=int, default=200, help="GET /transactions calls")
+    run_parser.add_argument("--repeats", type=int, default=5, help="Best-of-N for throughput benchmarks")
+    run_parser.add_argument("--trees", type=int, default=700, help="Trees in the synthetic model")
+    run_parser.add_argument("--depth", type=int, default=8, help="Depth of the synthetic model's trees")
+    run_parser.add_argument("--seed", type=int, default=42)
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="Relative slowdown that counts as a regression")
+
+    args = parser.parse_args()
+    run(args) if args.command == "run" else compare(args)
+
+
+if __name__ == "__main__":
+    main()
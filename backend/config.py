@@ -0,0 +1,102 @@
+import os
+
+# === Online Feature State ===
+# Maximum number of cards whose last-seen time is kept in memory (LRU evicted)
+CARD_STATE_MAX_CARDS = int(os.getenv("CARD_STATE_MAX_CARDS", 1_000_000))
+
+# Velocity features: ring-buffer slots kept per card (hard memory cap, must match training)
+# and cards kept in memory
+VELOCITY_HISTORY_SIZE = int(os.getenv("VELOCITY_HISTORY_SIZE", 32))
+VELOCITY_MAX_CARDS = int(os.getenv("VELOCITY_MAX_CARDS", 1_000_000))
+
+# === Model Inference ===
+# Versioned model artifact written by model/generate_model.py (its root, which follows
+# LATEST, or one version directory), or a legacy fraud_model.pkl. Loaded on first use;
+# relative paths are resolved against the backend directory, not the working directory
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          os.getenv("MODEL_PATH", "../data/fraud_model"))
+
+# Verify the artifact's SHA-256 checksums when loading it
+MODEL_VERIFY_CHECKSUMS = os.getenv("MODEL_VERIFY_CHECKSUMS", "true").lower() == "true"
+
+# "xgboost" scores with XGBClassifier.predict_proba, "native" with the flat-array tree engine
+MODEL_ENGINE = os.getenv("MODEL_ENGINE", "xgboost")
+
+# Scoring cascade: a linear prescreen trained with the model clears clearly benign
+# transactions before the tree ensemble. Its threshold is tuned for a recall loss of at
+# most CASCADE_MAX_RECALL_LOSS, by generate_model.py on its validation split and again by
+# model/evaluate_model.py --save-cascade on the test data. A prescreen without a threshold
+# is never used
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "true").lower() == "true"
+CASCADE_MAX_RECALL_LOSS = float(os.getenv("CASCADE_MAX_RECALL_LOSS", 0.005))
+
+# Hot reload: seconds between checks of MODEL_PATH for a new model, which is then loaded
+# in the background and swapped in without a restart (0 turns the watcher off)
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", 5))
+
+# Shadow scoring: an optional second model that scores the same traffic off the request
+# path and appends both scores to SHADOW_LOG_PATH. Transactions arriving while
+# SHADOW_QUEUE_SIZE are already waiting are not shadow-scored
+SHADOW_MODEL_PATH = os.getenv("SHADOW_MODEL_PATH")
+if SHADOW_MODEL_PATH:
+    SHADOW_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), SHADOW_MODEL_PATH)
+SHADOW_ENGINE = os.getenv("SHADOW_ENGINE", MODEL_ENGINE)
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", 10_000))
+SHADOW_LOG_PATH = os.getenv("SHADOW_LOG_PATH", "shadow_scores.jsonl")
+
+# === Training Data ===
+# Engineered features of each training/test CSV are cached here (keyed by the file's
+# hash) and memory-mapped by later runs of model/generate_model.py and evaluate_model.py.
+# Set to an empty string to always parse the CSV. LOAD_CHUNK_SIZE rows are parsed at a time
+FEATURE_CACHE_DIR = os.getenv("FEATURE_CACHE_DIR", "../data/feature_cache")
+if FEATURE_CACHE_DIR:
+    FEATURE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), FEATURE_CACHE_DIR)
+else:
+    FEATURE_CACHE_DIR = None
+LOAD_CHUNK_SIZE = int(os.getenv("LOAD_CHUNK_SIZE", 200_000))
+
+# === Serving ===
+# Transactions database (a relative SQLite path lives in the Flask instance folder)
+DATABASE_URI = os.getenv("DATABASE_URI", "sqlite:///transactions.db")
+
+# Micro-batching of concurrent /detect_fraud requests into one model call
+MICRO_BATCH_ENABLED = os.getenv("MICRO_BATCH_ENABLED", "false").lower() == "true"
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", 64))
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", 2))
+
+# Persistence of scored transactions: "sync" commits inside each request, "group" returns
+# right away and a background writer commits batches every WRITE_BEHIND_FLUSH_MS.
+# Group mode cannot report a duplicate the duplicate index missed (e.g. a transaction
+# stored by a backfill): the client gets a freshly computed score, and only at commit is
+# the row skipped, its card state reverted and it counted in /metrics/writer rows_ignored
+PERSISTENCE_MODE = os.getenv("PERSISTENCE_MODE", "sync")
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", 50))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", 1000))
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", 10_000))
+
+# Duplicate detection before scoring: a Bloom filter over stored trans_nums, sized for
+# DEDUP_CAPACITY transactions at DEDUP_FALSE_POSITIVE_RATE, plus the results of the last
+# DEDUP_RECENT_SIZE transactions so retries are answered without a query
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_CAPACITY = int(os.getenv("DEDUP_CAPACITY", 10_000_000))
+DEDUP_FALSE_POSITIVE_RATE = float(os.getenv("DEDUP_FALSE_POSITIVE_RATE", 0.001))
+DEDUP_RECENT_SIZE = int(os.getenv("DEDUP_RECENT_SIZE", 100_000))
+
+# Maximum rows returned by one /transactions call
+TRANSACTIONS_PAGE_SIZE = int(os.getenv("TRANSACTIONS_PAGE_SIZE", 1000))
+
+# Server-Sent Events stream of scored transactions: events buffered per subscriber
+# before the oldest are dropped, and seconds between keep-alive comments
+STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", 1000))
+STREAM_KEEPALIVE_SECONDS = float(os.getenv("STREAM_KEEPALIVE_SECONDS", 15))
+
+# Time series buckets returned by /stats when the resolution is picked automatically
+STATS_MAX_BUCKETS = int(os.getenv("STATS_MAX_BUCKETS", 500))
+
+# === Historical Backfill ===
+# Rows scored with one model call and committed together by insert_historical_data,
+# and rows held in the bounded buffer that shuffles the inputs together (0 keeps file order).
+# Unset, the buffer is 10_000 rows, or 0 for a model with stateful features: those must
+# see each card's transactions in time order
+BACKFILL_CHUNK_SIZE = int(os.getenv("BACKFILL_CHUNK_SIZE", 5000))
+BACKFILL_SHUFFLE_BUFFER = int(os.environ["BACKFILL_SHUFFLE_BUFFER"]) if os.getenv("BACKFILL_SHUFFLE_BUFFER") else None
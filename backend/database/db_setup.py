@@ -1,12 +1,88 @@
+import sqlite3
+from datetime import datetime
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 # Initialize SQLAlchemy
 db = SQLAlchemy()
 
+# trans_date_trans_time is ISO 8601 ("2019-01-01 00:18:00") in the Kaggle data and every
+# generator. Slash dates come from that data re-saved by US-locale spreadsheets, so they
+# are read month-first only: a day-first date is never guessed
+TRANS_TIME_FORMATS = ["%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M"]
+
+# Warnings already printed by parse_trans_time (each kind once per process)
+_warned = set()
+
+
+def _warn_once(kind, message):
+    if kind not in _warned:
+        _warned.add(kind)
+        print(f"[WARNING] {message} (further warnings of this kind are suppressed)")
+
+
+def parse_trans_time(value):
+    """
+    Parses a trans_date_trans_time string into epoch seconds (naive times as UTC).
+    :return: None for a missing or unparseable value, e.g. a day-first date like 13/04/2020.
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        for fmt in TRANS_TIME_FORMATS:
+            try:
+                parsed = datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            _warn_once("unparseable", f"trans_date_trans_time {value!r} is neither ISO 8601 nor "
+                                      f"MM/DD/YYYY, leaving its trans_ts empty")
+            return None
+        if parsed.day <= 12 and parsed.day != parsed.month:
+            _warn_once("ambiguous", f"trans_date_trans_time {value!r} could also be day-first, "
+                                    f"reading slash dates as MM/DD/YYYY")
+    return int(parsed.timestamp()) if parsed.tzinfo else int((parsed - datetime(1970, 1, 1)).total_seconds())
+
+
+def _default_trans_ts(context):
+    return parse_trans_time(context.get_current_parameters().get("trans_date_trans_time"))
+
+
+@event.listens_for(Engine, "connect")
+def configure_sqlite(dbapi_connection, connection_record):
+    """Tunes every SQLite connection: WAL, relaxed fsync, bigger cache, mmap."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+    cursor.execute("PRAGMA synchronous=NORMAL")  # fsync at checkpoints, not every commit
+    cursor.execute("PRAGMA cache_size=-65536")  # 64 MB page cache
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB memory-mapped reads
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+    # Used by migrations to backfill trans_ts in SQL
+    dbapi_connection.create_function("parse_trans_time", 1, parse_trans_time, deterministic=True)
+
+
 # Define Transaction Model
 class Transaction(db.Model):
+    __table_args__ = (
+        db.Index("ix_transaction_trans_ts", "trans_ts"),
+        db.Index("ix_transaction_cc_num_unix_time", "cc_num", "unix_time"),
+        db.Index("ix_transaction_is_fraud_trans_ts", "is_fraud", "trans_ts"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)  # Auto-incremented ID
     trans_date_trans_time = db.Column(db.String, nullable=False)
+    trans_ts = db.Column(db.Integer, nullable=True, default=_default_trans_ts)  # Epoch seconds of trans_date_trans_time
     cc_num = db.Column(db.String, nullable=False)
     merchant = db.Column(db.String, nullable=False)
     category = db.Column(db.String, nullable=False)
@@ -32,3 +108,45 @@ class Transaction(db.Model):
 
     def __repr__(self):
         return f"<Transaction {self.trans_num} - Fraud: {self.is_fraud}, Score: {self.fraud_score}>"
+
+
+# Single row (id 1) whose generation is bumped by /clear_db, so the /transactions and
+# /stats ETags of different contents differ across restarts and server processes
+class FeedState(db.Model):
+    __tablename__ = "feed_state"
+    id = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Rollups of stored transactions, kept up to date by triggers (see database/rollups.py)
+class RollupCounters:
+    count = db.Column(db.Integer, nullable=False, default=0)
+    fraud_count = db.Column(db.Integer, nullable=False, default=0)
+    amount = db.Column(db.Float, nullable=False, default=0.0)
+    fraud_amount = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class MinuteRollup(RollupCounters, db.Model):
+    __tablename__ = "rollup_minute"
+    bucket = db.Column(db.Integer, primary_key=True)  # Epoch seconds at the start of the minute
+
+
+class HourRollup(RollupCounters, db.Model):
+    __tablename__ = "rollup_hour"
+    bucket = db.Column(db.Integer, primary_key=True)  # Epoch seconds at the start of the hour
+
+
+class CategoryRollup(RollupCounters, db.Model):
+    __tablename__ = "rollup_category"
+    category = db.Column(db.String, primary_key=True)
+
+
+class StateRollup(RollupCounters, db.Model):
+    __tablename__ = "rollup_state"
+    state = db.Column(db.String, primary_key=True)
+
+
+class DayHourRollup(RollupCounters, db.Model):
+    __tablename__ = "rollup_day_hour"
+    day_of_week = db.Column(db.Integer, primary_key=True)  # 0 = Monday
+    hour = db.Column(db.Integer, primary_key=True)
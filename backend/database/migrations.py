@@ -0,0 +1,91 @@
+"""
+In-place schema migrations for existing transactions.db files.
+
+The applied version is tracked in SQLite's PRAGMA user_version. Each migration is
+idempotent, so a database created fresh by db.create_all() (which already has the
+latest tables, columns and indexes) only gets its triggers and version set.
+
+Run standalone from the backend directory:
+    python -m database.migrations instance/transactions.db
+"""
+import sys
+
+from sqlalchemy import create_engine, inspect, text
+
+from database import rollups
+from database.db_setup import FeedState, Transaction
+
+TABLE = Transaction.__tablename__
+BACKFILL_CHUNK = 50_000
+
+
+def _add_trans_ts(conn):
+    """v1: epoch column for trans_date_trans_time, plus time/card/fraud indexes."""
+    columns = {column["name"] for column in inspect(conn).get_columns(TABLE)}
+    if "trans_ts" not in columns:
+        conn.execute(text(f'ALTER TABLE "{TABLE}" ADD COLUMN trans_ts INTEGER'))
+
+    # Backfill in rowid ranges to keep each write (and the WAL) small
+    max_id = conn.execute(text(f'SELECT MAX(id) FROM "{TABLE}"')).scalar() or 0
+    for start in range(0, max_id + 1, BACKFILL_CHUNK):
+        conn.execute(
+            text(f'UPDATE "{TABLE}" SET trans_ts = parse_trans_time(trans_date_trans_time) '
+                 f'WHERE id >= :start AND id < :end AND trans_ts IS NULL'),
+            {"start": start, "end": start + BACKFILL_CHUNK}
+        )
+
+    for index in Transaction.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _add_rollups(conn):
+    """v2: rollup tables behind /stats, their insert triggers and a backfill."""
+    for model in rollups.ROLLUP_MODELS:
+        model.__table__.create(conn, checkfirst=True)
+    rollups.install_triggers(conn)
+    rollups.rebuild(conn)
+
+
+def _add_feed_state(conn):
+    """v3: the feed generation behind the /transactions and /stats ETags."""
+    FeedState.__table__.create(conn, checkfirst=True)
+    conn.execute(text(f"INSERT OR IGNORE INTO {FeedState.__tablename__} (id, generation) VALUES (1, 0)"))
+
+
+def _floor_rollup_buckets(conn):
+    """v4: time buckets rounded down for pre-1970 times (they were truncated towards zero)."""
+    rollups.install_triggers(conn)
+    if conn.execute(text(f'SELECT 1 FROM "{TABLE}" WHERE trans_ts < 0 LIMIT 1')).first():
+        rollups.rebuild(conn)
+
+
+# (version, description, function), applied in order
+MIGRATIONS = [
+    (1, "trans_ts epoch column and indexes", _add_trans_ts),
+    (2, "rollup tables and triggers", _add_rollups),
+    (3, "feed generation", _add_feed_state),
+    (4, "rollup buckets rounded down", _floor_rollup_buckets),
+]
+
+
+def run_migrations(engine):
+    """Applies every migration newer than the database's user_version."""
+    with engine.begin() as conn:
+        current = conn.execute(text("PRAGMA user_version")).scalar()
+        pending = [migration for migration in MIGRATIONS if migration[0] > current]
+
+        for version, description, migrate in pending:
+            print(f"Applying migration {version}: {description}")
+            migrate(conn)
+            conn.execute(text(f"PRAGMA user_version = {version}"))
+
+        if pending:
+            conn.execute(text("ANALYZE"))  # Refresh planner statistics for the new indexes
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    run_migrations(create_engine(f"sqlite:///{sys.argv[1]}"))
+    print("✅ Migrations complete!")
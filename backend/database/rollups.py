@@ -0,0 +1,220 @@
+"""
+Pre-aggregated transaction counts and amounts served by /stats.
+
+Every row inserted into the transaction table is folded into small rollup tables
+(per minute, hour, day-of-week x hour, category and state) by SQLite triggers, in
+the same transaction as the insert. All insert paths - /detect_fraud in either
+persistence mode, the batch endpoint and insert_historical_data - are therefore
+covered, and rows skipped by INSERT OR IGNORE are never counted.
+
+There is no delete trigger (it would disable SQLite's fast full-table delete):
+/clear_db clears the rollups itself, and after any other delete run
+    python -m database.rollups instance/transactions.db
+to rebuild them from the transaction table.
+"""
+import sys
+
+from sqlalchemy import create_engine, text
+
+from database.db_setup import (Transaction, MinuteRollup, HourRollup, DayHourRollup,
+                               CategoryRollup, StateRollup)
+
+TABLE = Transaction.__tablename__
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def _floor_to(value, width):
+    """
+    SQL for value rounded down to a multiple of width. SQLite's integer division
+    truncates towards zero, which would put pre-1970 (negative) times a bucket late.
+    """
+    return f"{value} - ({value} % {width} + {width}) % {width}"
+
+
+# Rollup model -> key column -> SQL expression over a transaction row ({row} is NEW or t)
+TIME_ROLLUPS = {
+    MinuteRollup: {"bucket": _floor_to("{row}.trans_ts", 60)},
+    HourRollup: {"bucket": _floor_to("{row}.trans_ts", 3600)},
+    DayHourRollup: {
+        "day_of_week": "(CAST(strftime('%w', {row}.trans_ts, 'unixepoch') AS INTEGER) + 6) % 7",
+        "hour": "CAST(strftime('%H', {row}.trans_ts, 'unixepoch') AS INTEGER)",
+    },
+}
+DIMENSION_ROLLUPS = {
+    CategoryRollup: {"category": "{row}.category"},
+    StateRollup: {"state": "{row}.state"},
+}
+ROLLUP_MODELS = list(TIME_ROLLUPS) + list(DIMENSION_ROLLUPS)
+
+# Series resolutions served by /stats: name -> (source table, bucket width in seconds)
+RESOLUTIONS = {
+    "minute": (MinuteRollup, 60),
+    "hour": (HourRollup, 3600),
+    "day": (HourRollup, 86400),
+}
+
+COUNTERS = "count, fraud_count, amount, fraud_amount"
+
+
+def _upsert(model, keys):
+    """Statement adding one NEW row to the model's rollup."""
+    columns = ", ".join(keys)
+    values = ", ".join(expression.format(row="NEW") for expression in keys.values())
+    return (
+        f"INSERT INTO {model.__tablename__} ({columns}, {COUNTERS}) "
+        f"VALUES ({values}, 1, NEW.is_fraud = 1, NEW.amt, CASE WHEN NEW.is_fraud = 1 THEN NEW.amt ELSE 0 END) "
+        f"ON CONFLICT ({columns}) DO UPDATE SET "
+        f"count = count + excluded.count, fraud_count = fraud_count + excluded.fraud_count, "
+        f"amount = amount + excluded.amount, fraud_amount = fraud_amount + excluded.fraud_amount;"
+    )
+
+
+def _aggregate(model, keys, where=""):
+    """Statement filling the model's rollup from the whole transaction table."""
+    columns = ", ".join(keys)
+    values = ", ".join(expression.format(row="t") for expression in keys.values())
+    group_by = ", ".join(str(position) for position in range(1, len(keys) + 1))
+    return (
+        f"INSERT INTO {model.__tablename__} ({columns}, {COUNTERS}) "
+        f"SELECT {values}, COUNT(*), SUM(t.is_fraud = 1), SUM(t.amt), "
+        f"SUM(CASE WHEN t.is_fraud = 1 THEN t.amt ELSE 0 END) "
+        f'FROM "{TABLE}" AS t {where} GROUP BY {group_by}'
+    )
+
+
+def install_triggers(conn):
+    """(Re)creates the triggers that keep the rollups current on insert."""
+    triggers = {
+        # Rows whose time could not be parsed still count towards categories and states
+        "rollup_transaction_time": ("WHEN NEW.trans_ts IS NOT NULL", TIME_ROLLUPS),
+        "rollup_transaction_dimensions": ("", DIMENSION_ROLLUPS),
+    }
+    for name, (condition, rollups) in triggers.items():
+        body = "\n".join(_upsert(model, keys) for model, keys in rollups.items())
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        conn.execute(text(f'CREATE TRIGGER {name} AFTER INSERT ON "{TABLE}" {condition}\nBEGIN\n{body}\nEND'))
+
+
+def clear(conn):
+    for model in ROLLUP_MODELS:
+        conn.execute(text(f"DELETE FROM {model.__tablename__}"))
+
+
+def rebuild(conn):
+    """Recomputes every rollup from the transaction table."""
+    clear(conn)
+    for model, keys in TIME_ROLLUPS.items():
+        conn.execute(text(_aggregate(model, keys, where="WHERE t.trans_ts IS NOT NULL")))
+    for model, keys in DIMENSION_ROLLUPS.items():
+        conn.execute(text(_aggregate(model, keys)))
+
+
+def _bucket_range(conn, model, since, until):
+    """First and last non-empty bucket of a time rollup within [since, until)."""
+    return conn.execute(
+        text(f"SELECT MIN(bucket), MAX(bucket) FROM {model.__tablename__} "
+             f"WHERE bucket >= :since AND bucket < :until"),
+        {"since": since, "until": until}
+    ).one()
+
+
+def _pick_resolution(conn, since, until, max_buckets):
+    """Finest resolution whose bucket count over the requested range fits max_buckets."""
+    first, last = _bucket_range(conn, MinuteRollup, since, until)
+    if first is None:
+        return "minute"
+    for name, (_, seconds) in RESOLUTIONS.items():
+        if (last - first) // seconds + 1 <= max_buckets:
+            return name
+    return "day"
+
+
+def _widen_buckets(conn, model, seconds, since, until, max_points):
+    """
+    Smallest multiple of the bucket width that leaves at most max_points buckets.
+    Wider buckets are exact sums of the narrower ones, unlike point sampling.
+    """
+    first, last = _bucket_range(conn, model, since, until)
+    if first is None:
+        return seconds
+    width = seconds * max(-(-((last - first) // seconds + 1) // max_points), 1)
+    while last // width - first // width + 1 > max_points:
+        width += seconds
+    return width
+
+
+def read_stats(conn, resolution="auto", since=None, until=None, max_buckets=500, max_points=None):
+    """
+    Totals, breakdowns and the time series, read from the rollups only.
+    :param resolution: "minute", "hour", "day", or "auto" for the finest that fits max_buckets.
+    :param since, until: Optional epoch-second range of the time series.
+    :param max_points: Optional cap on series points; buckets are merged to fit it.
+    :raises ValueError: On an unknown resolution or a non-positive max_points.
+    """
+    since = -2 ** 63 if since is None else since
+    until = 2 ** 63 - 1 if until is None else until
+    if resolution == "auto":
+        resolution = _pick_resolution(conn, since, until, max_buckets)
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution: {resolution}")
+    if max_points is not None and max_points < 1:
+        raise ValueError("max_points must be positive")
+
+    count, fraud_count, amount, fraud_amount = conn.execute(
+        text(f"SELECT COALESCE(SUM(count), 0), COALESCE(SUM(fraud_count), 0), "
+             f"COALESCE(SUM(amount), 0), COALESCE(SUM(fraud_amount), 0) FROM {CategoryRollup.__tablename__}")
+    ).one()
+
+    def breakdown(model, key):
+        rows = conn.execute(
+            text(f"SELECT {key}, count, fraud_count, amount FROM {model.__tablename__} ORDER BY count DESC")
+        )
+        return [{key: row[0], "count": row[1], "fraud_count": row[2], "amount": row[3]} for row in rows]
+
+    day_hour_counts = [[0] * 24 for _ in DAYS]
+    day_hour_fraud = [[0] * 24 for _ in DAYS]
+    for day, hour, day_count, day_fraud in conn.execute(
+            text(f"SELECT day_of_week, hour, count, fraud_count FROM {DayHourRollup.__tablename__}")):
+        day_hour_counts[day][hour] = day_count
+        day_hour_fraud[day][hour] = day_fraud
+
+    model, seconds = RESOLUTIONS[resolution]
+    if max_points is not None:
+        seconds = _widen_buckets(conn, model, seconds, since, until, max_points)
+    series = conn.execute(
+        text(f"SELECT {_floor_to('bucket', ':seconds')} AS start, SUM(count), SUM(fraud_count), SUM(amount) "
+             f"FROM {model.__tablename__} WHERE bucket >= :since AND bucket < :until "
+             f"GROUP BY start ORDER BY start"),
+        {"seconds": seconds, "since": since, "until": until}
+    ).all()
+
+    return {
+        "totals": {
+            "count": count,
+            "fraud_count": fraud_count,
+            "fraud_percentage": fraud_count / count * 100 if count else 0,
+            "amount": amount,
+            "fraud_amount": fraud_amount,
+        },
+        "categories": breakdown(CategoryRollup, "category"),
+        "states": breakdown(StateRollup, "state"),
+        "day_hour": {"days": DAYS, "count": day_hour_counts, "fraud_count": day_hour_fraud},
+        # Columnar to keep the payload small
+        "series": {
+            "resolution": resolution,
+            "bucket_seconds": seconds,
+            "start": [row[0] for row in series],
+            "count": [row[1] for row in series],
+            "fraud_count": [row[2] for row in series],
+            "amount": [row[3] for row in series],
+        },
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    with create_engine(f"sqlite:///{sys.argv[1]}").begin() as connection:
+        rebuild(connection)
+    print("✅ Rollups rebuilt!")
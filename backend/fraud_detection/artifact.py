@@ -0,0 +1,249 @@
+"""
+Versioned model artifacts.
+
+generate_model.py writes each trained model to a new version directory under the
+artifact root and then points LATEST at it:
+
+    fraud_model/
+        LATEST                      name of the current version
+        20260101T120000Z/
+            manifest.json           features, thresholds, file list and SHA-256 checksums
+            model.ubj               the booster in xgboost's native binary format
+            scaler_mean.npy         StandardScaler parameters
+            scaler_scale.npy
+            prescreen_coef.npy      cascade prescreen weights (optional)
+            trees/*.npy             the booster exported for the native engine
+
+Loading needs no pickle, pandas or sklearn. The arrays are memory-mapped, and with
+MODEL_ENGINE=native xgboost is not even imported. A legacy fraud_model.pkl can still
+be loaded by pointing MODEL_PATH at the file.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from fraud_detection.cascade import LinearPrescreen
+from fraud_detection.velocity import VELOCITY_FEATURES
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+LATEST = "LATEST"
+
+
+class ModelBundle:
+    """Everything scoring needs from one artifact, so it can be loaded and swapped as a unit."""
+
+    def __init__(self, model, feature_names, best_threshold, scaler_mean, scaler_scale,
+                 prescreen=None, version=None, path=None):
+        self.model = model
+        self.feature_names = list(feature_names)
+        self.best_threshold = float(best_threshold)
+        self.scaler_mean = scaler_mean
+        self.scaler_scale = scaler_scale
+        self.prescreen = prescreen
+        self.version = version
+        self.path = path
+        self.n_features = len(self.feature_names)
+        self.velocity_enabled = any(feat in self.feature_names for feat in VELOCITY_FEATURES)
+
+
+class BoosterModel:
+    """
+    An xgboost.Booster loaded from the native format, with the predict_proba() and
+    set_params() the rest of the code uses on an XGBClassifier.
+    Single rows go to a copy limited to one thread: handing one row to the thread
+    pool costs more than traversing the trees.
+    """
+
+    def __init__(self, booster):
+        self.booster = booster
+        self.single_row_booster = booster.copy()
+        self.single_row_booster.set_param({"nthread": 1})
+
+    @classmethod
+    def load(cls, path):
+        import xgboost as xgb
+        return cls(xgb.Booster(model_file=path))
+
+    def get_booster(self):
+        return self.booster
+
+    def set_params(self, n_jobs=None, **params):
+        if params:
+            self.single_row_booster.set_param(params)
+        if n_jobs is not None:
+            params["nthread"] = n_jobs
+        self.booster.set_param(params)
+        return self
+
+    def predict_proba(self, X):
+        """Class probabilities in the XGBClassifier layout: column 1 is fraud."""
+        X = np.asarray(X, dtype=np.float32)
+        proba = (self.single_row_booster if len(X) == 1 else self.booster).inplace_predict(X)
+        return np.column_stack([1.0 - proba, proba])
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_artifact(root, booster, scaler_mean, scaler_scale, features, best_threshold, prescreen=None,
+                  metadata=None):
+    """
+    Writes a new version under root and makes it the LATEST one.
+    :param booster: xgboost.Booster, XGBClassifier or BoosterModel.
+    :param prescreen: Optional LinearPrescreen of the scoring cascade.
+    :return: Path of the version directory.
+    """
+    from fraud_detection.tree_engine import CompiledTreeEnsemble
+    if hasattr(booster, "get_booster"):
+        booster = booster.get_booster()
+
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(root, version)
+    suffix = 1
+    while os.path.exists(path):
+        suffix += 1
+        path = os.path.join(root, f"{version}-{suffix}")
+    version = os.path.basename(path)
+    os.makedirs(os.path.join(path, "trees"))
+
+    booster.save_model(os.path.join(path, "model.ubj"))
+    np.save(os.path.join(path, "scaler_mean.npy"), np.asarray(scaler_mean, dtype=np.float64))
+    np.save(os.path.join(path, "scaler_scale.npy"), np.asarray(scaler_scale, dtype=np.float64))
+    CompiledTreeEnsemble.from_booster(booster).save(os.path.join(path, "trees"))
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "version": version,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "features": list(features),
+        "best_threshold": float(best_threshold),
+        "model": "model.ubj",
+        "scaler": {"mean": "scaler_mean.npy", "scale": "scaler_scale.npy"},
+        "trees": "trees",
+        "prescreen": None,
+        "metadata": metadata or {},
+    }
+    if prescreen is not None:
+        np.save(os.path.join(path, "prescreen_coef.npy"), prescreen.coef)
+        manifest["prescreen"] = {"coef": "prescreen_coef.npy", "intercept": prescreen.intercept,
+                                 "threshold": prescreen.threshold}
+
+    files = sorted(os.path.relpath(os.path.join(directory, name), path)
+                   for directory, _, names in os.walk(path) for name in names)
+    manifest["checksums"] = {name: _sha256(os.path.join(path, name)) for name in files}
+    with open(os.path.join(path, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Switch LATEST atomically, so a reader never sees a half-written pointer
+    pointer = os.path.join(root, LATEST)
+    with open(pointer + ".tmp", "w") as f:
+        f.write(version + "\n")
+    os.replace(pointer + ".tmp", pointer)
+    return path
+
+
+def resolve_version(path):
+    """Version directory for an artifact root (through LATEST) or a version directory."""
+    if os.path.exists(os.path.join(path, MANIFEST)):
+        return path
+    pointer = os.path.join(path, LATEST)
+    if not os.path.exists(pointer):
+        raise FileNotFoundError(f"No model artifact at {path} (neither {MANIFEST} nor {LATEST})")
+    with open(pointer) as f:
+        return os.path.join(path, f.read().strip())
+
+
+def read_manifest(version_path, verify=True):
+    """
+    Reads a version's manifest.
+    :raises ValueError: On an unknown format or a file whose checksum does not match.
+    """
+    with open(os.path.join(version_path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format: {manifest.get('format')}")
+    if verify:
+        for name, checksum in manifest["checksums"].items():
+            if _sha256(os.path.join(version_path, name)) != checksum:
+                raise ValueError(f"Checksum mismatch for {name} in {version_path}")
+    return manifest
+
+
+def load_artifact(path, engine="xgboost", verify=True, mmap_mode="r", untuned_prescreen=False):
+    """
+    Loads a ModelBundle from an artifact root or version directory.
+    :param engine: "xgboost" (the booster) or "native" (the exported trees; no xgboost import).
+    :param untuned_prescreen: Keep a prescreen whose threshold has not been tuned yet (for
+                              evaluate_model.py to tune it); otherwise it is dropped and scoring skips it.
+    """
+    version_path = resolve_version(path)
+    manifest = read_manifest(version_path, verify)
+
+    def array(name):
+        return np.load(os.path.join(version_path, name), mmap_mode=mmap_mode)
+
+    # Engines are imported on demand: numba and xgboost each take a while to import
+    if engine == "native":
+        from fraud_detection.tree_engine import CompiledTreeEnsemble
+        model = CompiledTreeEnsemble.load(os.path.join(version_path, manifest["trees"]), mmap_mode=mmap_mode)
+    elif engine == "xgboost":
+        model = BoosterModel.load(os.path.join(version_path, manifest["model"]))
+    else:
+        raise ValueError(f"Unknown model engine: {engine}")
+
+    prescreen = None
+    if manifest["prescreen"] is not None and (untuned_prescreen or manifest["prescreen"]["threshold"] is not None):
+        prescreen = LinearPrescreen(array(manifest["prescreen"]["coef"]), manifest["prescreen"]["intercept"],
+                                    manifest["prescreen"]["threshold"])
+
+    return ModelBundle(model, manifest["features"], manifest["best_threshold"],
+                       array(manifest["scaler"]["mean"]), array(manifest["scaler"]["scale"]),
+                       prescreen=prescreen, version=manifest["version"], path=version_path)
+
+
+def load_pickle(path, engine="xgboost", untuned_prescreen=False):
+    """
+    Loads a ModelBundle from a legacy fraud_model.pkl (needs sklearn and xgboost).
+    :param untuned_prescreen: As for load_artifact.
+    """
+    import pickle
+    with open(path, 'rb') as f:
+        data = pickle.load(f)
+
+    if not isinstance(data, dict):
+        raise ValueError(f"Loaded data is not a dictionary. Got type: {type(data)}")
+
+    expected_keys = {"model", "scaler", "features", "best_threshold"}
+    missing_keys = expected_keys - data.keys()
+    if missing_keys:
+        raise KeyError(f"Missing keys in loaded model: {missing_keys}")
+
+    model = data["model"]
+    if engine == "native":
+        from fraud_detection.tree_engine import CompiledTreeEnsemble
+        model = CompiledTreeEnsemble.from_booster(model)
+    elif engine != "xgboost":
+        raise ValueError(f"Unknown model engine: {engine}")
+
+    n_features = len(data["features"])
+    scaler = data["scaler"]
+    scaler_mean = np.zeros(n_features) if scaler.mean_ is None else np.asarray(scaler.mean_, dtype=np.float64)
+    scaler_scale = np.ones(n_features) if scaler.scale_ is None else np.asarray(scaler.scale_, dtype=np.float64)
+
+    prescreen = None
+    if data.get("prescreen") is not None:
+        prescreen = LinearPrescreen.from_dict(data["prescreen"])
+        if prescreen.threshold is None and not untuned_prescreen:
+            prescreen = None
+
+    return ModelBundle(model, data["features"], data["best_threshold"], scaler_mean, scaler_scale,
+                       prescreen=prescreen, version=os.path.basename(path), path=path)
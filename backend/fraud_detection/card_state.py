@@ -0,0 +1,137 @@
+import threading
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+
+
+class CardStateStore:
+    """
+    In-process last-seen unix_time per cc_num, so time_since_last_transaction can be
+    computed online the same way training computes it with groupby('cc_num').diff().
+    Lookups are O(1); memory is bounded by evicting the least recently seen card.
+    """
+
+    def __init__(self, max_cards=1_000_000):
+        self.max_cards = max_cards
+        self._last_seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._last_seen)
+
+    def observe(self, cc_num, unix_time, undo_log=None):
+        """
+        Records a transaction for the card and returns the seconds since its previous one.
+        :param undo_log: List to append a callable to that reverts this update (see undo).
+        :return: 0 for a card that has not been seen (matches fillna(0) in training).
+        """
+        key = str(cc_num)
+        unix_time = int(unix_time)
+
+        with self._lock:
+            previous = self._last_seen.pop(key, None)
+            self._last_seen[key] = unix_time  # (Re)insert as most recently used
+            if previous is None and len(self._last_seen) > self.max_cards:
+                self._last_seen.popitem(last=False)
+
+        if undo_log is not None:
+            undo_log.append(lambda: self.undo(key, unix_time, previous))
+        return 0 if previous is None else unix_time - previous
+
+    def undo(self, key, unix_time, previous):
+        """
+        Reverts observe() of a transaction that was not stored after all, unless the
+        card has been seen again since (a later transaction was computed from it).
+        """
+        with self._lock:
+            if self._last_seen.get(key) != unix_time:
+                return
+            if previous is None:
+                del self._last_seen[key]
+            else:
+                self._last_seen[key] = previous
+
+    def observe_batch(self, cc_nums, unix_times, undo_logs=None):
+        """
+        observe() over whole columns in row order, vectorized: the diffs within the batch
+        are computed per card with numpy, and the store is touched once per card. A batch
+        that would evict cards runs row by row, since a card evicted within the batch
+        restarts from 0 (as in VelocityEngine.compute_batch).
+        :param undo_logs: One list per row, each receiving the callable observe() would
+                          have appended for that row.
+        :return: int64 array of seconds since each row's previous transaction of its card.
+        """
+        keys = np.asarray(cc_nums)
+        times = np.asarray(unix_times, dtype=np.int64)
+        if not len(keys):
+            return np.zeros(0, dtype=np.int64)
+
+        # Sorting strings is slow: group by integer ids of the distinct cards instead
+        card_ids = keys
+        if keys.dtype.kind not in "iu":
+            index = {}
+            card_ids = np.fromiter((index.setdefault(key, len(index)) for key in keys.tolist()),
+                                   dtype=np.int64, count=len(keys))
+
+        # Rows grouped by card, in row order within each card
+        order = np.argsort(card_ids, kind="stable")
+        sorted_ids = card_ids[order]
+        sorted_keys = keys[order]
+        sorted_times = times[order]
+        since = np.empty(len(keys), dtype=np.int64)
+        since[1:] = sorted_times[1:] - sorted_times[:-1]
+        starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+        ends = np.r_[starts[1:], len(keys)] - 1
+
+        card_keys = [str(key) for key in sorted_keys[starts].tolist()]
+        stored = [None] * len(starts)
+        with self._lock:
+            fits = len(self._last_seen) + sum(key not in self._last_seen for key in card_keys) <= self.max_cards
+            if fits:
+                # Cards in order of their last row, so recency matches row-by-row observe()
+                for group in np.argsort(order[ends], kind="stable"):
+                    start, end = starts[group], ends[group]
+                    key = card_keys[group]
+                    previous = stored[group] = self._last_seen.pop(key, None)
+                    since[start] = 0 if previous is None else sorted_times[start] - previous
+                    self._last_seen[key] = int(sorted_times[end])
+
+        if not fits:
+            return np.array([self.observe(key, unix_time, undo_logs[i] if undo_logs is not None else None)
+                             for i, (key, unix_time) in enumerate(zip(keys.tolist(), times.tolist()))],
+                            dtype=np.int64)
+
+        if undo_logs is not None:
+            # Each row reverts to the card's time before it: the previous row's, or the stored one
+            times_list = sorted_times.tolist()
+            rows = order.tolist()
+            for key, previous, start, end in zip(card_keys, stored, starts.tolist(), ends.tolist()):
+                for j in range(start, end + 1):
+                    undo_logs[rows[j]].append(partial(self.undo, key, times_list[j], previous))
+                    previous = times_list[j]
+
+        result = np.empty_like(since)
+        result[order] = since
+        return result
+
+    def peek(self, cc_num):
+        """Returns the card's last-seen unix_time (or None) without updating the store."""
+        return self._last_seen.get(str(cc_num))
+
+    def warm_start(self, rows):
+        """
+        Seeds the store from (cc_num, unix_time) pairs, oldest first, so the most
+        recently active cards are the last to be evicted.
+        """
+        with self._lock:
+            for cc_num, unix_time in rows:
+                key = str(cc_num)
+                self._last_seen.pop(key, None)
+                self._last_seen[key] = int(unix_time)
+                if len(self._last_seen) > self.max_cards:
+                    self._last_seen.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._last_seen.clear()
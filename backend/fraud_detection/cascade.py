@@ -0,0 +1,103 @@
+import math
+import threading
+
+import numpy as np
+
+
+class LinearPrescreen:
+    """
+    First stage of the scoring cascade: a logistic regression over the same scaled
+    features as the full model, trained alongside it in generate_model.py.
+
+    Transactions it scores below `threshold` are treated as clearly benign and never
+    reach the tree ensemble. The threshold is tuned offline (evaluate_model.py) so that
+    at most a target share of the frauds the full model catches is lost.
+    """
+
+    def __init__(self, coef, intercept, threshold=None):
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.threshold = threshold
+
+    @classmethod
+    def from_estimator(cls, estimator, threshold=None):
+        """From a fitted sklearn LogisticRegression."""
+        return cls(estimator.coef_[0], estimator.intercept_[0], threshold)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["coef"], data["intercept"], data.get("threshold"))
+
+    def to_dict(self):
+        return {"coef": self.coef, "intercept": self.intercept, "threshold": self.threshold}
+
+    def predict_proba(self, X):
+        """Fraud probability per row of a scaled 2-D float array."""
+        return 1 / (1 + np.exp(-(np.asarray(X, dtype=np.float64) @ self.coef + self.intercept)))
+
+    def predict_one(self, row):
+        """Fraud probability of one scaled row, without array overhead."""
+        z = float(np.dot(self.coef, row)) + self.intercept
+        if z >= 0:
+            return 1 / (1 + math.exp(-z))
+        e = math.exp(z)
+        return e / (1 + e)
+
+
+def tune_threshold(prescreen_probabilities, full_predictions, y, max_recall_loss):
+    """
+    Highest prescreen threshold that loses at most max_recall_loss of recall.
+    A fraud is lost when the full model flags it but the prescreen clears it first.
+    :param full_predictions: 0/1 decisions of the full model at its own threshold.
+    """
+    y = np.asarray(y)
+    caught = np.sort(np.asarray(prescreen_probabilities)[(np.asarray(full_predictions) == 1) & (y == 1)])
+    allowed = int(max_recall_loss * (y == 1).sum())
+    if allowed >= len(caught):
+        return 1.0
+    return float(caught[allowed])
+
+
+def cascade_report(prescreen_probabilities, full_predictions, y, threshold):
+    """Share of rows short-circuited and recall/precision of the full model vs the cascade."""
+    y = np.asarray(y)
+    full_predictions = np.asarray(full_predictions)
+    passed = np.asarray(prescreen_probabilities) >= threshold
+    cascade_predictions = full_predictions & passed
+
+    def recall(predictions):
+        return ((predictions == 1) & (y == 1)).sum() / max((y == 1).sum(), 1)
+
+    def precision(predictions):
+        return ((predictions == 1) & (y == 1)).sum() / max((predictions == 1).sum(), 1)
+
+    return {
+        "threshold": threshold,
+        "short_circuit_fraction": float(1 - passed.mean()),
+        "recall_full": float(recall(full_predictions)),
+        "recall_cascade": float(recall(cascade_predictions)),
+        "precision_full": float(precision(full_predictions)),
+        "precision_cascade": float(precision(cascade_predictions)),
+    }
+
+
+class CascadeStats:
+    """Thread-safe counters of transactions seen by the prescreen and cleared by it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.screened = 0
+        self.short_circuited = 0
+
+    def record(self, screened, short_circuited):
+        with self._lock:
+            self.screened += screened
+            self.short_circuited += short_circuited
+
+    def stats(self):
+        with self._lock:
+            return {
+                "screened": self.screened,
+                "short_circuited": self.short_circuited,
+                "short_circuit_fraction": self.short_circuited / self.screened if self.screened else 0.0,
+            }
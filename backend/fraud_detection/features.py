@@ -0,0 +1,325 @@
+"""
+Model features, declared once and shared by training, evaluation and serving.
+
+Each feature lists its dtype, the fields it is computed from and a kernel. Kernels
+are numpy expressions that work on whole columns and on the scalars of a single
+transaction alike, so every mode runs the same arithmetic. Stateful features (time
+since the card's previous transaction, velocity) read and update a FeatureState:
+a fresh one per training file, the long-lived one of the process when serving.
+
+Entry points, each computing only the features in feature_names and what they need:
+    compute_batch(columns, feature_names, state)    dict of numpy columns -> feature columns
+    compute_one(transaction, feature_names, state)  fills one transaction dict in place
+    FeatureStream(feature_names).process(columns)   consecutive chunks of one row stream
+    observe_batch(transactions, feature_names, state)  stateful features of transaction dicts
+
+Stateful features already present in the input (e.g. sent by a client, or observed
+earlier with observe_one) are taken as given instead of updating the state again.
+
+observe_one and compute_one validate the transaction before they update any state,
+and can record how to revert their updates in an undo log, so a transaction that is
+scored but then not stored (rejected, retried later) does not count twice:
+    undo_log = []
+    compute_one(transaction, feature_names, state, undo_log)
+    ...                                              # storing fails
+    rollback(undo_log)
+observe_batch takes one undo log per transaction and fills them with the same entries.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+import config
+from fraud_detection.card_state import CardStateStore
+from fraud_detection.velocity import VelocityEngine, VELOCITY_FEATURES, check_times
+
+# Raw transaction fields the features are computed from (None: kept as given)
+FIELDS = {
+    'cc_num': None,
+    'merchant': None,
+    'amt': np.float64,
+    'unix_time': np.int64,
+    'lat': np.float64,
+    'long': np.float64,
+    'merch_lat': np.float64,
+    'merch_long': np.float64,
+    'city_pop': np.int64,
+}
+
+
+class Feature:
+    """A stateless feature: kernel(*inputs) over columns or scalars."""
+    stateful = False
+
+    def __init__(self, name, dtype, inputs, kernel):
+        self.name = name
+        self.names = [name]
+        self.dtype = np.dtype(dtype)
+        self.inputs = inputs
+        self.kernel = kernel
+
+
+class StatefulFeatures:
+    """
+    Features computed together from per-card state, in row order.
+    observe_batch(state, *input_columns, undo_logs=None) returns a dict of columns and
+    observe_one(state, *input_values, undo_log=None) a dict of values, appending a
+    callable that reverts its update to undo_log (one per row for undo_logs) if given.
+    check(*input_values) raises ValueError for inputs the state cannot take, so that
+    validate() rejects them before any state is updated.
+    """
+    stateful = True
+
+    def __init__(self, dtypes, inputs, observe_batch, observe_one, check=None):
+        self.names = list(dtypes)
+        self.dtypes = {name: np.dtype(dtype) for name, dtype in dtypes.items()}
+        self.inputs = inputs
+        self.observe_batch = observe_batch
+        self.observe_one = observe_one
+        self.check = check
+
+
+class FeatureState:
+    """Per-card stores behind the stateful features."""
+
+    def __init__(self, card_state=None, velocity_engine=None):
+        self.card_state = card_state if card_state is not None else CardStateStore(
+            max_cards=config.CARD_STATE_MAX_CARDS)
+        self.velocity_engine = velocity_engine if velocity_engine is not None else VelocityEngine(
+            history_size=config.VELOCITY_HISTORY_SIZE, max_cards=config.VELOCITY_MAX_CARDS)
+
+
+# === Kernels ===
+def distance(lat, long, merch_lat, merch_long):
+    # x * x rather than x**2: numpy squares arrays exactly but sends scalars through pow(),
+    # which can round differently
+    d_lat = lat - merch_lat
+    d_long = long - merch_long
+    return np.sqrt(d_lat * d_lat + d_long * d_long)
+
+
+def amount_per_population(amt, city_pop):
+    return amt / (city_pop + 1)  # Avoid division by zero
+
+
+def transaction_hour(unix_time):
+    return (unix_time // 3600) % 24
+
+
+def day_of_week(unix_time):
+    return (unix_time // (3600 * 24)) % 7
+
+
+def high_amount_flag(amt):
+    return amt > 200
+
+
+# === Registry ===
+_REGISTRY = [
+    StatefulFeatures(
+        {'time_since_last_transaction': np.int64},
+        ['cc_num', 'unix_time'],
+        lambda state, cc_nums, unix_times, undo_logs=None: {
+            'time_since_last_transaction': state.card_state.observe_batch(cc_nums, unix_times, undo_logs)},
+        lambda state, cc_num, unix_time, undo_log=None: {
+            'time_since_last_transaction': state.card_state.observe(cc_num, unix_time, undo_log)},
+        lambda cc_num, unix_time: int(unix_time),
+    ),
+    Feature('distance', np.float64, ['lat', 'long', 'merch_lat', 'merch_long'], distance),
+    Feature('amount_per_population', np.float64, ['amt', 'city_pop'], amount_per_population),
+    Feature('log_amt', np.float64, ['amt'], np.log1p),
+    Feature('transaction_hour', np.int64, ['unix_time'], transaction_hour),
+    Feature('day_of_week', np.int64, ['unix_time'], day_of_week),
+    Feature('high_amount_flag', np.int8, ['amt'], high_amount_flag),
+    StatefulFeatures(
+        {feat: np.float64 if feat.startswith('amt_sum') else np.int64 for feat in VELOCITY_FEATURES},
+        ['cc_num', 'unix_time', 'amt', 'merchant'],
+        lambda state, *columns, undo_logs=None: state.velocity_engine.compute_batch(*columns, undo_logs=undo_logs),
+        lambda state, *values, undo_log=None: state.velocity_engine.update(*values, undo_log=undo_log),
+        lambda cc_num, unix_time, amt, merchant: check_times([int(unix_time)]),
+    ),
+]
+FEATURES = {name: feature for feature in _REGISTRY for name in feature.names}
+
+# All model features in training order: the raw numeric fields, then the derived ones
+FEATURE_NAMES = ['amt', 'unix_time', 'lat', 'long', 'merch_lat', 'merch_long', 'city_pop',
+                 'time_since_last_transaction', 'distance', 'amount_per_population', 'log_amt',
+                 'transaction_hour', 'day_of_week', 'high_amount_flag'] + VELOCITY_FEATURES
+
+
+def dtype_of(name):
+    """Declared dtype of a feature or numeric field."""
+    if name in FIELDS:
+        return np.dtype(FIELDS[name])
+    feature = FEATURES[name]
+    return feature.dtypes[name] if feature.stateful else feature.dtype
+
+
+class _Plan:
+    """What computing a list of features takes: the features to run in order and the fields read."""
+
+    def __init__(self, feature_names):
+        unknown = [name for name in feature_names if name not in FEATURES and name not in FIELDS]
+        if unknown:
+            raise KeyError(f"Unknown features: {unknown}")
+        wanted = set(feature_names)
+        self.features = [feature for feature in _REGISTRY if wanted.intersection(feature.names)]
+        self.fields = [name for name in FIELDS if name in wanted or
+                       any(name in feature.inputs for feature in self.features)]
+        # Columns needed once the stateful features have been observed
+        self.observed_inputs = [name for name in FIELDS if name in wanted or
+                                any(name in feature.inputs for feature in self.features if not feature.stateful)]
+        self.observed_inputs += [name for feature in self.features if feature.stateful for name in feature.names]
+
+
+@lru_cache(maxsize=64)
+def _plan(feature_names):
+    return _Plan(feature_names)
+
+
+def required_fields(feature_names):
+    """Raw fields a transaction needs for compute_one/compute_batch of feature_names."""
+    return list(_plan(tuple(feature_names)).fields)
+
+
+def observed_inputs(feature_names):
+    """
+    Numeric columns compute_batch needs once the stateful features are known (e.g. from
+    observe_one): the fields of the stateless features plus the stateful features themselves.
+    """
+    return list(_plan(tuple(feature_names)).observed_inputs)
+
+
+# === Entry Points ===
+def compute_batch(columns, feature_names, state=None):
+    """
+    Computes feature_names over a dict of numpy columns, rows in time (file) order.
+    :param state: FeatureState to read and update; a fresh one (as for a training file) if None.
+    :return: Dict of feature columns in their declared dtypes.
+    """
+    plan = _plan(tuple(feature_names))
+    values = {}
+    for name in plan.fields:
+        if name in columns:
+            values[name] = np.asarray(columns[name]) if FIELDS[name] is None else \
+                np.asarray(columns[name], dtype=FIELDS[name])
+
+    for feature in plan.features:
+        if feature.stateful:
+            if all(name in columns for name in feature.names):
+                outputs = {name: columns[name] for name in feature.names}
+            else:
+                missing = [name for name in feature.inputs if name not in values]
+                if missing:
+                    raise KeyError(f"Missing fields: {missing}")
+                if state is None:
+                    state = FeatureState()
+                outputs = feature.observe_batch(state, *[values[name] for name in feature.inputs])
+            for name in feature.names:
+                values[name] = np.asarray(outputs[name], dtype=feature.dtypes[name])
+        else:
+            missing = [name for name in feature.inputs if name not in values]
+            if missing:
+                raise KeyError(f"Missing fields: {missing}")
+            values[feature.name] = np.asarray(feature.kernel(*[values[name] for name in feature.inputs]),
+                                              dtype=feature.dtype)
+
+    missing = [name for name in feature_names if name not in values]
+    if missing:
+        raise KeyError(f"Missing fields: {missing}")
+    return {name: values[name] for name in feature_names}
+
+
+def validate(transaction, feature_names):
+    """
+    Checks that a transaction has every field feature_names need, that the numeric
+    ones parse and that the per-card state can take it, so a bad payload fails before
+    any state is updated.
+    :raises ValueError: On a missing field, one that is not a number or out of range.
+    """
+    plan = _plan(tuple(feature_names))
+    missing = [name for name in plan.fields if name not in transaction]
+    if missing:
+        raise ValueError(f"Missing fields: {missing}")
+    for name in plan.fields:
+        if FIELDS[name] is not None:
+            try:
+                float(transaction[name])
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid {name}: {transaction[name]!r}") from None
+    for feature in plan.features:
+        if feature.stateful and feature.check is not None and any(name not in transaction for name in feature.names):
+            feature.check(*[transaction[name] for name in feature.inputs])
+
+
+def rollback(undo_log):
+    """Reverts the state updates recorded in undo_log, newest first, and empties it."""
+    while undo_log:
+        undo_log.pop()()
+
+
+def observe_one(transaction, feature_names, state, undo_log=None):
+    """
+    Fills in the stateful features of one transaction (updating state) unless already present.
+    :param undo_log: List collecting how to revert the state updates (see rollback).
+    """
+    validate(transaction, feature_names)
+    for feature in _plan(tuple(feature_names)).features:
+        if feature.stateful and any(name not in transaction for name in feature.names):
+            transaction.update(feature.observe_one(state, *[transaction[name] for name in feature.inputs],
+                                                   undo_log=undo_log))
+    return transaction
+
+
+def observe_batch(transactions, feature_names, state, undo_logs=None):
+    """
+    observe_one over a list of transactions in row order, with one batch kernel call
+    per stateful feature for the rows that lack it. The transactions must have passed
+    validate(); their features are filled in as the declared dtypes' Python values.
+    :param undo_logs: One list per transaction collecting how to revert its state updates.
+    """
+    for feature in _plan(tuple(feature_names)).features:
+        if not feature.stateful:
+            continue
+        rows = [i for i, transaction in enumerate(transactions) if any(name not in transaction for name in feature.names)]
+        if not rows:
+            continue
+        columns = [np.asarray([transactions[i][name] for i in rows], dtype=FIELDS[name]) for name in feature.inputs]
+        outputs = feature.observe_batch(state, *columns,
+                                        undo_logs=[undo_logs[i] for i in rows] if undo_logs is not None else None)
+        for name in feature.names:
+            for i, value in zip(rows, np.asarray(outputs[name], dtype=feature.dtypes[name]).tolist()):
+                transactions[i][name] = value
+    return transactions
+
+
+def compute_one(transaction, feature_names, state, undo_log=None):
+    """
+    Computes feature_names for one transaction dict, in place, with the batch kernels
+    applied to its scalars. Values are plain Python floats and ints.
+    :param undo_log: List collecting how to revert the state updates (see rollback).
+    """
+    validate(transaction, feature_names)
+    for feature in _plan(tuple(feature_names)).features:
+        if feature.stateful:
+            if any(name not in transaction for name in feature.names):
+                transaction.update(feature.observe_one(state, *[transaction[name] for name in feature.inputs],
+                                                       undo_log=undo_log))
+        else:
+            value = feature.kernel(*[transaction[name] for name in feature.inputs])
+            transaction[feature.name] = float(value) if feature.dtype.kind == 'f' else int(value)
+    return transaction
+
+
+class FeatureStream:
+    """
+    compute_batch over consecutive chunks of one row stream (e.g. a CSV read in
+    chunks): the per-card state carries over, so the result matches one batch pass.
+    """
+
+    def __init__(self, feature_names, state=None):
+        self.feature_names = list(feature_names)
+        self.state = state if state is not None else FeatureState()
+
+    def process(self, columns):
+        return compute_batch(columns, self.feature_names, self.state)
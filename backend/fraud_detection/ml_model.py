@@ -1,72 +1,303 @@
 import json
-import pickle
-import pandas as pd
-import numpy as np
-from sklearn.preprocessing import StandardScaler
 import os
+import threading
 
+import numpy as np
+
+import config
+from fraud_detection import features
+from fraud_detection.artifact import load_artifact, load_pickle
+from fraud_detection.card_state import CardStateStore
+from fraud_detection.cascade import CascadeStats
+from fraud_detection.velocity import VelocityEngine
+
+
+def load_model(model_path=config.MODEL_PATH, engine=config.MODEL_ENGINE):
+    """
+    Loads the trained fraud detection model and its scaling parameters.
+    :param model_path: Artifact root or version directory, or a legacy .pkl file.
+    :param engine: "xgboost" to score with the booster itself, or "native" to use the
+                   flat-array CompiledTreeEnsemble.
+    :return: ModelBundle (its prescreen is dropped when CASCADE_ENABLED is off or it has
+             no tuned threshold)
+    """
+    if os.path.isdir(model_path):
+        bundle = load_artifact(model_path, engine, verify=config.MODEL_VERIFY_CHECKSUMS)
+    else:
+        bundle = load_pickle(model_path, engine)
+    if bundle.prescreen is not None and bundle.prescreen.threshold is None:
+        print(f"[WARNING] The cascade prescreen of {model_path} has no tuned threshold; scoring without it "
+              f"(tune it with model/evaluate_model.py --save-cascade)")
+        bundle.prescreen = None
+    if not config.CASCADE_ENABLED:
+        bundle.prescreen = None
+    return bundle
+
+
+# The model is loaded on first use, not at import
+_bundle = None
+_bundle_lock = threading.Lock()
+
+
+def get_bundle():
+    """The current ModelBundle, loaded on first call."""
+    global _bundle
+    if _bundle is None:
+        with _bundle_lock:
+            if _bundle is None:
+                _bundle = load_model()
+    return _bundle
+
+
+def set_bundle(bundle, warm_up=True):
+    """
+    Makes bundle the one new predictions use. Predictions already running finish
+    with the bundle they started with, so a swap never pauses or mixes models.
+    :param warm_up: Score one dummy row first, so the first request does not pay
+                    for the new model's lazy initialisation.
+    :return: The previous bundle (None if none was loaded yet).
+    """
+    global _bundle
+    if warm_up:
+        bundle.model.predict_proba(np.zeros((1, bundle.n_features), dtype=np.float32))
+    with _bundle_lock:
+        previous, _bundle = _bundle, bundle
+    return previous
 
-def load_model(model_path="../data/fraud_model.pkl"):
-    """Loads the trained fraud detection model and scaler."""
-    with open(model_path, 'rb') as f:
-        data = pickle.load(f)
-    
-    if not isinstance(data, dict):
-        raise ValueError(f"Loaded data is not a dictionary. Got type: {type(data)}")
 
-    expected_keys = {"model", "scaler", "features", "best_threshold"}
-    missing_keys = expected_keys - data.keys()
-    if missing_keys:
-        raise KeyError(f"Missing keys in loaded model: {missing_keys}")
+def __getattr__(name):
+    """model, feature_names, best_threshold, ... as module attributes (loads the model)."""
+    if name in ("model", "feature_names", "best_threshold", "scaler_mean", "scaler_scale",
+                "prescreen", "n_features", "velocity_enabled"):
+        return getattr(get_bundle(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-    return data["model"], data["scaler"], data["features"], data["best_threshold"]
 
+# Transactions seen by the prescreen and cleared without the full model
+cascade_stats = CascadeStats()
+
+# Last-seen time per card, for time_since_last_transaction (warm-started by the app on boot)
+card_state = CardStateStore(max_cards=config.CARD_STATE_MAX_CARDS)
+
+# Rolling-window velocity features per card, only maintained if the model uses them
+velocity_engine = VelocityEngine(history_size=config.VELOCITY_HISTORY_SIZE,
+                                 max_cards=config.VELOCITY_MAX_CARDS)
+
+# Both stores together, as the stateful features read them
+feature_state = features.FeatureState(card_state, velocity_engine)
+
+
+def observe_card(transaction, undo_log=None, bundle=None):
+    """
+    Updates the per-card stores with this transaction and fills in its stateful features.
+    :param bundle: ModelBundle whose features to fill in (default: the current one).
+    """
+    bundle = bundle or get_bundle()
+    return features.observe_one(transaction, bundle.feature_names, feature_state, undo_log)
+
+
+def rollback_observed(undo_logs):
+    """
+    Reverts the per-card state updates of transactions that were scored but then not
+    stored (e.g. rejected with 503 and retried later), newest first.
+    :param undo_logs: One undo log per transaction, as filled by predict_fraud(_batch).
+    """
+    for undo_log in reversed(undo_logs):
+        features.rollback(undo_log)
 
-# Load model & scaler
-model, scaler, feature_names, best_threshold = load_model()
 
 # === Compute Derived Features ===
-def compute_derived_features(transaction):
-    """Computes additional features required for prediction."""
-    transaction['distance'] = np.sqrt((transaction['lat'] - transaction['merch_lat'])**2 +
-                                      (transaction['long'] - transaction['merch_long'])**2)
-    transaction['amount_per_population'] = transaction['amt'] / (transaction['city_pop'] + 1)
-    transaction['log_amt'] = np.log1p(transaction['amt'])
-    transaction['transaction_hour'] = (transaction['unix_time'] // 3600) % 24
-    transaction['day_of_week'] = (transaction['unix_time'] // (3600 * 24)) % 7
-    transaction['high_amount_flag'] = int(transaction['amt'] > 200)
-
-    # Add a default value for 'time_since_last_transaction'
-    transaction['time_since_last_transaction'] = transaction.get('time_since_last_transaction', 0)
-    
-    return transaction
+def compute_derived_features(transaction, undo_log=None, bundle=None):
+    """
+    Computes additional features required for prediction.
+    :param bundle: ModelBundle whose features to compute (default: the current one).
+    """
+    bundle = bundle or get_bundle()
+    return features.compute_one(transaction, bundle.feature_names, feature_state, undo_log)
+
+
+# === Single-Row Fast Path ===
+# The bundle holds the StandardScaler parameters as plain arrays, so a single row never
+# goes through pandas/sklearn.
+# Preallocated per-thread buffers (Flask serves requests from several threads)
+_row_buffers = threading.local()
+
+
+def _get_row_buffers(n_features):
+    """Returns this thread's (float64 staging row, float32 model input row)."""
+    buffers = getattr(_row_buffers, "rows", None)
+    if buffers is None or len(buffers[0]) != n_features:
+        buffers = (np.empty(n_features, dtype=np.float64), np.empty((1, n_features), dtype=np.float32))
+        _row_buffers.rows = buffers
+    return buffers
 
 
-def predict_fraud(json_input):
-    """Predicts fraud probability from JSON input."""
+def predict_fraud(json_input, undo_log=None):
+    """
+    Predicts fraud probability from JSON input.
+    :param undo_log: List receiving how to revert the card state updates, for a caller
+                     that may not store the transaction. On an error they are reverted here.
+    """
+    bundle = get_bundle()
+    observed = []
     try:
         if isinstance(json_input, str):  
             transaction = json.loads(json_input)  
         else:  
             transaction = json_input 
 
-        transaction = compute_derived_features(transaction)
+        transaction = compute_derived_features(transaction, observed, bundle)
 
-        missing_features = [feat for feat in feature_names if feat not in transaction]
+        missing_features = [feat for feat in bundle.feature_names if feat not in transaction]
         if missing_features:
+            features.rollback(observed)
             return {"error": f"Missing features: {missing_features}"}
 
-        transaction_df = pd.DataFrame([transaction])
-        transaction_scaled = scaler.transform(transaction_df[feature_names])
+        # Scale in float64 exactly like StandardScaler.transform (unix_time does not fit
+        # float32), then hand xgboost the float32 row it would convert to anyway
+        staging_row, model_row = _get_row_buffers(bundle.n_features)
+        staging_row[:] = [transaction[feat] for feat in bundle.feature_names]
+        np.subtract(staging_row, bundle.scaler_mean, out=staging_row)
+        np.divide(staging_row, bundle.scaler_scale, out=staging_row)
 
-        fraud_probability = model.predict_proba(transaction_scaled)[0][1]
-        fraud_label = int(fraud_probability > best_threshold)
+        # Cascade: clearly benign transactions stop at the prescreen. Its probability is
+        # on another scale, so it is capped to stay consistent with is_fraud = 0
+        if bundle.prescreen is not None:
+            prescreen_probability = bundle.prescreen.predict_one(staging_row)
+            if prescreen_probability < bundle.prescreen.threshold:
+                cascade_stats.record(1, 1)
+                if undo_log is not None:
+                    undo_log.extend(observed)
+                return {"fraud_score": min(prescreen_probability, float(bundle.best_threshold)), "is_fraud": 0}
+            cascade_stats.record(1, 0)
 
+        model_row[0] = staging_row
+
+        fraud_probability = bundle.model.predict_proba(model_row)[0][1]
+        fraud_label = int(fraud_probability > bundle.best_threshold)
+
+        if undo_log is not None:
+            undo_log.extend(observed)
         return {
             "fraud_score": float(fraud_probability),
             "is_fraud": fraud_label
         }
     
     except Exception as e:
+        features.rollback(observed)
         return {"error": str(e)}
 
+
+# === Batch Scoring ===
+def raw_fields_of(bundle):
+    """Fields a transaction must carry for score_raw: the raw inputs and the stateful features."""
+    return features.observed_inputs(bundle.feature_names)
+
+
+def score_raw(bundle, raw, raw_fields, stats=cascade_stats):
+    """
+    Fraud probabilities for already observed transactions, without touching card state.
+    :param raw: float64 matrix with one row per transaction and one column per raw field.
+    :param stats: CascadeStats to record prescreen decisions in (None to skip).
+    """
+    columns = features.compute_batch({feat: raw[:, j] for j, feat in enumerate(raw_fields)},
+                                     bundle.feature_names)
+
+    # Same arithmetic as scaler.transform, without building a DataFrame
+    batch = np.column_stack([columns[feat] for feat in bundle.feature_names]).astype(np.float64)
+    batch_scaled = (batch - bundle.scaler_mean) / bundle.scaler_scale
+
+    if bundle.prescreen is None:
+        return bundle.model.predict_proba(batch_scaled.astype(np.float32))[:, 1]
+
+    # Cascade: only rows the prescreen cannot clear go to the full model
+    fraud_probabilities = bundle.prescreen.predict_proba(batch_scaled)
+    uncertain = fraud_probabilities >= bundle.prescreen.threshold
+    np.minimum(fraud_probabilities, bundle.best_threshold, out=fraud_probabilities)
+    if uncertain.any():
+        fraud_probabilities[uncertain] = bundle.model.predict_proba(
+            batch_scaled[uncertain].astype(np.float32))[:, 1]
+    if stats is not None:
+        stats.record(len(raw), int(len(raw) - uncertain.sum()))
+    return fraud_probabilities
+
+
+def predict_fraud_batch(json_inputs, undo_logs=None):
+    """
+    Predicts fraud probabilities for a list of transactions with one model call.
+    The stateful features of the valid rows are observed in one batch kernel call each,
+    leaving the same card state and undo entries as predict_fraud row by row.
+    :param json_inputs: List of transaction dicts (or JSON strings).
+    :param undo_logs: One list per input receiving how to revert its card state updates,
+                      for a caller that may not store it (see predict_fraud). Without them
+                      nothing is recorded, and rows that fail after their stateful features
+                      were observed keep their card state updates (as a backfill wants).
+    :return: One result dict per input, in the same order. Rows that cannot be
+             scored get {"error": ...} without failing the rest of the batch.
+    """
+    bundle = get_bundle()
+    results = [None] * len(json_inputs)
+    raw_fields = raw_fields_of(bundle)
+
+    # Validate rows one by one so a bad row only fails itself, before any state is updated
+    transactions = []
+    valid_idx = []
+    for i, json_input in enumerate(json_inputs):
+        try:
+            transaction = json.loads(json_input) if isinstance(json_input, str) else json_input
+            features.validate(transaction, bundle.feature_names)
+            transactions.append(transaction)
+            valid_idx.append(i)
+        except Exception as e:
+            results[i] = {"error": str(e)}
+
+    if not valid_idx:
+        return results
+
+    observed = [[] for _ in valid_idx] if undo_logs is not None else [None] * len(valid_idx)
+    try:
+        features.observe_batch(transactions, bundle.feature_names, feature_state,
+                               observed if undo_logs is not None else None)
+    except Exception as e:
+        if undo_logs is not None:
+            rollback_observed(observed)
+        for i in valid_idx:
+            results[i] = {"error": str(e)}
+        return results
+
+    # Stateful features sent by the client are only checked here
+    raw_rows = []
+    scored_idx = []
+    scored_observed = []
+    for i, transaction, row_observed in zip(valid_idx, transactions, observed):
+        try:
+            raw_rows.append([float(transaction[feat]) for feat in raw_fields])
+            scored_idx.append(i)
+            scored_observed.append(row_observed)
+        except Exception as e:
+            if row_observed is not None:
+                features.rollback(row_observed)
+            results[i] = {"error": str(e)}
+
+    if not scored_idx:
+        return results
+
+    try:
+        fraud_probabilities = score_raw(bundle, np.array(raw_rows, dtype=np.float64), raw_fields)
+    except Exception as e:
+        if undo_logs is not None:
+            rollback_observed(scored_observed)
+        for i in scored_idx:
+            results[i] = {"error": str(e)}
+        return results
+
+    if undo_logs is not None:
+        for i, row_observed in zip(scored_idx, scored_observed):
+            undo_logs[i].extend(row_observed)
+    for i, fraud_probability in zip(scored_idx, fraud_probabilities):
+        results[i] = {
+            "fraud_score": float(fraud_probability),
+            "is_fraud": int(fraud_probability > bundle.best_threshold)
+        }
+
+    return results
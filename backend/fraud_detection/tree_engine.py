@@ -0,0 +1,213 @@
+import json
+import os
+import types
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional, the numpy traversal is used without it
+    njit = None
+    prange = range
+
+# Batches at least this large are scored across threads by the parallel kernel
+PARALLEL_MIN_ROWS = 256
+
+# Flat arrays that make up an ensemble, as written by save()
+ENSEMBLE_ARRAYS = ["roots", "feature", "threshold", "left", "right", "missing", "is_leaf", "value"]
+
+
+def _traverse(X, roots, feature, threshold, left, right, missing, is_leaf, value):
+    """Walks every tree for every row and returns the summed leaf values per row."""
+    margins = np.zeros(X.shape[0])
+    for i in prange(X.shape[0]):
+        total = 0.0
+        for t in range(roots.shape[0]):
+            node = roots[t]
+            while not is_leaf[node]:
+                x = X[i, feature[node]]
+                if np.isnan(x):
+                    node = missing[node]
+                elif x < threshold[node]:
+                    node = left[node]
+                else:
+                    node = right[node]
+            total += value[node]
+        margins[i] = total
+    return margins
+
+
+def _renamed(func, name):
+    """
+    A copy of func under another name. numba names its cache files after the function,
+    so without it the serial and parallel kernels would share one cache and could load
+    each other's compiled code.
+    """
+    copy = types.FunctionType(func.__code__, func.__globals__, name, func.__defaults__, func.__closure__)
+    copy.__qualname__ = name
+    return copy
+
+
+if njit is not None:
+    _traverse_compiled = njit(cache=True, nogil=True)(_renamed(_traverse, "_traverse_serial"))
+    _traverse_parallel = njit(cache=True, nogil=True, parallel=True)(_renamed(_traverse, "_traverse_parallel"))
+else:
+    _traverse_compiled = _traverse_parallel = None
+
+
+class CompiledTreeEnsemble:
+    """
+    Inference engine for a binary:logistic XGBoost gbtree model.
+
+    The booster's trees are exported once into flat numpy arrays (split feature, float32
+    threshold, left/right/missing child, leaf value), all trees sharing one node index
+    space. Rows are scored with a numba-compiled traversal when numba is installed
+    (multi-threaded for large batches unless set_params(n_jobs=1)), or a level-by-level
+    numpy traversal over all rows and trees at once otherwise.
+    Exposes predict_proba() and set_params() so it can stand in for the XGBClassifier.
+    """
+
+    def __init__(self, roots, feature, threshold, left, right, missing, is_leaf, value,
+                 base_margin, max_depth, use_numba=True):
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing = missing
+        self.is_leaf = is_leaf
+        self.value = value
+        self.base_margin = base_margin
+        self.max_depth = max_depth
+        self.use_numba = use_numba and _traverse_compiled is not None
+        self.parallel = True
+
+    @classmethod
+    def from_booster(cls, booster, use_numba=True):
+        """Exports an xgboost.Booster (or XGBClassifier) into flat arrays."""
+        if hasattr(booster, "get_booster"):
+            booster = booster.get_booster()
+
+        learner = json.loads(booster.save_raw("json"))["learner"]
+        objective = learner["objective"]["name"]
+        booster_name = learner["gradient_booster"]["name"]
+        if objective != "binary:logistic" or booster_name != "gbtree":
+            raise ValueError(f"Unsupported model: objective={objective}, booster={booster_name}")
+
+        # base_score is stored as a probability ("5E-1", or "[5E-1]" in newer versions)
+        base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+        base_margin = float(np.log(base_score / (1 - base_score)))
+
+        roots, feature, threshold, left, right, missing, is_leaf, value = ([] for _ in range(8))
+        max_depth = 0
+        offset = 0
+        for tree in learner["gradient_booster"]["model"]["trees"]:
+            tree_left = np.asarray(tree["left_children"], dtype=np.int32)
+            tree_right = np.asarray(tree["right_children"], dtype=np.int32)
+            tree_leaf = tree_left == -1
+            if any(tree["split_type"]):
+                raise ValueError("Categorical splits are not supported")
+
+            # Leaves point at themselves so a fixed number of steps is always safe
+            own_index = np.arange(len(tree_left), dtype=np.int32) + offset
+            tree_left = np.where(tree_leaf, own_index, tree_left + offset)
+            tree_right = np.where(tree_leaf, own_index, tree_right + offset)
+            default_left = np.asarray(tree["default_left"], dtype=bool)
+
+            roots.append(offset)
+            feature.append(np.where(tree_leaf, 0, tree["split_indices"]).astype(np.int32))
+            threshold.append(np.asarray(tree["split_conditions"], dtype=np.float32))
+            left.append(tree_left)
+            right.append(tree_right)
+            missing.append(np.where(default_left, tree_left, tree_right).astype(np.int32))
+            is_leaf.append(tree_leaf)
+            # For leaves, split_conditions holds the leaf value
+            value.append(np.where(tree_leaf, tree["split_conditions"], 0.0).astype(np.float32))
+
+            max_depth = max(max_depth, _tree_depth(tree["left_children"], tree["right_children"]))
+            offset += len(tree_left)
+
+        return cls(
+            roots=np.asarray(roots, dtype=np.int32),
+            feature=np.concatenate(feature),
+            threshold=np.concatenate(threshold),
+            left=np.concatenate(left),
+            right=np.concatenate(right),
+            missing=np.concatenate(missing),
+            is_leaf=np.concatenate(is_leaf),
+            value=np.concatenate(value),
+            base_margin=base_margin,
+            max_depth=max_depth,
+            use_numba=use_numba,
+        )
+
+    def save(self, directory):
+        """Writes the flat arrays as .npy files plus a small JSON header."""
+        os.makedirs(directory, exist_ok=True)
+        for name in ENSEMBLE_ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "ensemble.json"), "w") as f:
+            json.dump({"base_margin": self.base_margin, "max_depth": self.max_depth}, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r", use_numba=True):
+        """Reads an ensemble written by save(), memory-mapping the arrays by default."""
+        with open(os.path.join(directory, "ensemble.json")) as f:
+            header = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in ENSEMBLE_ARRAYS}
+        return cls(**arrays, base_margin=header["base_margin"], max_depth=header["max_depth"],
+                   use_numba=use_numba)
+
+    def set_params(self, n_jobs=None, **params):
+        """n_jobs=1 scores every batch on the calling thread; other XGBClassifier params do not apply."""
+        if n_jobs is not None:
+            self.parallel = n_jobs != 1
+        return self
+
+    def predict_margin(self, X):
+        """Raw log-odds for each row of X."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        if self.use_numba:
+            parallel = self.parallel and X.shape[0] >= PARALLEL_MIN_ROWS
+            kernel = _traverse_parallel if parallel else _traverse_compiled
+            margins = kernel(X, self.roots, self.feature, self.threshold, self.left,
+                             self.right, self.missing, self.is_leaf, self.value)
+        else:
+            margins = self._traverse_numpy(X)
+
+        return margins + self.base_margin
+
+    def _traverse_numpy(self, X):
+        """Advances every (row, tree) pair one level per step, max_depth steps in total."""
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            next_nodes = np.where(x < self.threshold[nodes], self.left[nodes], self.right[nodes])
+            nodes = np.where(np.isnan(x), self.missing[nodes], next_nodes)
+
+        return self.value[nodes].sum(axis=1, dtype=np.float64)
+
+    def predict_proba(self, X):
+        """Class probabilities in the XGBClassifier layout: column 1 is fraud."""
+        proba = 1.0 / (1.0 + np.exp(-self.predict_margin(X)))
+        return np.column_stack([1.0 - proba, proba])
+
+
+def _tree_depth(left_children, right_children):
+    """Depth (number of splits on the longest path) of one tree."""
+    depth = 0
+    stack = [(0, 0)]
+    while stack:
+        node, level = stack.pop()
+        if left_children[node] == -1:
+            depth = max(depth, level)
+        else:
+            stack.append((left_children[node], level + 1))
+            stack.append((right_children[node], level + 1))
+    return depth
@@ -0,0 +1,321 @@
+import threading
+import zlib
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+
+# Rolling windows in seconds
+WINDOWS = [("1h", 3600), ("24h", 24 * 3600), ("7d", 7 * 24 * 3600)]
+MERCHANT_WINDOW = 24 * 3600
+
+# Times are stored as uint32 seconds, which hold 1970 to 2106
+MAX_UNIX_TIME = 2 ** 32 - 1
+
+# Rows whose windows are gathered at once by compute_batch (each takes history_size slots)
+BATCH_ROWS = 16_384
+
+VELOCITY_FEATURES = [
+    'txn_count_1h', 'amt_sum_1h',
+    'txn_count_24h', 'amt_sum_24h',
+    'txn_count_7d', 'amt_sum_7d',
+    'distinct_merchants_24h',
+]
+
+
+def merchant_hash(merchant):
+    """Stable 32-bit merchant id (Python's hash() is salted per process)."""
+    return zlib.crc32(str(merchant).encode("utf-8"))
+
+
+def check_times(unix_times):
+    """Raises ValueError for times the uint32 ring buffers cannot hold (they would wrap)."""
+    unix_times = np.asarray(unix_times)
+    if len(unix_times) and (unix_times.min() < 0 or unix_times.max() > MAX_UNIX_TIME):
+        raise ValueError(f"unix_time outside 0..{MAX_UNIX_TIME}: "
+                         f"{unix_times[(unix_times < 0) | (unix_times > MAX_UNIX_TIME)][0]}")
+
+
+class VelocityEngine:
+    """
+    Per-card velocity features (count and amount sum over 1h/24h/7d, distinct merchants
+    over 24h), updated incrementally one transaction at a time.
+
+    Each card owns a fixed-size ring buffer of its most recent transactions, stored in
+    shared numpy slabs: 4 bytes of time, amount and merchant id per slot, so
+    history_size=32 costs ~390 bytes per card (10M cards ~4 GB). Counts in a window
+    saturate at history_size. Cards beyond max_cards are evicted least recently seen first.
+
+    update() scores one transaction online (predict_fraud); compute_batch() computes the
+    same windows for whole columns offline (the training CSV, the backfill) and leaves
+    the same state behind, so both produce identical values.
+    """
+
+    def __init__(self, history_size=32, max_cards=1_000_000, initial_capacity=1024):
+        self.history_size = history_size
+        self.max_cards = max_cards
+        self._slots = OrderedDict()  # card key -> slab row, in LRU order
+        self._free_slots = []
+        self._capacity = 0
+        self._lock = threading.Lock()
+        self._allocate(min(initial_capacity, max_cards))
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _allocate(self, capacity):
+        """Grows the slabs to hold `capacity` cards, keeping existing rows."""
+        def grow(old, dtype, shape):
+            new = np.zeros(shape, dtype=dtype)
+            if old is not None:
+                new[:len(old)] = old
+            return new
+
+        k = self.history_size
+        self._times = grow(getattr(self, "_times", None), np.uint32, (capacity, k))
+        self._amts = grow(getattr(self, "_amts", None), np.float32, (capacity, k))
+        self._merchants = grow(getattr(self, "_merchants", None), np.uint32, (capacity, k))
+        self._heads = grow(getattr(self, "_heads", None), np.uint16, capacity)
+        self._counts = grow(getattr(self, "_counts", None), np.uint16, capacity)
+        self._free_slots.extend(range(capacity - 1, self._capacity - 1, -1))
+        self._capacity = capacity
+
+    def _slot_for(self, key):
+        """Returns the slab row for a card, allocating (or evicting) one if needed."""
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._slots.move_to_end(key)
+            return slot
+
+        if not self._free_slots:
+            if self._capacity < self.max_cards:
+                self._allocate(min(self._capacity * 2, self.max_cards))
+            else:
+                _, evicted = self._slots.popitem(last=False)
+                self._free_slots.append(evicted)
+
+        slot = self._free_slots.pop()
+        self._heads[slot] = 0
+        self._counts[slot] = 0
+        self._slots[key] = slot
+        return slot
+
+    def update(self, cc_num, unix_time, amt, merchant, undo_log=None):
+        """
+        Records a transaction and returns its velocity features. Windows are
+        (unix_time - window, unix_time] and include the transaction itself.
+        :param undo_log: List to append a callable to that reverts this update (see undo).
+        """
+        key = str(cc_num)
+        unix_time = int(unix_time)
+        check_times([unix_time])
+        amt = float(amt)
+        merchant_id = merchant_hash(merchant)
+
+        with self._lock:
+            new_card = key not in self._slots
+            slot = self._slot_for(key)
+
+            # Append to the ring buffer
+            head = int(self._heads[slot])
+            overwritten = (self._times[slot, head], self._amts[slot, head], self._merchants[slot, head])
+            previous_count = int(self._counts[slot])
+            self._times[slot, head] = unix_time
+            self._amts[slot, head] = amt
+            self._merchants[slot, head] = merchant_id
+            self._heads[slot] = (head + 1) % self.history_size
+            count = min(previous_count + 1, self.history_size)
+            self._counts[slot] = count
+
+            # Until the ring wraps the filled slots are simply the first `count` ones
+            age = unix_time - self._times[slot, :count].astype(np.int64)
+            amts = self._amts[slot, :count]
+            merchants = self._merchants[slot, :count]
+
+            features = {}
+            for name, window in WINDOWS:
+                in_window = (age >= 0) & (age < window)
+                features[f'txn_count_{name}'] = int(in_window.sum())
+                features[f'amt_sum_{name}'] = float(amts[in_window].sum(dtype=np.float64))
+
+            in_window = (age >= 0) & (age < MERCHANT_WINDOW)
+            features['distinct_merchants_24h'] = len(np.unique(merchants[in_window]))
+
+        if undo_log is not None:
+            undo_log.append(lambda: self.undo(key, unix_time, slot, head, new_card, overwritten, previous_count))
+        return features
+
+    def undo(self, key, unix_time, slot, head, new_card, overwritten, previous_count):
+        """
+        Reverts update() of a transaction that was not stored after all, unless the card
+        has been updated again since (a later transaction was computed from it).
+        """
+        with self._lock:
+            if (self._slots.get(key) != slot or int(self._heads[slot]) != (head + 1) % self.history_size
+                    or int(self._times[slot, head]) != unix_time):
+                return
+            self._times[slot, head], self._amts[slot, head], self._merchants[slot, head] = overwritten
+            self._heads[slot] = head
+            self._counts[slot] = previous_count
+            if new_card:
+                del self._slots[key]
+                self._free_slots.append(slot)
+
+    def compute_batch(self, cc_nums, unix_times, amts, merchants, undo_logs=None):
+        """
+        update() over whole columns in row order (e.g. the training CSV, a scoring batch),
+        vectorized per card: each card's stored history and its rows are laid out as one
+        sequence, the history_size entries before every row are gathered with numpy, and
+        the store is touched once per card. A batch that would evict cards runs row by
+        row, since what a card restarts from then depends on the order of the updates.
+        :param undo_logs: One list per row, each receiving the callable update() would
+                          have appended for that row.
+        :return: dict of feature arrays aligned with the input rows.
+        """
+        n = len(cc_nums)
+        columns = {feat: np.zeros(n, dtype=np.float64) for feat in VELOCITY_FEATURES}
+        if not n:
+            return columns
+
+        keys = np.asarray(cc_nums)
+        times = np.asarray(unix_times, dtype=np.int64)
+        check_times(times)
+        # crc32 once per distinct merchant
+        merchant_index = {}
+        merchant_codes = np.fromiter((merchant_index.setdefault(merchant, len(merchant_index))
+                                      for merchant in np.asarray(merchants).tolist()), dtype=np.int64, count=n)
+        merchant_ids = np.array([merchant_hash(merchant) for merchant in merchant_index],
+                                dtype=np.int64)[merchant_codes]
+
+        # Rows grouped by card, in row order within each card (as in CardStateStore.observe_batch)
+        card_ids = keys
+        if keys.dtype.kind not in "iu":
+            index = {}
+            card_ids = np.fromiter((index.setdefault(key, len(index)) for key in keys.tolist()),
+                                   dtype=np.int64, count=n)
+        order = np.argsort(card_ids, kind="stable")
+        sorted_ids = card_ids[order]
+        starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+        ends = np.r_[starts[1:], n]
+        card_keys = [str(key) for key in keys[order[starts]].tolist()]
+
+        with self._lock:
+            new_cards = sum(key not in self._slots for key in card_keys)
+            if len(self._slots) + new_cards <= self.max_cards:
+                self._compute_grouped(columns, order, starts, ends, card_keys, times[order],
+                                      np.asarray(amts, dtype=np.float32)[order], merchant_ids[order], undo_logs)
+                return columns
+
+        for i, row in enumerate(zip(cc_nums, unix_times, amts, merchants)):
+            undo_log = undo_logs[i] if undo_logs is not None else None
+            for feat, value in self.update(*row, undo_log=undo_log).items():
+                columns[feat][i] = value
+        return columns
+
+    def _compute_grouped(self, columns, order, starts, ends, card_keys, times, amts, merchant_ids,
+                         undo_logs=None):
+        """compute_batch() of rows sorted by card, with room for all their cards (lock held)."""
+        k = self.history_size
+        n = len(order)
+        rows_per_card = ends - starts
+        card_of_row = np.repeat(np.arange(len(starts)), rows_per_card)
+        rank = np.arange(n) - starts[card_of_row]
+
+        # Slots in order of each card's last row, so recency matches row-by-row update()
+        slots = np.empty(len(starts), dtype=np.int64)
+        new_cards = np.zeros(len(starts), dtype=bool)
+        for card in np.argsort(order[ends - 1], kind="stable"):
+            new_cards[card] = card_keys[card] not in self._slots
+            slots[card] = self._slot_for(card_keys[card])
+        heads = self._heads[slots].astype(np.int64)
+        counts = self._counts[slots].astype(np.int64)
+
+        # One sequence per card: its stored history oldest first, then its rows
+        history_end = np.cumsum(counts)
+        card_start = starts + history_end - counts
+        row_seq = np.arange(n) + history_end[card_of_row]
+        card_of_history = np.repeat(np.arange(len(starts)), counts)
+        history_rank = np.arange(len(card_of_history)) - (history_end - counts)[card_of_history]
+        history_seq = card_start[card_of_history] + history_rank
+        history_slots = slots[card_of_history]
+        history_pos = (heads - counts)[card_of_history] + history_rank
+        history_pos %= k
+
+        size = n + len(card_of_history)
+        seq_times = np.empty(size, dtype=np.int64)
+        seq_amts = np.empty(size, dtype=np.float64)
+        seq_merchants = np.empty(size, dtype=np.int64)
+        seq_times[row_seq], seq_amts[row_seq], seq_merchants[row_seq] = times, amts, merchant_ids
+        seq_times[history_seq] = self._times[history_slots, history_pos]
+        seq_amts[history_seq] = self._amts[history_slots, history_pos]
+        seq_merchants[history_seq] = self._merchants[history_slots, history_pos]
+
+        # Each row sees the last history_size entries of its card up to itself, as update()
+        # does; times that go backwards simply leave entries out of the windows. Sums of
+        # float32 amounts are exact in float64, so their order does not matter
+        offsets = np.arange(k)
+        for first in range(0, n, BATCH_ROWS):
+            rows = slice(first, first + BATCH_ROWS)
+            position = row_seq[rows, None]
+            entries = position - offsets
+            filled = entries >= card_start[card_of_row[rows], None]
+            entries = np.where(filled, entries, position)
+            age = seq_times[position] - seq_times[entries]
+            filled &= age >= 0
+
+            out = order[rows]
+            for name, window in WINDOWS:
+                in_window = filled & (age < window)
+                columns[f'txn_count_{name}'][out] = in_window.sum(axis=1)
+                columns[f'amt_sum_{name}'][out] = np.where(in_window, seq_amts[entries], 0.0).sum(axis=1)
+
+            merchants = np.where(filled & (age < MERCHANT_WINDOW), seq_merchants[entries], -1)
+            merchants.sort(axis=1)
+            columns['distinct_merchants_24h'][out] = (
+                (merchants[:, 0] >= 0) + ((merchants[:, 1:] != merchants[:, :-1]) & (merchants[:, 1:] >= 0)).sum(axis=1))
+
+        if undo_logs is not None:
+            self._record_undo(undo_logs, order, slots, heads, counts, new_cards, card_keys, card_of_row, rank,
+                              times, amts, merchant_ids)
+
+        # Leave each ring buffer as the row-by-row updates would: the card's j-th row
+        # written at (head + j) % history_size, of which the last history_size remain
+        kept = rank >= rows_per_card[card_of_row] - k
+        kept_slots = slots[card_of_row[kept]]
+        kept_pos = (heads[card_of_row[kept]] + rank[kept]) % k
+        self._times[kept_slots, kept_pos] = times[kept]
+        self._amts[kept_slots, kept_pos] = amts[kept]
+        self._merchants[kept_slots, kept_pos] = merchant_ids[kept]
+        self._heads[slots] = (heads + rows_per_card) % k
+        self._counts[slots] = np.minimum(counts + rows_per_card, k)
+
+    def _record_undo(self, undo_logs, order, slots, heads, counts, new_cards, card_keys, card_of_row, rank,
+                     times, amts, merchant_ids):
+        """
+        Appends to each row's undo log the callable update() would have appended for it,
+        before _compute_grouped writes the ring buffers back (lock held).
+        """
+        k = self.history_size
+        row_slots = slots[card_of_row]
+        row_heads = (heads[card_of_row] + rank) % k
+        # What each row overwrites: the stored entry for a card's first history_size rows,
+        # then the card's own row history_size before it
+        earlier = np.maximum(np.arange(len(order)) - k, 0)
+        from_batch = rank >= k
+        overwritten_times = np.where(from_batch, times[earlier], self._times[row_slots, row_heads])
+        overwritten_amts = np.where(from_batch, amts[earlier], self._amts[row_slots, row_heads])
+        overwritten_merchants = np.where(from_batch, merchant_ids[earlier], self._merchants[row_slots, row_heads])
+        previous_counts = np.minimum(counts[card_of_row] + rank, k)
+        new_card = new_cards[card_of_row] & (rank == 0)
+
+        for row, card, unix_time, slot, head, new, overwritten, previous_count in zip(
+                order.tolist(), card_of_row.tolist(), times.tolist(), row_slots.tolist(), row_heads.tolist(),
+                new_card.tolist(), zip(overwritten_times.tolist(), overwritten_amts.tolist(),
+                                       overwritten_merchants.tolist()), previous_counts.tolist()):
+            undo_logs[row].append(partial(self.undo, card_keys[card], unix_time, slot, head, new, overwritten,
+                                          previous_count))
+
+    def clear(self):
+        with self._lock:
+            self._slots.clear()
+            self._free_slots = list(range(self._capacity - 1, -1, -1))
@@ -1,9 +1,43 @@
+"""
+Backfills historical transactions into transactions.db, scored by the fraud model.
+
+Inputs are streamed: JSON arrays are parsed incrementally, JSONL and CSV (e.g. the
+Kaggle fraudTrain.csv) line by line. Rows are scored in fixed-size chunks with one
+vectorized model call each, and every chunk is inserted with one executemany and
+committed, so memory stays flat however large the inputs are.
+
+The inputs are interleaved and can be shuffled through a bounded buffer. A model with
+stateful features (time since the card's last transaction, velocity) must see each
+card's transactions in time order, so for one the shuffle buffer defaults to 0.
+
+With --workers N, each chunk is split by card across N worker processes (each
+holding its own copy of the model and the state of its cards) and this process is
+the only writer. Completed chunks are recorded in a checkpoint
+file, so an interrupted run picks up where it stopped.
+
+Run from the backend directory:
+    python insert_historical_data.py                      # ../data/fraud.json + non_fraud.json
+    python insert_historical_data.py ../data/fraudTrain.csv
+    python insert_historical_data.py ../data/fraudTrain.csv --workers 8 --checkpoint backfill.ckpt
+"""
+import argparse
+import csv
+import itertools
 import json
+import multiprocessing
 import os
+import queue
 import random
+import re
+import time
+import traceback
+import zlib
 from flask import Flask
 from database.db_setup import Transaction, db  # Using the original database
-from fraud_detection.ml_model import predict_fraud
+from database.migrations import run_migrations
+from fraud_detection import features, ml_model
+from fraud_detection.ml_model import predict_fraud_batch
+import config
 
 # Ensure the backend directory exists
 os.makedirs("backend", exist_ok=True)
@@ -11,7 +45,7 @@ os.makedirs("backend", exist_ok=True)
 app = Flask(__name__)
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///transactions.db"
+app.config["SQLALCHEMY_DATABASE_URI"] = config.DATABASE_URI
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
@@ -20,48 +54,417 @@ db.init_app(app)
 # Get only the valid column names from the Transaction model
 TRANSACTION_FIELDS = {column.name for column in Transaction.__table__.columns}
 
-def process_and_insert_data():
-    try:
-        with open("../data/fraud.json") as fraud_file, open("../data/non_fraud.json") as non_fraud_file:
-            fraud_data = json.load(fraud_file)
-            non_fraud_data = json.load(non_fraud_file)
+# Columns copied from the input (id and trans_ts are generated, the rest comes from the model)
+INPUT_FIELDS = sorted(TRANSACTION_FIELDS - {"id", "trans_ts", "fraud_score", "is_fraud"})
+
+DEFAULT_INPUTS = ["../data/fraud.json", "../data/non_fraud.json"]
+
+# Shuffle buffer of a model without stateful features, unless BACKFILL_SHUFFLE_BUFFER is set
+DEFAULT_SHUFFLE_BUFFER = 10_000
+
+# CSV values arrive as strings; these are converted before scoring
+CSV_TYPES = {
+    "amt": float, "lat": float, "long": float, "merch_lat": float, "merch_long": float,
+    "city_pop": int, "zip": int, "unix_time": int, "is_fraud": int,
+}
+
+# Whitespace, commas and the opening bracket between elements of a JSON array
+_JSON_ARRAY_GAP = re.compile(r"[\s,\[]*")
+
+
+def iter_json_array(path, read_size=1 << 20):
+    """
+    Yields the elements of a top-level JSON array without loading the whole file.
+    :raises ValueError: if the file ends inside the array (e.g. a truncated download).
+    """
+    decoder = json.JSONDecoder()
+    with open(path) as f:
+        buffer = ""
+        while True:
+            chunk = f.read(read_size)
+            buffer += chunk
+            pos = 0
+            while True:
+                pos = _JSON_ARRAY_GAP.match(buffer, pos).end()
+                if pos == len(buffer):
+                    break
+                if buffer[pos] == "]":
+                    return
+                try:
+                    element, pos_end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if not chunk:
+                        raise
+                    break  # Element continues in the next read
+                yield element
+                pos = pos_end
+            buffer = buffer[pos:]
+            if not chunk:
+                raise ValueError(f"{path} ends before the closing ] of its JSON array")
+
+
+def iter_jsonl(path):
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_csv(path):
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            for field, cast in CSV_TYPES.items():
+                if row.get(field) not in (None, ""):
+                    row[field] = cast(row[field])
+            yield row
+
 
-        all_data = fraud_data + non_fraud_data  # Combine both datasets
-        
-        # ✅ Shuffle data to mix fraud and non-fraud transactions
-        random.shuffle(all_data)
+def iter_transactions(path):
+    """Streams transaction dicts from a .json (array), .jsonl/.ndjson or .csv file."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return iter_csv(path)
+    if extension in (".jsonl", ".ndjson"):
+        return iter_jsonl(path)
+    return iter_json_array(path)
 
-        processed_transactions = []
+
+def mix_inputs(paths, rng):
+    """
+    Interleaves several inputs, drawing from each with probability proportional to
+    its file size, so the stream is mixed throughout rather than file after file.
+    """
+    sources = [iter_transactions(path) for path in paths]
+    weights = [max(os.path.getsize(path), 1) for path in paths]
+    while sources:
+        i = rng.choices(range(len(sources)), weights=weights)[0]
+        try:
+            yield next(sources[i])
+        except StopIteration:
+            del sources[i], weights[i]
+
+
+def shuffle_stream(items, buffer_size, rng):
+    """Shuffles a stream through a bounded buffer (each item leaves at a random later point)."""
+    if buffer_size <= 1:
+        yield from items
+        return
+    buffer = []
+    for item in items:
+        if len(buffer) < buffer_size:
+            buffer.append(item)
+            continue
+        i = rng.randrange(buffer_size)
+        yield buffer[i]
+        buffer[i] = item
+    rng.shuffle(buffer)
+    yield from buffer
+
+
+def resolve_shuffle_buffer(shuffle_buffer=None):
+    """
+    The shuffle buffer, config.BACKFILL_SHUFFLE_BUFFER if None. Unset, it is
+    DEFAULT_SHUFFLE_BUFFER, or 0 (input order) for a model with stateful features.
+    """
+    stateful = any(feat in features.FEATURES and features.FEATURES[feat].stateful
+                   for feat in ml_model.feature_names)
+    if shuffle_buffer is None:
+        shuffle_buffer = config.BACKFILL_SHUFFLE_BUFFER
+    if shuffle_buffer is None:
+        return 0 if stateful else DEFAULT_SHUFFLE_BUFFER
+    if stateful and shuffle_buffer > 1:
+        print(f"[WARNING] A {shuffle_buffer}-row shuffle scores cards' transactions out of time order, "
+              "so their stateful features will not match the serving path")
+    return shuffle_buffer
+
+
+def iter_chunks(paths, chunk_size, shuffle_buffer, seed):
+    """Lists of chunk_size transactions; the same seed always gives the same chunks."""
+    rng = random.Random(seed)
+
+    # ✅ Mix fraud and non-fraud transactions as they stream in
+    transactions = shuffle_stream(mix_inputs(paths, rng), shuffle_buffer, rng)
+    while True:
+        chunk = list(itertools.islice(transactions, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score_chunk(chunk):
+    """
+    Scores a chunk with one model call and one batch kernel call per stateful feature.
+    Nothing is undone later, so no undo entries are recorded.
+    :return: Row dicts ready for insertion; rows that fail are reported and skipped.
+    """
+    rows = []
+    for txn, fraud_result in zip(chunk, predict_fraud_batch(chunk)):
+        try:
+            if "error" in fraud_result:
+                raise ValueError(fraud_result["error"])
+            row = {key: txn[key] for key in INPUT_FIELDS}  # Filter out unwanted fields
+            row["fraud_score"] = float(fraud_result["fraud_score"])
+            row["is_fraud"] = bool(int(fraud_result["is_fraud"]))
+            rows.append(row)
+        except Exception as e:
+            print(f"[ERROR] Skipping transaction {txn.get('trans_num', 'UNKNOWN')} - {str(e)}")
+    return rows
+
+
+def process_and_insert_data(paths=None, chunk_size=config.BACKFILL_CHUNK_SIZE, shuffle_buffer=None, seed=None):
+    try:
+        shuffle_buffer = resolve_shuffle_buffer(shuffle_buffer)
+        # Rows already stored (e.g. from an earlier run) are skipped, not fatal
+        insert = Transaction.__table__.insert().prefix_with("OR IGNORE")
+        total_read = 0
         total_inserted = 0
+        start = time.perf_counter()
 
         with app.app_context():
             db.create_all()  # Ensure tables exist
-            
-            for txn in all_data:
-                try:
-                    fraud_result = predict_fraud(txn)  # Run fraud detection
-                    
-                    # Add fraud details
-                    txn["fraud_score"] = float(fraud_result.get("fraud_score", -1))
-                    txn["is_fraud"] = bool(int(fraud_result.get("is_fraud", 0)))
+            run_migrations(db.engine)
 
-                    # Filter out unwanted fields
-                    filtered_txn = {key: value for key, value in txn.items() if key in TRANSACTION_FIELDS}
+            for chunk in iter_chunks(paths or DEFAULT_INPUTS, chunk_size, shuffle_buffer, seed):
+                total_read += len(chunk)
 
-                    processed_transactions.append(Transaction(**filtered_txn))
-                    total_inserted += 1
+                rows = score_chunk(chunk)
+                if rows:
+                    # One executemany and commit per chunk (triggers fold rows into the /stats rollups)
+                    with db.engine.begin() as conn:
+                        total_inserted += conn.execute(insert, rows).rowcount
 
-                except Exception as e:
-                    print(f"[ERROR] Skipping transaction {txn.get('trans_num', 'UNKNOWN')} - {str(e)}")
+                elapsed = time.perf_counter() - start
+                print(f"  {total_read} read, {total_inserted} inserted ({total_read / elapsed:,.0f} rows/s)")
 
-            # Bulk insert processed transactions
-            if processed_transactions:
-                db.session.bulk_save_objects(processed_transactions)
-                db.session.commit()
-                print(f"✅ Data processed and inserted successfully! Total records added: {total_inserted}")
+        print(f"✅ Data processed and inserted successfully! Total records added: {total_inserted}")
 
     except Exception as e:
         print(f"❌ Error processing transactions: {str(e)}")
 
+
+# === Parallel Backfill ===
+def _card_partition(txn, workers):
+    """Worker that owns this transaction's card (stable across processes and runs)."""
+    return zlib.crc32(str(txn.get("cc_num")).encode("utf-8")) % workers
+
+
+def _worker_main(inbox, outbox):
+    """
+    Scoring process. It holds its own copy of the model and of the per-card state for
+    the cards routed to it, and handles its parts strictly in chunk order.
+    """
+    # One scoring thread per process: the workers provide the parallelism
+    if hasattr(ml_model.model, "set_params"):
+        ml_model.model.set_params(n_jobs=1)
+    try:
+        import numba
+        numba.set_num_threads(1)
+    except ImportError:
+        pass
+
+    try:
+        while True:
+            task = inbox.get()
+            if task is None:
+                return
+            key, part, score = task
+            start = time.perf_counter()
+            if score:
+                rows = score_chunk(part)
+            else:
+                # Checkpointed part: only replay it through the card state
+                rows = None
+                for txn in part:
+                    try:
+                        ml_model.observe_card(txn)
+                    except Exception:
+                        pass
+            outbox.put((key, len(part), rows, os.getpid(), time.perf_counter() - start))
+    except Exception:
+        outbox.put(traceback.format_exc())
+
+
+def _open_checkpoint(path, settings):
+    """
+    Reads the parts completed by an earlier run and opens the checkpoint for appending.
+    The first line records the run settings; resuming with different ones would
+    produce different chunks, so it is refused.
+    :return: (settings to use, completed (chunk, worker) parts, file opened for appending)
+    """
+    completed = set()
+    if os.path.exists(path):
+        with open(path) as f:
+            header = json.loads(f.readline())
+            if settings["seed"] is None:
+                settings = dict(settings, seed=header["seed"])  # Resume with the recorded seed
+            if header != settings:
+                raise ValueError(f"Checkpoint {path} was written with different settings: {header}")
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    completed.add((entry["chunk"], entry["worker"]))
+        return settings, completed, open(path, "a")
+
+    if settings["seed"] is None:
+        settings = dict(settings, seed=random.randrange(2 ** 32))  # Chunks must be reproducible
+    f = open(path, "w")
+    f.write(json.dumps(settings) + "\n")
+    f.flush()
+    return settings, completed, f
+
+
+def parallel_insert_data(paths=None, workers=os.cpu_count(), checkpoint="backfill.ckpt",
+                         chunk_size=config.BACKFILL_CHUNK_SIZE,
+                         shuffle_buffer=None, seed=None):
+    """
+    Scores chunks in worker processes and inserts them from this process.
+
+    Stateful features (time since the card's last transaction, velocity) only depend
+    on earlier transactions of the same card, so each chunk is split by card: every
+    worker owns a fixed share of the cards and sees their transactions in input
+    order, and scores match a single-process run exactly.
+
+    A part is checkpointed only after its commit. On resume, checkpointed parts are
+    replayed through the card state without scoring; a part that was committed but
+    not yet checkpointed is scored again and INSERT OR IGNORE skips its rows.
+    """
+    shuffle_buffer = resolve_shuffle_buffer(shuffle_buffer)
+    settings = {"paths": [os.path.abspath(path) for path in paths or DEFAULT_INPUTS],
+                "chunk_size": chunk_size, "shuffle_buffer": shuffle_buffer,
+                "workers": workers, "seed": seed}
+    try:
+        settings, completed, checkpoint_file = _open_checkpoint(checkpoint, settings)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    if completed:
+        print(f"Resuming: {len(completed)} chunk parts already done")
+
+    insert = Transaction.__table__.insert().prefix_with("OR IGNORE")
+    per_worker = {}  # pid -> [rows scored, seconds busy]
+    totals = {"read": 0, "inserted": 0, "outstanding": 0}
+    start = time.perf_counter()
+
+    # Bounded inboxes keep memory flat: reading stalls when a worker falls behind. The
+    # outbox is bounded by the number of parts in flight, which stays under max_outstanding
+    inboxes = [multiprocessing.Queue(maxsize=2) for _ in range(workers)]
+    outbox = multiprocessing.Queue()
+    max_outstanding = 4 * workers
+    processes = [multiprocessing.Process(target=_worker_main, args=(inbox, outbox), daemon=True)
+                 for inbox in inboxes]
+    finished = [False] * workers  # Sent its None sentinel
+
+    def check_workers():
+        """A worker crashed if it died with an error or before it was told to stop."""
+        for worker, process in enumerate(processes):
+            if not process.is_alive() and (process.exitcode or not finished[worker]):
+                raise RuntimeError(f"Worker process {process.pid} died (exit code {process.exitcode})")
+
+    def submit(worker, task):
+        while True:
+            try:
+                inboxes[worker].put(task, timeout=1)
+                return
+            except queue.Full:
+                check_workers()
+
+    def collect(keep=None):
+        """
+        Writes finished parts; the only place that touches the database.
+        :param keep: Wait until at most this many parts are outstanding (None: only
+                     write the parts already finished).
+        """
+        while totals["outstanding"] > (keep or 0):
+            try:
+                result = outbox.get_nowait() if keep is None else outbox.get(timeout=1)
+            except queue.Empty:
+                if keep is None:
+                    return
+                check_workers()
+                continue
+            if isinstance(result, str):
+                raise RuntimeError(f"Worker failed:\n{result}")
+            totals["outstanding"] -= 1
+
+            (index, worker), n_read, rows, pid, seconds = result
+            if rows is None:
+                continue  # Replayed part
+            if rows:
+                with db.engine.begin() as conn:
+                    totals["inserted"] += conn.execute(insert, rows).rowcount
+            checkpoint_file.write(json.dumps({"chunk": index, "worker": worker, "rows": n_read}) + "\n")
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+
+            totals["read"] += n_read
+            busy = per_worker.setdefault(pid, [0, 0.0])
+            busy[0] += n_read
+            busy[1] += seconds
+
+    try:
+        with app.app_context():
+            db.create_all()  # Ensure tables exist
+            run_migrations(db.engine)
+
+            for process in processes:
+                process.start()
+
+            chunks = iter_chunks(settings["paths"], chunk_size, shuffle_buffer, settings["seed"])
+            for index, chunk in enumerate(chunks):
+                parts = [[] for _ in range(workers)]
+                for txn in chunk:
+                    parts[_card_partition(txn, workers)].append(txn)
+
+                collect(keep=max_outstanding - workers)
+                for worker, part in enumerate(parts):
+                    if part:
+                        submit(worker, ((index, worker), part, (index, worker) not in completed))
+                        totals["outstanding"] += 1
+                collect()
+
+                elapsed = time.perf_counter() - start
+                print(f"  chunk {index}: {totals['read']} scored, {totals['inserted']} inserted "
+                      f"({totals['read'] / elapsed:,.0f} rows/s)")
+
+            for worker in range(workers):
+                submit(worker, None)
+                finished[worker] = True
+            collect(keep=0)
+
+        elapsed = time.perf_counter() - start
+        for pid, (rows, seconds) in sorted(per_worker.items()):
+            print(f"  worker {pid}: {rows} rows in {seconds:.1f}s busy ({rows / max(seconds, 1e-9):,.0f} rows/s)")
+        print(f"✅ Data processed and inserted successfully! Total records added: {totals['inserted']} "
+              f"({totals['read']} rows scored in {elapsed:.1f}s, {totals['read'] / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    except Exception as e:
+        print(f"❌ Error processing transactions: {str(e)} (rerun with the same checkpoint to resume)")
+
+    finally:
+        checkpoint_file.close()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+
 if __name__ == "__main__":
-    process_and_insert_data()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help=f"Input files (default: {' '.join(DEFAULT_INPUTS)})")
+    parser.add_argument("--chunk-size", type=int, default=config.BACKFILL_CHUNK_SIZE,
+                        help="Rows scored and committed together")
+    parser.add_argument("--shuffle-buffer", type=int, default=None,
+                        help="Rows held for shuffling (0 keeps input order; default: BACKFILL_SHUFFLE_BUFFER, "
+                             f"else 0 for a model with stateful features and {DEFAULT_SHUFFLE_BUFFER} otherwise)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Scoring processes (0 scores in this process)")
+    parser.add_argument("--checkpoint", default="backfill.ckpt",
+                        help="Progress file of the parallel mode, reused to resume")
+    args = parser.parse_args()
+    if args.workers > 0:
+        parallel_insert_data(args.paths, workers=args.workers, checkpoint=args.checkpoint,
+                             chunk_size=args.chunk_size, shuffle_buffer=args.shuffle_buffer, seed=args.seed)
+    else:
+        process_and_insert_data(args.paths, chunk_size=args.chunk_size,
+                                shuffle_buffer=args.shuffle_buffer, seed=args.seed)
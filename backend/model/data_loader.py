@@ -0,0 +1,216 @@
+"""
+Typed, chunked loading of the Kaggle transaction CSVs with a columnar feature cache.
+
+The first run over a CSV reads only the columns the features need, in chunks and
+with compact dtypes, engineers the features chunk by chunk with the shared
+fraud_detection.features pipeline (its FeatureStream carries the card state over
+between chunks, so the values match a whole-file pass) and writes them to a cache
+directory named after the file's SHA-256:
+
+    data/feature_cache/
+        <file hash>-<pipeline hash>/
+            manifest.json           source file, rows, columns and dtypes
+            <feature>.npy           one array per feature, plus is_fraud.npy
+            smote-<params hash>/    SMOTE output for given parameters (X.npy, y.npy)
+
+Later runs over the same file memory-map the arrays instead of parsing the CSV.
+The pipeline hash covers the feature list, dtypes and velocity settings, so changing
+any of them builds a new cache. Delete the directory to reclaim the space.
+
+Amounts and coordinates are parsed as float64 and every feature is computed in
+float64, exactly as serving computes it. Only the finished feature columns are
+downcast for storage (float32 for real values), so a cached value is the serving
+value rounded to float32: at most ~6e-8 relative error, the precision xgboost
+scores with anyway. (Subtracting float32 coordinates first would lose ~1e-5 of
+distance to cancellation.)
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from fraud_detection.features import FEATURE_NAMES as FEATURES, FeatureStream
+from fraud_detection.velocity import VELOCITY_FEATURES
+
+# Bump when the feature definitions in fraud_detection.features change, to invalidate old caches
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+TARGET = "is_fraud"
+
+# Columns read from the CSV and their dtypes (real values in float64, as serving sees them)
+CSV_DTYPES = {
+    "cc_num": "int64",
+    "merchant": "category",
+    "amt": "float64",
+    "unix_time": "int32",
+    "lat": "float64",
+    "long": "float64",
+    "merch_lat": "float64",
+    "merch_long": "float64",
+    "city_pop": "int32",
+    TARGET: "int8",
+}
+
+# Cached (storage) dtype of every feature. fraud_detection.features computes them in
+# their declared dtypes (float64/int64); the finished columns are downcast to these
+FEATURE_DTYPES = {
+    'amt': "float32",
+    'unix_time': "int32",
+    'lat': "float32",
+    'long': "float32",
+    'merch_lat': "float32",
+    'merch_long': "float32",
+    'city_pop': "int32",
+    'time_since_last_transaction': "int32",
+    'distance': "float32",
+    'amount_per_population': "float32",
+    'log_amt': "float32",
+    'transaction_hour': "int8",
+    'day_of_week': "int8",
+    'high_amount_flag': "int8",
+    **{feat: "float32" for feat in VELOCITY_FEATURES},
+}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None if it cannot be measured)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _pipeline_hash():
+    """Hash of everything besides the input file that the cached values depend on."""
+    pipeline = {"format": FORMAT_VERSION, "csv_dtypes": CSV_DTYPES, "features": FEATURE_DTYPES,
+                "velocity_history_size": config.VELOCITY_HISTORY_SIZE}
+    return hashlib.sha256(json.dumps(pipeline, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def read_features(csv_path, chunk_size=config.LOAD_CHUNK_SIZE):
+    """Parses csv_path chunk by chunk into a dict of feature arrays plus is_fraud."""
+    stream = FeatureStream(FEATURES)
+    parts = {name: [] for name in FEATURES + [TARGET]}
+
+    for chunk in pd.read_csv(csv_path, usecols=list(CSV_DTYPES), dtype=CSV_DTYPES, chunksize=chunk_size):
+        columns = {field: chunk[field].to_numpy() for field in CSV_DTYPES}
+        for feat, values in stream.process(columns).items():
+            parts[feat].append(values.astype(FEATURE_DTYPES[feat]))
+        parts[TARGET].append(columns[TARGET])
+
+    # One column at a time, so at most one extra column is held while concatenating
+    dtypes = {**FEATURE_DTYPES, TARGET: CSV_DTYPES[TARGET]}
+    return {name: np.concatenate(parts.pop(name)) if parts[name] else np.empty(0, dtype=dtypes[name])
+            for name in list(parts)}
+
+
+def build_feature_cache(csv_path, cache_path, chunk_size=config.LOAD_CHUNK_SIZE, source_sha256=None):
+    """Writes the features and labels of csv_path to cache_path."""
+    start = time.perf_counter()
+    columns = read_features(csv_path, chunk_size)
+
+    # Write to a temporary directory and rename it, so a crash never leaves a partial cache
+    tmp_path = f"{cache_path}.tmp{os.getpid()}"
+    os.makedirs(tmp_path)
+    for name, values in columns.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), values)
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "source": os.path.abspath(csv_path),
+        "source_sha256": source_sha256 or file_sha256(csv_path),
+        "rows": len(columns[TARGET]),
+        "columns": {name: str(values.dtype) for name, values in columns.items()},
+        "velocity_history_size": config.VELOCITY_HISTORY_SIZE,
+        "build_seconds": round(time.perf_counter() - start, 2),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    with open(os.path.join(tmp_path, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, cache_path)
+    return manifest
+
+
+def load_features(csv_path, cache_root=config.FEATURE_CACHE_DIR, chunk_size=config.LOAD_CHUNK_SIZE,
+                  refresh=False):
+    """
+    Features and labels of a transaction CSV, from the cache (built on first use).
+    :param cache_root: Directory holding the caches, or None to parse without caching.
+    :param refresh: Rebuild the cache even if it exists.
+    :return: (dict of memory-mapped columns including is_fraud, cache directory or None)
+    """
+    if cache_root is None:
+        return read_features(csv_path, chunk_size), None
+
+    source_sha256 = file_sha256(csv_path)
+    cache_path = os.path.join(cache_root, f"{source_sha256[:16]}-{_pipeline_hash()}")
+    if refresh and os.path.isdir(cache_path):
+        shutil.rmtree(cache_path)
+    if not os.path.isdir(cache_path):
+        os.makedirs(cache_root, exist_ok=True)
+        build_feature_cache(csv_path, cache_path, chunk_size, source_sha256)
+
+    with open(os.path.join(cache_path, MANIFEST)) as f:
+        manifest = json.load(f)
+    columns = {name: np.load(os.path.join(cache_path, f"{name}.npy"), mmap_mode="r")
+               for name in manifest["columns"]}
+    return columns, cache_path
+
+
+def feature_matrix(columns, feature_names):
+    """Stacks the named feature columns into one float64 matrix (unix_time needs float64)."""
+    X = np.empty((len(columns[TARGET]), len(feature_names)), dtype=np.float64)
+    for j, feat in enumerate(feature_names):
+        X[:, j] = columns[feat]
+    return X
+
+
+def load_resampled(cache_path, X, y, feature_names, sampling_strategy, random_state):
+    """
+    SMOTE-resampled (X, y), memory-mapped from cache_path when it was computed before.
+    :param cache_path: Feature cache directory of the source file, or None to skip caching.
+    """
+    from imblearn.over_sampling import SMOTE
+
+    def resample():
+        return SMOTE(sampling_strategy=sampling_strategy, random_state=random_state).fit_resample(X, y)
+
+    if cache_path is None:
+        return resample()
+
+    params = {"features": list(feature_names), "sampling_strategy": sampling_strategy,
+              "random_state": random_state}
+    smote_path = os.path.join(cache_path, "smote-" + hashlib.sha256(
+        json.dumps(params, sort_keys=True).encode()).hexdigest()[:12])
+    if not os.path.isdir(smote_path):
+        X_resampled, y_resampled = resample()
+        tmp_path = f"{smote_path}.tmp{os.getpid()}"
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, "X.npy"), X_resampled)
+        np.save(os.path.join(tmp_path, "y.npy"), y_resampled)
+        os.replace(tmp_path, smote_path)
+    return (np.load(os.path.join(smote_path, "X.npy"), mmap_mode="r"),
+            np.load(os.path.join(smote_path, "y.npy"), mmap_mode="r"))
@@ -1,49 +1,67 @@
 import pandas as pd
 import numpy as np
-import pickle
-from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import f1_score, accuracy_score, precision_score, recall_score, classification_report
+import argparse
+import os
+import sys
+import time
+
+# Make the backend packages importable when run from backend/model
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from fraud_detection.cascade import tune_threshold, cascade_report
+from fraud_detection.artifact import load_artifact, load_pickle, save_artifact
+from data_loader import FEATURES, TARGET, load_features, feature_matrix, peak_rss_mb
 
 # === Load Model & Scaler ===
 def load_model(model_path):
-    """Loads trained model, scaler, feature names, and best threshold from disk."""
-    with open(model_path, 'rb') as f:
-        data = pickle.load(f)
-    return data["model"], data["scaler"], data["features"], data.get("best_threshold", 0.5)
-
-# === Feature Engineering (Must Match Training) ===
-def preprocess_data(df, feature_names):
-    """Apply the same preprocessing steps used in training."""
-    
-    df['time_since_last_transaction'] = df.groupby('cc_num')['unix_time'].diff().fillna(0)
-    df['distance'] = np.sqrt((df['lat'] - df['merch_lat'])**2 + (df['long'] - df['merch_long'])**2)
-    df['amount_per_population'] = df['amt'] / (df['city_pop'] + 1)  # Avoid division by zero
-    df['log_amt'] = np.log1p(df['amt'])  # Log transformation to normalize skew
-    df['transaction_hour'] = (df['unix_time'] // 3600) % 24  # Extract hour of transaction
-    df['day_of_week'] = (df['unix_time'] // (3600 * 24)) % 7  # Extract day of the week
-    df['high_amount_flag'] = (df['amt'] > 200).astype(int)  # Flagging high-value transactions
-
-    # Select only the required features
-    df = df[feature_names].copy()
-
-    return df
+    """
+    Loads the trained model bundle (artifact directory, or a legacy .pkl) from disk,
+    including a prescreen saved without a threshold (by older versions of generate_model.py).
+    """
+    if os.path.isdir(model_path):
+        return load_artifact(model_path, untuned_prescreen=True)
+    return load_pickle(model_path, untuned_prescreen=True)
 
 # === Load Test Data ===
 def load_test_data(test_path, feature_names):
-    """Loads test data and applies preprocessing."""
-    df = pd.read_csv(test_path)
-    df = preprocess_data(df, feature_names)
-    return df
+    """Features and labels of the test CSV, memory-mapped from the feature cache."""
+    columns, cache_path = load_features(test_path)
+    X_test = feature_matrix(columns, feature_names)
+    y_test = np.asarray(columns[TARGET])
+    return X_test, y_test, columns, cache_path
+
+# === Save Predictions ===
+def write_predictions(test_path, columns, y_test_prob, y_test_pred, output_path, chunk_size=config.LOAD_CHUNK_SIZE):
+    """
+    Writes the test CSV with its engineered features and the predictions appended,
+    streaming it chunk by chunk rather than holding the whole file in memory.
+    """
+    offset = 0
+    for i, chunk in enumerate(pd.read_csv(test_path, chunksize=chunk_size)):
+        rows = slice(offset, offset + len(chunk))
+        for feat in FEATURES:
+            if feat not in chunk:
+                chunk[feat] = columns[feat][rows]
+        chunk['fraud_probability'] = y_test_prob[rows]
+        chunk['predicted_fraud'] = y_test_pred[rows]
+        chunk.to_csv(output_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        offset += len(chunk)
 
 # === Evaluate Model ===
-def evaluate_model(model, scaler, X_test, y_test, best_threshold):
+def scale(bundle, X):
+    """StandardScaler.transform with the bundle's parameters."""
+    return (np.asarray(X, dtype=np.float64) - bundle.scaler_mean) / bundle.scaler_scale
+
+def evaluate_model(bundle, X_test, y_test):
     """Evaluates the model on test data and prints performance metrics."""
     
     # Scale the test data using the same scaler
-    X_test_scaled = scaler.transform(X_test)
+    X_test_scaled = scale(bundle, X_test)
 
     # Predict probabilities
-    y_test_prob = model.predict_proba(X_test_scaled)[:, 1]
+    y_test_prob = bundle.model.predict_proba(X_test_scaled)[:, 1]
+    best_threshold = bundle.best_threshold
 
     # Apply the best threshold
     y_test_pred = (y_test_prob > best_threshold).astype(int)
@@ -63,28 +81,87 @@ def evaluate_model(model, scaler, X_test, y_test, best_threshold):
 
     return y_test_pred, y_test_prob
 
+# === Tune the Scoring Cascade ===
+def evaluate_cascade(bundle, X_test, y_test, y_test_pred, max_recall_loss, repeats=3):
+    """
+    Tunes the prescreen threshold on the test data for a recall loss of at most
+    max_recall_loss, and measures the scoring throughput with and without the cascade.
+    """
+    model, prescreen = bundle.model, bundle.prescreen
+    X_test_scaled = scale(bundle, X_test)
+    X_test_model = X_test_scaled.astype(np.float32)
+
+    y_test_prescreen = prescreen.predict_proba(X_test_scaled)
+    threshold = tune_threshold(y_test_prescreen, y_test_pred, y_test, max_recall_loss)
+    report = cascade_report(y_test_prescreen, y_test_pred, y_test, threshold)
+
+    def best_time(fn):
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    def cascade():
+        probabilities = prescreen.predict_proba(X_test_scaled)
+        uncertain = probabilities >= threshold
+        probabilities[uncertain] = model.predict_proba(X_test_model[uncertain])[:, 1]
+
+    full_seconds = best_time(lambda: model.predict_proba(X_test_model))
+    cascade_seconds = best_time(cascade)
+
+    print("\n🪜 Scoring Cascade:")
+    print(f"🎚 Prescreen threshold: {threshold:.6f} (max recall loss {max_recall_loss:.2%})")
+    print(f"⏩ Short-circuited: {report['short_circuit_fraction']:.2%} of transactions")
+    print(f"🔁 Recall: {report['recall_full']:.4f} -> {report['recall_cascade']:.4f}")
+    print(f"⚡ Precision: {report['precision_full']:.4f} -> {report['precision_cascade']:.4f}")
+    print(f"🚀 Throughput: {len(X_test) / full_seconds:,.0f} -> {len(X_test) / cascade_seconds:,.0f} rows/s "
+          f"({full_seconds / cascade_seconds:.2f}x)")
+
+    return threshold
+
 # === Main Execution ===
 if __name__ == "__main__":
-    model_path = "../../data/fraud_model.pkl"  # Adjust path as needed
+    parser = argparse.ArgumentParser(description="Evaluate the fraud model and tune its scoring cascade.")
+    parser.add_argument("--max-recall-loss", type=float, default=config.CASCADE_MAX_RECALL_LOSS,
+                        help="Share of recall the cascade may lose")
+    parser.add_argument("--save-cascade", action="store_true",
+                        help="Save the tuned prescreen threshold as a new model version")
+    args = parser.parse_args()
+
+    model_path = "../../data/fraud_model"  # Artifact root (latest version), version directory or .pkl
     test_path = "../../data/fraudTest.csv"  # Path to test dataset
 
     # Load Model, Scaler, and Feature Names
-    model, scaler, feature_names, best_threshold = load_model(model_path)
+    bundle = load_model(model_path)
+    feature_names = bundle.feature_names
 
-    # Load and Preprocess Test Data
-    df_test = pd.read_csv(test_path)
-    X_test = preprocess_data(df_test, feature_names)
-    y_test = df_test['is_fraud']  # True labels
+    # Load the Test Features (parsed and cached on the first run)
+    load_start = time.perf_counter()
+    X_test, y_test, test_columns, cache_path = load_test_data(test_path, feature_names)
+    print(f"📦 Loaded {len(y_test):,} rows in {time.perf_counter() - load_start:.1f}s"
+          f" from {cache_path or test_path}, peak RSS {peak_rss_mb() or 0:,.0f} MB")
 
     # Predict Fraud Cases and Evaluate Model
-    y_test_pred, y_test_prob = evaluate_model(model, scaler, X_test, y_test, best_threshold)
-
-    # Save predictions
-    df_test['fraud_probability'] = y_test_prob
-    df_test['predicted_fraud'] = y_test_pred
-
-    # Save results
+    y_test_pred, y_test_prob = evaluate_model(bundle, X_test, y_test)
+
+    # Tune the cascade's prescreen threshold
+    if bundle.prescreen is not None:
+        cascade_threshold = evaluate_cascade(bundle, X_test, y_test, y_test_pred, args.max_recall_loss)
+        if args.save_cascade and not os.path.isdir(bundle.path):
+            print("❌ Only artifact directories can be updated; retrain with generate_model.py first")
+        elif args.save_cascade:
+            bundle.prescreen.threshold = cascade_threshold
+            version_path = save_artifact(os.path.dirname(bundle.path), bundle.model, bundle.scaler_mean, bundle.scaler_scale,
+                                         bundle.feature_names, bundle.best_threshold, bundle.prescreen,
+                                         metadata={"tuned_from": bundle.version, "test_path": test_path})
+            print(f"✅ Cascade threshold saved as {version_path}")
+    else:
+        print("\nℹ️ The model has no cascade prescreen (retrain it with generate_model.py)")
+
+    # Save the test data with its predictions
     output_path = "../../data/fraud_predictions.csv"
-    df_test.to_csv(output_path, index=False)
+    write_predictions(test_path, test_columns, y_test_prob, y_test_pred, output_path)
     
     print(f"\n✅ Predictions saved to {output_path} 🚀")
@@ -1,38 +1,27 @@
-import pandas as pd
 import numpy as np
-import pickle
-from imblearn.over_sampling import SMOTE
 from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import f1_score, classification_report, precision_recall_curve
 import xgboost as xgb
+import os
+import sys
+import time
+
+# Make the backend packages importable when run from backend/model
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from fraud_detection.cascade import LinearPrescreen, tune_threshold, cascade_report
+from fraud_detection.artifact import save_artifact
+from data_loader import FEATURES, TARGET, load_features, feature_matrix, load_resampled, peak_rss_mb
 
 # Load Data
 def load_data(train_path):
-    df = pd.read_csv(train_path)
-
-    # Feature Engineering: Additional derived features
-    df['time_since_last_transaction'] = df.groupby('cc_num')['unix_time'].diff().fillna(0)
-    df['distance'] = np.sqrt((df['lat'] - df['merch_lat'])**2 + (df['long'] - df['merch_long'])**2)
-    df['amount_per_population'] = df['amt'] / (df['city_pop'] + 1)
-    df['log_amt'] = np.log1p(df['amt'])  
-    df['transaction_hour'] = (df['unix_time'] // 3600) % 24
-    df['day_of_week'] = (df['unix_time'] // (3600 * 24)) % 7
-    df['high_amount_flag'] = (df['amt'] > 200).astype(int)
-
-    # Features & Target
-    features = ['amt', 'unix_time', 'lat', 'long', 'merch_lat', 'merch_long', 'city_pop', 
-                'time_since_last_transaction', 'distance', 'amount_per_population', 'log_amt',
-                'transaction_hour', 'day_of_week', 'high_amount_flag']
-    target = 'is_fraud'
-
-    # Remove NaNs
-    df.dropna(subset=features + [target], inplace=True)
-
-    X = df[features]
-    y = df[target]
-
-    return X, y, features
+    """Features and labels of the training CSV, memory-mapped from the feature cache."""
+    columns, cache_path = load_features(train_path)
+    X = feature_matrix(columns, FEATURES)
+    y = np.asarray(columns[TARGET])
+    return X, y, list(FEATURES), cache_path
 
 # Train XGBoost Model
 def train_xgboost(X_train, y_train):
@@ -53,14 +42,20 @@ def train_xgboost(X_train, y_train):
 
 # Load and Process Data
 train_path = "../../data/fraudTrain.csv"
-X, y, feature_names = load_data(train_path)
+load_start = time.perf_counter()
+X, y, feature_names, cache_path = load_data(train_path)
 
-# Handle Imbalanced Data with SMOTE
-smote = SMOTE(sampling_strategy=0.4, random_state=42)
-X_resampled, y_resampled = smote.fit_resample(X, y)
+# Handle Imbalanced Data with SMOTE (cached with the features)
+X_resampled, y_resampled = load_resampled(cache_path, X, y, feature_names, sampling_strategy=0.4, random_state=42)
+print(f"📦 Loaded {len(y):,} rows ({len(y_resampled):,} after SMOTE) in {time.perf_counter() - load_start:.1f}s"
+      f" from {cache_path or train_path}, peak RSS {peak_rss_mb() or 0:,.0f} MB")
 
-# Split Data
-X_train, X_val, y_train, y_val = train_test_split(X_resampled, y_resampled, test_size=0.2, random_state=42)
+# Split Data (by index, to tell the real validation rows from SMOTE's synthetic ones)
+train_index, val_index = train_test_split(np.arange(len(y_resampled)), test_size=0.2, random_state=42)
+X_train, X_val = X_resampled[train_index], X_resampled[val_index]
+y_train, y_val = y_resampled[train_index], y_resampled[val_index]
+# SMOTE returns the original rows first and appends the synthetic ones
+val_real = val_index < len(y)
 
 # Standardize Features
 scaler = StandardScaler()
@@ -85,9 +80,23 @@ print(f"\n🚀 Model Trained with Best F1 Score: {f1:.4f}")
 print(f"🔥 Best Threshold: {best_threshold:.4f}")
 print("\n📌 Classification Report:\n", classification_report(y_val, y_val_pred))
 
-# Save Model
-model_path = "../../data/fraud_model.pkl"
-with open(model_path, 'wb') as f:
-    pickle.dump({"model": model, "scaler": scaler, "features": feature_names, "best_threshold": best_threshold}, f)
+# Train the cascade's prescreen: a logistic regression on the same scaled features.
+# Its threshold is tuned on the real (not synthetic) validation rows, so the saved
+# prescreen is active right away; evaluate_model.py --save-cascade can retune it on the test data
+prescreen_model = LogisticRegression(max_iter=1000)
+prescreen_model.fit(X_train_scaled, y_train)
+y_val_prescreen = prescreen_model.predict_proba(X_val_scaled)[:, 1]
+cascade_threshold = tune_threshold(y_val_prescreen[val_real], y_val_pred[val_real], y_val[val_real],
+                                   config.CASCADE_MAX_RECALL_LOSS)
+prescreen = LinearPrescreen.from_estimator(prescreen_model, cascade_threshold)
+report = cascade_report(y_val_prescreen[val_real], y_val_pred[val_real], y_val[val_real], cascade_threshold)
+print(f"\n🪜 Cascade prescreen threshold (real validation rows): {cascade_threshold:.4f} "
+      f"({report['short_circuit_fraction']:.1%} of validation rows short-circuited, "
+      f"recall {report['recall_full']:.4f} -> {report['recall_cascade']:.4f})")
+print("   Retune it on the test data with: python evaluate_model.py --save-cascade")
+
+# Save Model as a new artifact version
+model_path = save_artifact("../../data/fraud_model", model, scaler.mean_, scaler.scale_, feature_names,
+                           best_threshold, prescreen, metadata={"train_path": train_path, "f1": float(f1)})
 
 print(f"\n✅ Model saved to {model_path} 🚀")
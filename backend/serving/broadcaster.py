@@ -0,0 +1,73 @@
+import threading
+from collections import deque
+
+
+class Subscription:
+    """
+    One subscriber's bounded buffer. When the subscriber falls behind, the oldest
+    events are dropped and counted so the consumer can be told it lagged.
+    """
+
+    def __init__(self, buffer_size):
+        self._events = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._dropped = 0
+        self.closed = False
+
+    def push(self, event):
+        with self._condition:
+            if len(self._events) == self._events.maxlen:
+                self._dropped += 1  # deque drops the oldest event on append
+            self._events.append(event)
+            self._condition.notify()
+
+    def wait(self, timeout):
+        """
+        Blocks until events arrive (or the timeout passes).
+        :return: (events, dropped) - everything buffered, and how many were lost since the last call.
+        """
+        with self._condition:
+            if not self._events and not self.closed:
+                self._condition.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            dropped, self._dropped = self._dropped, 0
+        return events, dropped
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify()
+
+
+class Broadcaster:
+    """
+    Fan-out of scored transactions to every open stream. publish() never blocks on
+    a slow subscriber: each has its own bounded buffer.
+    """
+
+    def __init__(self, buffer_size=1000):
+        self.buffer_size = buffer_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscription = Subscription(self.buffer_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, events):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            for event in events:
+                subscription.push(event)
+
+    def __len__(self):
+        return len(self._subscribers)
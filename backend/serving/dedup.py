@@ -0,0 +1,163 @@
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class BloomFilter:
+    """
+    Fixed-size set membership filter: no false negatives, false positives at about
+    false_positive_rate once capacity items have been added. Takes ~1.8 bytes per
+    item at a 0.1% rate, against well over 100 for a Python set of trans_num strings.
+    """
+
+    def __init__(self, capacity, false_positive_rate=0.001):
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.n_bits = max(8, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.n_hashes = max(1, round(self.n_bits / capacity * math.log(2)))
+        self.bits = np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    @staticmethod
+    def _digest(key):
+        return hashlib.blake2b(str(key).encode(), digest_size=16).digest()
+
+    def _positions(self, key):
+        digest = self._digest(key)
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.n_bits for i in range(self.n_hashes)]
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def add(self, key):
+        bits = self.bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def update(self, keys):
+        """Adds many keys, setting their bits with vectorized numpy operations."""
+        digests = np.frombuffer(b"".join(self._digest(key) for key in keys), dtype="<u8").reshape(-1, 2)
+        if not len(digests):
+            return
+        h1 = digests[:, 0:1]
+        h2 = digests[:, 1:2] | np.uint64(1)
+        # Same double hashing as _positions; uint64 wraps, so reduce each term first
+        n_bits = np.uint64(self.n_bits)
+        steps = np.arange(self.n_hashes, dtype=np.uint64)
+        positions = ((h1 % n_bits) + (steps * (h2 % n_bits)) % n_bits) % n_bits
+        positions = positions.ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3),
+                         (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+        self.count += len(digests)
+
+    def fill_ratio(self):
+        return float(np.bitwise_count(self.bits).sum()) / (len(self.bits) * 8)
+
+    def clear(self):
+        self.bits[:] = 0
+        self.count = 0
+
+
+class DedupIndex:
+    """
+    Answers "was this trans_num already stored, and with what score?" before scoring.
+
+    A Bloom filter over every stored trans_num (seeded from the table at startup)
+    clears new transactions in memory. Only a possible duplicate is looked up: first
+    in a bounded LRU of recently stored results, which catches client retries without
+    a query, then in the database through fetch(trans_nums) -> {trans_num: (fraud_score,
+    is_fraud)}. A filter false positive costs one indexed lookup and is otherwise
+    treated as a new transaction.
+    """
+
+    def __init__(self, fetch, capacity=10_000_000, false_positive_rate=0.001, recent_size=100_000):
+        self.fetch = fetch
+        self.recent_size = recent_size
+        self._filter = BloomFilter(capacity, false_positive_rate)
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.lookups = 0
+        self.recent_hits = 0
+        self.stored_hits = 0
+        self.false_positives = 0
+
+    def __len__(self):
+        return self._filter.count
+
+    def seed(self, trans_nums):
+        """Adds trans_nums already in the table (an iterable, e.g. a yield_per query)."""
+        chunk = []
+        for trans_num in trans_nums:
+            chunk.append(trans_num)
+            if len(chunk) == 100_000:
+                with self._lock:
+                    self._filter.update(chunk)
+                chunk = []
+        with self._lock:
+            self._filter.update(chunk)
+
+    def lookup(self, trans_nums):
+        """
+        Stored results of the trans_nums that are duplicates.
+        :return: {trans_num: (fraud_score, is_fraud)}, only for confirmed duplicates.
+        """
+        found = {}
+        candidates = []
+        with self._lock:
+            for trans_num in dict.fromkeys(trans_nums):
+                if trans_num is None or trans_num not in self._filter:
+                    continue
+                recent = self._recent.get(trans_num)
+                if recent is not None:
+                    self._recent.move_to_end(trans_num)
+                    found[trans_num] = recent
+                else:
+                    candidates.append(trans_num)
+        recent_hits = len(found)
+
+        stored = self.fetch(candidates) if candidates else {}
+        found.update(stored)
+
+        with self._stats_lock:
+            self.lookups += len(trans_nums)
+            self.recent_hits += recent_hits
+            self.stored_hits += len(stored)
+            self.false_positives += len(candidates) - len(stored)
+        return found
+
+    def add(self, results):
+        """Records newly stored results: an iterable of (trans_num, fraud_score, is_fraud)."""
+        with self._lock:
+            for trans_num, fraud_score, is_fraud in results:
+                if trans_num not in self._recent:
+                    self._filter.add(trans_num)
+                self._recent[trans_num] = (fraud_score, is_fraud)
+                self._recent.move_to_end(trans_num)
+                if len(self._recent) > self.recent_size:
+                    self._recent.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._filter.clear()
+            self._recent.clear()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "stored_trans_nums": self._filter.count,
+                "capacity": self._filter.capacity,
+                "filter_bytes": self._filter.bits.nbytes,
+                "filter_fill_ratio": self._filter.fill_ratio(),
+                "lookups": self.lookups,
+                "recent_hits": self.recent_hits,
+                "stored_hits": self.stored_hits,
+                "false_positives": self.false_positives,
+            }
@@ -0,0 +1,134 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Collects requests arriving within a short window into one batched model call.
+
+    Callers block in submit() while a background thread gathers up to max_batch_size
+    items, waiting at most max_wait_ms after the first one, then scores them with a
+    single score_batch(items) call and hands each caller its own result. If the call
+    fails, every caller of the batch gets its exception.
+    """
+
+    def __init__(self, score_batch, max_batch_size=64, max_wait_ms=2.0):
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._submit_lock = threading.Lock()
+        self._stopped = False
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, item, timeout=None):
+        """Queues one item and returns its result once its batch has been scored."""
+        future = Future()
+        with self._submit_lock:
+            if self._stopped:
+                raise RuntimeError("Batcher has been shut down")
+            self._queue.put((item, future, time.perf_counter()))
+        return future.result(timeout=timeout)
+
+    def shutdown(self):
+        """Scores every item submitted so far, then stops the batching thread."""
+        with self._submit_lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._queue.put(_STOP)
+        self._worker.join()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait
+            stop = False
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+
+            self._score(batch)
+            if stop:
+                return  # Nothing is queued after the stop marker
+
+    def _score(self, batch):
+        items = [item for item, _, _ in batch]
+        start = time.perf_counter()
+        try:
+            results = self.score_batch(items)
+            if len(results) != len(items):
+                raise RuntimeError(f"score_batch returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        done = time.perf_counter()
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+        self._record(len(batch), sum(start - queued for _, _, queued in batch), done - start)
+
+    def _reset_stats(self):
+        self._batches = 0
+        self._items = 0
+        self._max_size = 0
+        self._size_histogram = {}
+        self._queue_wait = 0.0
+        self._score_time = 0.0
+
+    def _record(self, size, queue_wait, score_time):
+        # Batch sizes bucketed by powers of two: "1", "2-3", "4-7", ...
+        low = 1 << (size.bit_length() - 1)
+        bucket = str(low) if low == 1 else f"{low}-{2 * low - 1}"
+
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._max_size = max(self._max_size, size)
+            self._size_histogram[bucket] = self._size_histogram.get(bucket, 0) + 1
+            self._queue_wait += queue_wait
+            self._score_time += score_time
+
+    def stats(self):
+        """Batch size metrics since start (or the last reset)."""
+        with self._stats_lock:
+            batches = self._batches or 1
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": self._items / batches,
+                "max_batch_size_seen": self._max_size,
+                "batch_size_histogram": dict(self._size_histogram),
+                "avg_queue_wait_ms": self._queue_wait / (self._items or 1) * 1000,
+                "avg_score_ms": self._score_time / batches * 1000,
+                "queue_depth": self._queue.qsize(),
+            }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._reset_stats()
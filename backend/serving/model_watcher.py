@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+import traceback
+
+from fraud_detection.artifact import MANIFEST, resolve_version
+
+
+def model_fingerprint(path):
+    """
+    Identifies what is currently at a model path: the version LATEST points at (and
+    its manifest's mtime) for an artifact directory, or mtime and size for a .pkl.
+    """
+    if os.path.isdir(path):
+        version_path = resolve_version(path)
+        return version_path, os.stat(os.path.join(version_path, MANIFEST)).st_mtime_ns
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+class ModelWatcher:
+    """
+    Polls a model path and hot-swaps whatever new model appears there.
+
+    Every interval seconds the path's fingerprint is compared with the last one seen.
+    On a change, load(path) builds the new model in this background thread and
+    on_load(model) installs it, so requests keep being scored by the old model until
+    the new one is fully loaded. A model that fails to load is logged and skipped
+    until the path changes again; the old model stays in service.
+    """
+
+    def __init__(self, path, load, on_load, interval=5.0, name="model-watcher"):
+        self.path = path
+        self.load = load
+        self.on_load = on_load
+        self.interval = interval
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._fingerprint = self._read_fingerprint()
+        self.reloads = 0
+        self.failures = 0
+        self.last_reload = None
+        self.last_error = None
+
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def _read_fingerprint(self):
+        try:
+            return model_fingerprint(self.path)
+        except OSError:
+            # Missing or half-written pointer: treat as unchanged until it is readable
+            return None
+
+    def check(self):
+        """Reloads the model if the path changed since the last check. Returns True on a swap."""
+        fingerprint = self._read_fingerprint()
+        if fingerprint is None or fingerprint == self._fingerprint:
+            return False
+        self._fingerprint = fingerprint
+
+        start = time.perf_counter()
+        try:
+            self.on_load(self.load(self.path))
+        except Exception as e:
+            print(f"[ERROR] Reloading model from {self.path} failed, keeping the current one\n"
+                  f"{traceback.format_exc()}")
+            with self._stats_lock:
+                self.failures += 1
+                self.last_error = str(e)
+            return False
+
+        with self._stats_lock:
+            self.reloads += 1
+            self.last_reload = {"fingerprint": str(fingerprint[0]),
+                                "load_ms": (time.perf_counter() - start) * 1000,
+                                "at": time.time()}
+        print(f"Model reloaded from {fingerprint[0]}")
+        return True
+
+    def shutdown(self):
+        self._stop.set()
+        self._worker.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "path": self.path,
+                "interval_s": self.interval,
+                "reloads": self.reloads,
+                "failures": self.failures,
+                "last_reload": self.last_reload,
+                "last_error": self.last_error,
+            }
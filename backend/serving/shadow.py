@@ -0,0 +1,161 @@
+import json
+import queue
+import threading
+import time
+import traceback
+
+import numpy as np
+
+from fraud_detection import ml_model
+
+
+class ShadowScorer:
+    """
+    Scores live traffic with a second model, off the request path, for comparison.
+
+    Endpoints hand over each transaction with the primary model's result through
+    submit(), which never blocks: the queue is bounded and items that do not fit
+    are dropped and counted. A background thread drains the queue in batches, scores
+    them with the shadow bundle and appends primary and shadow scores to log_path
+    (JSON lines). The card state is not touched; the stateful features computed for
+    the primary model are reused, so a shadow model needing features the primary
+    does not compute skips those rows.
+    """
+
+    def __init__(self, load_bundle, log_path=None, max_queue_size=10_000, max_batch_size=256):
+        self.load_bundle = load_bundle
+        self.log_path = log_path
+        self.max_batch_size = max_batch_size
+        self.bundle = None
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0
+        self.scored = 0
+        self.skipped = 0
+        self.failed = 0
+        self.label_disagreements = 0
+        self.abs_diff_sum = 0.0
+        self.max_abs_diff = 0.0
+
+        self._worker = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._worker.start()
+
+    def set_bundle(self, bundle):
+        """Swaps the shadow model (the next batch uses it)."""
+        # The shadow must not compete with request threads for cores: one thread for
+        # xgboost, and the serial kernel of the native engine whatever the batch size
+        if hasattr(bundle.model, "set_params"):
+            bundle.model.set_params(n_jobs=1)
+        self.bundle = bundle
+
+    def submit(self, transactions, results, primary_version=None):
+        """Queues scored transactions for the shadow model. Returns immediately."""
+        dropped = 0
+        submitted = 0
+        for transaction, result in zip(transactions, results):
+            if not isinstance(transaction, dict) or "fraud_score" not in result:
+                continue
+            try:
+                self._queue.put_nowait((transaction, result, primary_version))
+                submitted += 1
+            except queue.Full:
+                dropped += 1
+        with self._stats_lock:
+            self.submitted += submitted
+            self.dropped += dropped
+
+    def _run(self):
+        # Loaded here so a slow shadow model never delays startup
+        try:
+            self.set_bundle(self.load_bundle())
+        except Exception:
+            print(f"[ERROR] Loading the shadow model failed, shadow scoring is off\n{traceback.format_exc()}")
+            return
+        print(f"Shadow model {self.bundle.version} loaded")
+
+        log = open(self.log_path, "a") if self.log_path else None
+        try:
+            while True:
+                batch = [self._queue.get()]
+                while len(batch) < self.max_batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self._score(batch, log)
+        finally:
+            if log is not None:
+                log.close()
+
+    def _score(self, batch, log):
+        bundle = self.bundle
+        raw_fields = ml_model.raw_fields_of(bundle)
+        rows = []
+        raw_rows = []
+        for transaction, result, primary_version in batch:
+            try:
+                raw_rows.append([float(transaction[feat]) for feat in raw_fields])
+                rows.append((transaction, result, primary_version))
+            except (KeyError, TypeError, ValueError):
+                pass
+
+        skipped = len(batch) - len(rows)
+        if not rows:
+            with self._stats_lock:
+                self.skipped += skipped
+            return
+
+        try:
+            shadow_scores = ml_model.score_raw(bundle, np.array(raw_rows, dtype=np.float64), raw_fields,
+                                               stats=None)
+        except Exception:
+            print(f"[ERROR] Shadow scoring of {len(rows)} transactions failed\n{traceback.format_exc()}")
+            with self._stats_lock:
+                self.skipped += skipped
+                self.failed += len(rows)
+            return
+
+        primary_scores = np.array([result["fraud_score"] for _, result, _ in rows], dtype=np.float64)
+        primary_labels = np.array([result["is_fraud"] for _, result, _ in rows], dtype=bool)
+        shadow_labels = shadow_scores > bundle.best_threshold
+        abs_diff = np.abs(shadow_scores - primary_scores)
+
+        if log is not None:
+            now = time.time()
+            for (transaction, _, primary_version), primary_score, primary_label, shadow_score, shadow_label in zip(
+                    rows, primary_scores, primary_labels, shadow_scores, shadow_labels):
+                log.write(json.dumps({
+                    "time": now,
+                    "trans_num": transaction.get("trans_num"),
+                    "primary_version": primary_version,
+                    "primary_score": float(primary_score),
+                    "primary_is_fraud": int(primary_label),
+                    "shadow_version": bundle.version,
+                    "shadow_score": float(shadow_score),
+                    "shadow_is_fraud": int(shadow_label),
+                }) + "\n")
+            log.flush()
+
+        with self._stats_lock:
+            self.scored += len(rows)
+            self.skipped += skipped
+            self.label_disagreements += int((primary_labels != shadow_labels).sum())
+            self.abs_diff_sum += float(abs_diff.sum())
+            self.max_abs_diff = max(self.max_abs_diff, float(abs_diff.max()))
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "version": self.bundle.version if self.bundle is not None else None,
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "submitted": self.submitted,
+                "dropped": self.dropped,
+                "scored": self.scored,
+                "skipped": self.skipped,
+                "failed": self.failed,
+                "label_disagreements": self.label_disagreements,
+                "mean_abs_score_diff": self.abs_diff_sum / self.scored if self.scored else None,
+                "max_abs_score_diff": self.max_abs_diff,
+            }
@@ -0,0 +1,216 @@
+import queue
+import threading
+import time
+import traceback
+
+from sqlalchemy import select
+
+_STOP = object()
+
+
+class WriteBehindWriter:
+    """
+    Background writer that persists scored transactions in group commits.
+
+    Endpoints enqueue plain row dicts and return right away; a single thread drains
+    the queue, collecting rows for up to flush_interval_ms (or max_batch_size rows)
+    and inserting them with one executemany and one commit. The queue is bounded (in
+    rows), so a stalled database pushes back on callers instead of growing memory.
+    The rows of one enqueue() call are queued together or not at all.
+
+    Callers have answered the client before the commit, so a row that cannot be
+    stored is only known here: a trans_num that is already stored (a duplicate the
+    caller did not catch) or a row the database refuses. Such rows are counted in
+    stats() and handed to on_rejected(row, stored, undo_log) from the writer thread,
+    with stored the (fraud_score, is_fraud) already stored under the trans_num (None
+    for a refused row) and undo_log the one passed to enqueue(). The rows that were
+    stored are handed to on_stored(rows) after each commit.
+    """
+
+    def __init__(self, engine, table, max_queue_size=10_000, flush_interval_ms=50,
+                 max_batch_size=1000, put_timeout=1.0, on_rejected=None, on_stored=None):
+        self.engine = engine
+        self.table = table
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.put_timeout = put_timeout
+        self.max_queue_size = max_queue_size
+        self.on_rejected = on_rejected
+        self.on_stored = on_stored
+        # Items are the (row, undo_log) lists of enqueue() calls; capacity is counted in rows
+        self._queue = queue.Queue()
+        self._space = threading.Condition()
+        self._queued_rows = 0
+        self._stats_lock = threading.Lock()
+        self._stopped = False
+        self.batches = 0
+        self.rows_written = 0
+        self.rows_ignored = 0
+        self.rows_failed = 0
+
+        # Duplicates are looked up before the insert; any that race past it are skipped
+        # rather than failing the whole batch
+        self._insert = table.insert().prefix_with("OR IGNORE")
+
+        self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._worker.start()
+
+    def enqueue(self, rows, undo_logs=None):
+        """
+        Queues rows for the next group commit, all of them or none.
+        :param undo_logs: Per row, what on_rejected gets to revert if it is not stored.
+        :raises queue.Full: if there is no room for all the rows within put_timeout
+                            seconds; none of them is queued then.
+        """
+        if self._stopped:
+            raise RuntimeError("Writer has been shut down")
+        rows = list(zip(rows, undo_logs)) if undo_logs is not None else [(row, None) for row in rows]
+        if not rows:
+            return
+        with self._space:
+            # More rows than the whole queue holds are let in once it is empty
+            if not self._space.wait_for(
+                    lambda: self._queued_rows == 0 or self._queued_rows + len(rows) <= self.max_queue_size,
+                    timeout=self.put_timeout):
+                raise queue.Full
+            self._queued_rows += len(rows)
+        self._queue.put(rows)
+
+    def flush(self):
+        """Blocks until every row enqueued so far has been written."""
+        self._queue.join()
+
+    def shutdown(self):
+        """Writes whatever is still queued, then stops the writer thread."""
+        if self._stopped:
+            return
+        self._stopped = True
+        self._queue.put(_STOP)
+        self._worker.join()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                self._queue.task_done()
+                return
+
+            items = [first]
+            batch = list(first)
+            deadline = time.perf_counter() + self.flush_interval
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    rows = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if rows is _STOP:
+                    self._queue.task_done()
+                    stop = True
+                    break
+                items.append(rows)
+                batch.extend(rows)
+
+            self._write(batch)
+            self._done(items)
+
+            if stop:
+                # Drain anything enqueued before the stop marker
+                items = []
+                while not self._queue.empty():
+                    items.append(self._queue.get_nowait())
+                if items:
+                    self._write([row for rows in items for row in rows])
+                    self._done(items)
+                return
+
+    def _done(self, items):
+        """Frees the queue capacity of written items."""
+        with self._space:
+            self._queued_rows -= sum(len(rows) for rows in items)
+            self._space.notify_all()
+        for _ in items:
+            self._queue.task_done()
+
+    def _split_stored(self, conn, batch):
+        """
+        Splits (row, undo_log) pairs into the new ones and the duplicates of a stored
+        (or earlier) row, the latter as (row, stored (fraud_score, is_fraud), undo_log).
+        """
+        table = self.table
+        trans_nums = {row["trans_num"] for row, _ in batch}
+        stored = {trans_num: (fraud_score, is_fraud) for trans_num, fraud_score, is_fraud in conn.execute(
+            select(table.c.trans_num, table.c.fraud_score, table.c.is_fraud)
+            .where(table.c.trans_num.in_(trans_nums)))}
+        new, duplicates = [], []
+        for row, undo_log in batch:
+            previous = stored.get(row["trans_num"])
+            if previous is None:
+                stored[row["trans_num"]] = (row["fraud_score"], row["is_fraud"])
+                new.append(row)
+            else:
+                duplicates.append((row, previous, undo_log))
+        return new, duplicates
+
+    def _write(self, batch):
+        """Stores a batch of (row, undo_log) pairs, then reports which rows it stored and which not."""
+        try:
+            with self.engine.begin() as conn:
+                stored_rows, rejected = self._split_stored(conn, batch)
+                written = conn.execute(self._insert, stored_rows).rowcount if stored_rows else 0
+            self._record(len(batch), written)
+        except Exception:
+            # One bad row should not lose the batch: retry the rows one by one
+            print(f"[ERROR] Group commit of {len(batch)} rows failed, retrying row by row\n"
+                  f"{traceback.format_exc()}")
+            stored_rows, rejected = [], []
+            for row, undo_log in batch:
+                try:
+                    with self.engine.begin() as conn:
+                        new, duplicates = self._split_stored(conn, [(row, undo_log)])
+                        written = conn.execute(self._insert, new).rowcount if new else 0
+                    self._record(1, written)
+                    stored_rows.extend(new)
+                    rejected.extend(duplicates)
+                except Exception as e:
+                    print(f"[ERROR] Dropping transaction {row.get('trans_num', 'UNKNOWN')} - {str(e)}")
+                    with self._stats_lock:
+                        self.rows_failed += 1
+                    rejected.append((row, None, undo_log))
+
+        if self.on_stored is not None and stored_rows:
+            try:
+                self.on_stored(stored_rows)
+            except Exception:
+                print(f"[ERROR] on_stored failed for {len(stored_rows)} rows\n{traceback.format_exc()}")
+
+        if self.on_rejected is not None:
+            for row, stored, undo_log in rejected:
+                try:
+                    self.on_rejected(row, stored, undo_log)
+                except Exception:
+                    print(f"[ERROR] on_rejected failed for {row.get('trans_num', 'UNKNOWN')}\n"
+                          f"{traceback.format_exc()}")
+
+    def _record(self, attempted, written):
+        with self._stats_lock:
+            self.batches += 1
+            if written is None or written < 0:
+                written = attempted
+            self.rows_written += written
+            self.rows_ignored += attempted - written
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queued_rows,
+                "queue_capacity": self.max_queue_size,
+                "flush_interval_ms": self.flush_interval * 1000,
+                "batches": self.batches,
+                "rows_written": self.rows_written,
+                "rows_ignored": self.rows_ignored,
+                "rows_failed": self.rows_failed,
+            }
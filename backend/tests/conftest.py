@@ -0,0 +1,47 @@
+"""
+Shared fixtures. config is read once at import, so the environment is set here,
+before any backend module is imported: the app gets a scratch SQLite database and
+a small synthetic model artifact in a temporary directory.
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+WORKDIR = tempfile.mkdtemp(prefix="fraud-tests-")
+atexit.register(shutil.rmtree, WORKDIR, ignore_errors=True)
+os.environ.update({
+    "DATABASE_URI": f"sqlite:///{os.path.join(WORKDIR, 'transactions.db')}",
+    "MODEL_PATH": os.path.join(WORKDIR, "fraud_model"),
+    "MODEL_RELOAD_INTERVAL": "0",
+    "FEATURE_CACHE_DIR": os.path.join(WORKDIR, "feature_cache"),
+    "SHADOW_MODEL_PATH": "",
+    "PERSISTENCE_MODE": "sync",
+    "MICRO_BATCH_ENABLED": "false",
+})
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    """The app module, with a model artifact trained on synthetic transactions."""
+    from benchmarks.suite import build_model_artifact
+    build_model_artifact(os.environ["MODEL_PATH"], trees=20, depth=3, seed=0, rows=2000)
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    """A test client on an empty database and empty per-card state."""
+    client = app_module.app.test_client()
+    client.post('/clear_db')
+    return client
@@ -0,0 +1,111 @@
+def test_batch_reports_errors_per_row(app_module, client):
+    from benchmarks.suite import synthetic_transactions
+    from fraud_detection import ml_model
+
+    first, second, unscorable, incomplete = (dict(txn) for txn in synthetic_transactions(4, seed=12))
+    unscorable["amt"] = "not a number"
+    del incomplete["amt"]
+    batch = [first, incomplete, "not a transaction", dict(first), unscorable, second]
+
+    response = client.post('/detect_fraud/batch', json=batch)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body["inserted"], body["duplicates"], body["failed"]) == (2, 1, 3)
+
+    results = body["results"]
+    assert [result.get("trans_num") for result in results] == \
+        [first["trans_num"], incomplete["trans_num"], None, first["trans_num"], unscorable["trans_num"],
+         second["trans_num"]]
+    assert results[1]["error"].startswith("Invalid transaction") and "amt" in results[1]["error"]
+    assert results[2]["error"].startswith("Invalid transaction")
+    assert results[3] == {**results[0], "duplicate": True}
+    assert "error" in results[4] and "error" not in results[5]
+
+    # Failed rows leave no card state behind: only the stored cards are known
+    stored_cards = {str(first["cc_num"]), str(second["cc_num"])}
+    assert set(ml_model.velocity_engine._slots) <= stored_cards
+    assert len(client.get('/transactions').get_json()["transactions"]) == 2
+
+
+def post_transactions(client, transactions):
+    assert client.post('/detect_fraud/batch', json=[dict(txn) for txn in transactions]).status_code == 200
+
+
+def test_transactions_feed_cursor_and_etag(app_module, client, monkeypatch):
+    from benchmarks.suite import synthetic_transactions
+    transactions = synthetic_transactions(6, seed=13)
+    monkeypatch.setattr(app_module.config, "TRANSACTIONS_PAGE_SIZE", 2)
+
+    post_transactions(client, transactions[:3])
+    response = client.get('/transactions')
+    body = response.get_json()
+    # A full load returns the newest rows and jumps to the newest id
+    assert [t["trans_num"] for t in body["transactions"]] == [txn["trans_num"] for txn in transactions[2:0:-1]]
+    assert (body["has_more"], body["reset"]) == (False, False)
+    cursor, etag = body["cursor"], response.headers["ETag"]
+
+    # Nothing new: 304 for the same ETag, an empty page for the cursor
+    assert client.get('/transactions', headers={"If-None-Match": etag}).status_code == 304
+    body = client.get(f'/transactions?since_id={cursor}').get_json()
+    assert (body["transactions"], body["cursor"], body["has_more"]) == ([], cursor, False)
+
+    # New rows come oldest first, a page at a time
+    post_transactions(client, transactions[3:6])
+    body = client.get(f'/transactions?since_id={cursor}').get_json()
+    assert [t["trans_num"] for t in body["transactions"]] == [txn["trans_num"] for txn in transactions[3:5]]
+    assert body["has_more"]
+    body = client.get(f'/transactions?since_id={body["cursor"]}').get_json()
+    assert [t["trans_num"] for t in body["transactions"]] == [transactions[5]["trans_num"]]
+    assert not body["has_more"]
+    cursor = body["cursor"]
+
+    # After a clear, a cursor beyond the newest id starts over
+    client.post('/clear_db')
+    post_transactions(client, transactions[:1])
+    body = client.get(f'/transactions?since_id={cursor}').get_json()
+    assert body["reset"] and [t["trans_num"] for t in body["transactions"]] == [transactions[0]["trans_num"]]
+
+
+def test_cursor_from_before_a_clear_resets_once_ids_pass_it(app_module, client):
+    from benchmarks.suite import synthetic_transactions
+    transactions = synthetic_transactions(10, seed=15)
+
+    post_transactions(client, transactions[:3])
+    cursor = client.get('/transactions').get_json()["cursor"]
+    client.post('/clear_db')
+    post_transactions(client, transactions[3:])
+
+    # The new generation has passed the old cursor's id: the client must still start over
+    body = client.get(f'/transactions?since_id={cursor}').get_json()
+    assert body["reset"]
+    assert [t["trans_num"] for t in body["transactions"]] == [txn["trans_num"] for txn in transactions[:2:-1]]
+    body = client.get(f'/transactions?since_id={body["cursor"]}').get_json()
+    assert (body["transactions"], body["reset"]) == ([], False)
+
+    # A bare id has no generation to compare, so only one beyond the newest id resets
+    assert not client.get('/transactions?since_id=3').get_json()["reset"]
+    assert client.get('/transactions?since_id=8').get_json()["reset"]
+
+
+def test_feed_etag_changes_when_ids_are_reused(app_module, client):
+    from benchmarks.suite import synthetic_transactions
+    from database.db_setup import FeedState, db
+    transactions = synthetic_transactions(4, seed=14)
+
+    post_transactions(client, transactions[:2])
+    before = client.get('/transactions')
+    client.post('/clear_db')
+    post_transactions(client, transactions[2:])
+    after = client.get('/transactions')
+
+    # Same ids, other rows: neither the cursor nor the ETag may match
+    assert after.get_json()["cursor"] != before.get_json()["cursor"]
+    assert after.headers["ETag"] != before.headers["ETag"]
+    assert client.get('/transactions', headers={"If-None-Match": before.headers["ETag"]}).status_code == 200
+
+    # The generation lives in the database, where every server process sees it
+    with app_module.app.app_context():
+        generation = db.session.get(FeedState, 1).generation
+    client.post('/clear_db')
+    with app_module.app.app_context():
+        assert db.session.get(FeedState, 1).generation == generation + 1
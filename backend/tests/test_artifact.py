@@ -0,0 +1,138 @@
+import json
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from fraud_detection.artifact import LATEST, MANIFEST, load_artifact, load_pickle, read_manifest, resolve_version
+from fraud_detection.cascade import LinearPrescreen
+
+FEATURES = ["a", "b", "c"]
+
+
+@pytest.fixture(scope="module")
+def trained():
+    """A small XGBClassifier and StandardScaler, fitted on random data."""
+    import xgboost as xgb
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, len(FEATURES)))
+    y = (X[:, 0] + rng.normal(scale=0.5, size=len(X)) > 1).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = xgb.XGBClassifier(n_estimators=5, max_depth=2).fit(scaler.transform(X), y)
+    return model, scaler, scaler.transform(X[:20]).astype(np.float32)
+
+
+def save(root, trained, best_threshold=0.5, prescreen=None):
+    from fraud_detection.artifact import save_artifact
+    model, scaler, _ = trained
+    return save_artifact(str(root), model, scaler.mean_, scaler.scale_, FEATURES, best_threshold, prescreen)
+
+
+def test_round_trip(tmp_path, trained):
+    model, scaler, X = trained
+    path = save(tmp_path, trained, prescreen=LinearPrescreen([0.1, 0.2, 0.3], -1.0, 0.2))
+    for engine in ("xgboost", "native"):
+        bundle = load_artifact(str(tmp_path), engine)
+        assert (bundle.path, bundle.version) == (path, os.path.basename(path))
+        assert bundle.feature_names == FEATURES and bundle.prescreen.threshold == 0.2
+        np.testing.assert_array_equal(bundle.scaler_mean, scaler.mean_)
+        np.testing.assert_allclose(bundle.model.predict_proba(X), model.predict_proba(X), rtol=1e-5)
+
+
+@pytest.mark.parametrize("name", ["model.ubj", "scaler_mean.npy", "trees/feature.npy"])
+def test_checksum_mismatch_is_rejected(tmp_path, trained, name):
+    path = save(tmp_path, trained)
+    target = os.path.join(path, name)
+    with open(target, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        read_manifest(path)
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        load_artifact(str(tmp_path))
+    # Verification can be turned off (e.g. for a trusted read-only mount)
+    assert read_manifest(path, verify=False)["version"] == os.path.basename(path)
+
+
+def test_unknown_format_is_rejected(tmp_path, trained):
+    path = save(tmp_path, trained)
+    manifest_path = os.path.join(path, MANIFEST)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest["format"] = 99
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+    with pytest.raises(ValueError, match="Unsupported artifact format"):
+        read_manifest(path, verify=False)
+
+
+def test_resolve_version_follows_latest(tmp_path, trained):
+    with pytest.raises(FileNotFoundError):
+        resolve_version(str(tmp_path))
+
+    first = save(tmp_path, trained, best_threshold=0.3)
+    second = save(tmp_path, trained, best_threshold=0.7)
+    assert first != second
+    assert resolve_version(str(tmp_path)) == second
+    assert load_artifact(str(tmp_path)).best_threshold == 0.7
+    # A version directory resolves to itself, whatever LATEST says
+    assert resolve_version(first) == first
+    assert load_artifact(first).best_threshold == 0.3
+
+    # The pointer is swapped in whole, with no temporary file left behind
+    assert sorted(os.listdir(tmp_path)) == sorted([LATEST, os.path.basename(first), os.path.basename(second)])
+    with open(os.path.join(tmp_path, LATEST)) as f:
+        assert f.read() == os.path.basename(second) + "\n"
+
+
+def write_pickle(tmp_path, data):
+    path = tmp_path / "fraud_model.pkl"
+    with open(path, "wb") as f:
+        pickle.dump(data, f)
+    return str(path)
+
+
+@pytest.mark.parametrize("engine", ["xgboost", "native"])
+def test_legacy_pickle(tmp_path, trained, engine):
+    model, scaler, X = trained
+    prescreen = LinearPrescreen([0.1, 0.2, 0.3], -1.0, 0.2)
+    path = write_pickle(tmp_path, {"model": model, "scaler": scaler, "features": FEATURES,
+                                   "best_threshold": 0.4, "prescreen": prescreen.to_dict()})
+
+    bundle = load_pickle(path, engine)
+    assert (bundle.version, bundle.path, bundle.best_threshold) == ("fraud_model.pkl", path, 0.4)
+    assert bundle.feature_names == FEATURES and bundle.prescreen.threshold == 0.2
+    np.testing.assert_array_equal(bundle.scaler_scale, scaler.scale_)
+    np.testing.assert_allclose(bundle.model.predict_proba(X), model.predict_proba(X), rtol=1e-5)
+
+
+def test_legacy_pickle_untuned_prescreen(tmp_path, trained):
+    model, scaler, _ = trained
+    path = write_pickle(tmp_path, {"model": model, "scaler": scaler, "features": FEATURES, "best_threshold": 0.4,
+                                   "prescreen": LinearPrescreen([0.1, 0.2, 0.3], -1.0).to_dict()})
+    assert load_pickle(path).prescreen is None
+    assert load_pickle(path, untuned_prescreen=True).prescreen.threshold is None
+
+
+@pytest.mark.parametrize("data, error", [
+    ([1, 2], ValueError),
+    ({"model": None, "features": FEATURES}, KeyError),
+])
+def test_legacy_pickle_rejects_bad_contents(tmp_path, data, error):
+    with pytest.raises(error):
+        load_pickle(write_pickle(tmp_path, data))
+
+
+def test_single_rows_use_one_thread(tmp_path, trained):
+    model, _, X = trained
+    booster_model = load_artifact(save(tmp_path, trained)).model.set_params(n_jobs=4)
+    threads = [json.loads(booster.save_config())["learner"]["generic_param"]["nthread"]
+               for booster in (booster_model.booster, booster_model.single_row_booster)]
+    assert threads == ["4", "1"]
+    np.testing.assert_allclose(booster_model.predict_proba(X[:1]), model.predict_proba(X[:1]), rtol=1e-5)
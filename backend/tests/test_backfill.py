@@ -0,0 +1,114 @@
+import json
+import time
+
+import pytest
+
+
+@pytest.fixture
+def backfill(app_module, client, tmp_path, monkeypatch):
+    """insert_historical_data, imported from a scratch directory (it creates ./backend)."""
+    monkeypatch.chdir(tmp_path)
+    import insert_historical_data
+    return insert_historical_data
+
+
+def stored_scores(app_module):
+    from database.db_setup import Transaction, db
+    with app_module.app.app_context():
+        return dict(db.session.query(Transaction.trans_num, Transaction.fraud_score))
+
+
+def test_parallel_resume_with_uneven_partitions(app_module, backfill, tmp_path, monkeypatch):
+    from benchmarks.suite import synthetic_transactions
+    from database.db_setup import Transaction, db
+
+    transactions = synthetic_transactions(120, seed=6)
+    path = tmp_path / "history.jsonl"
+    path.write_text("".join(json.dumps(txn) + "\n" for txn in transactions))
+    chunk_size = 20
+
+    # Worker 1 only owns one card and is done long before worker 0 scores its last part
+    lone_card = transactions[0]["cc_num"]
+    monkeypatch.setattr(backfill, "_card_partition", lambda txn, workers: int(txn["cc_num"] == lone_card))
+    score_chunk = backfill.score_chunk
+
+    def slow_last_part(part):
+        if any(txn["trans_num"] == transactions[-1]["trans_num"] for txn in part):
+            time.sleep(1.5)
+        return score_chunk(part)
+
+    monkeypatch.setattr(backfill, "score_chunk", slow_last_part)
+    checkpoint = tmp_path / "backfill.ckpt"
+    run = dict(workers=2, checkpoint=str(checkpoint), chunk_size=chunk_size, shuffle_buffer=0, seed=1)
+
+    backfill.parallel_insert_data([str(path)], **run)
+    expected = stored_scores(app_module)
+    assert sorted(expected) == sorted(txn["trans_num"] for txn in transactions)
+
+    # Interrupted after the first two chunks: later parts are neither stored nor checkpointed
+    header, *entries = checkpoint.read_text().splitlines()
+    checkpoint.write_text("\n".join([header] + [line for line in entries if json.loads(line)["chunk"] < 2]) + "\n")
+    later = [txn["trans_num"] for txn in transactions[2 * chunk_size:]]
+    with app_module.app.app_context():
+        db.session.query(Transaction).filter(Transaction.trans_num.in_(later)).delete()
+        db.session.commit()
+
+    # Resuming replays the first chunks through the card state, so scores come out the same
+    backfill.parallel_insert_data([str(path)], **run)
+    assert stored_scores(app_module) == expected
+    chunks = {json.loads(line)["chunk"] for line in checkpoint.read_text().splitlines()[1:]}
+    assert chunks == set(range(len(transactions) // chunk_size))
+
+
+def test_no_shuffle_by_default_for_stateful_features(app_module, backfill, monkeypatch):
+    import copy
+    from fraud_detection import features, ml_model
+
+    monkeypatch.setattr(backfill.config, "BACKFILL_SHUFFLE_BUFFER", None)
+    assert backfill.resolve_shuffle_buffer() == 0
+    assert backfill.resolve_shuffle_buffer(500) == 500
+    monkeypatch.setattr(backfill.config, "BACKFILL_SHUFFLE_BUFFER", 200)
+    assert backfill.resolve_shuffle_buffer() == 200
+
+    bundle = copy.copy(ml_model.get_bundle())
+    bundle.feature_names = [feat for feat in bundle.feature_names
+                            if feat not in features.FEATURES or not features.FEATURES[feat].stateful]
+    monkeypatch.setattr(ml_model, "get_bundle", lambda: bundle)
+    monkeypatch.setattr(backfill.config, "BACKFILL_SHUFFLE_BUFFER", None)
+    assert backfill.resolve_shuffle_buffer() == backfill.DEFAULT_SHUFFLE_BUFFER
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.mark.parametrize("read_size", [1, 7, 1 << 20])
+def test_json_array_elements_straddle_reads(backfill, tmp_path, read_size):
+    elements = [{"trans_num": f"t{i}", "amt": i * 1.5, "merchant": 'a, [b] "c"'} for i in range(5)]
+    text = "  [\n" + " ,\n\t".join(json.dumps(element) for element in elements) + "\n]  \n"
+    path = write(tmp_path, "rows.json", text)
+    assert list(backfill.iter_json_array(path, read_size=read_size)) == elements
+
+
+@pytest.mark.parametrize("text", ["[]", " [ \n ] \n"])
+def test_empty_json_array(backfill, tmp_path, text):
+    assert list(backfill.iter_json_array(write(tmp_path, "empty.json", text), read_size=2)) == []
+
+
+@pytest.mark.parametrize("text", ['[{"a": 1}, {"b": ', '[{"a": 1},', '[{"a": 1}', ""])
+def test_truncated_json_array_raises(backfill, tmp_path, text):
+    with pytest.raises(ValueError):
+        list(backfill.iter_json_array(write(tmp_path, "truncated.json", text), read_size=4))
+
+
+def test_jsonl_skips_blank_lines(backfill, tmp_path):
+    path = write(tmp_path, "rows.jsonl", '{"a": 1}\n\n   \n{"a": 2}\r\n\n')
+    assert list(backfill.iter_jsonl(path)) == [{"a": 1}, {"a": 2}]
+
+
+def test_csv_values_are_typed(backfill, tmp_path):
+    path = write(tmp_path, "rows.csv", "trans_num,amt,city_pop,zip,merchant\nt0,12.5,300,,\"a, b\"\n")
+    assert list(backfill.iter_csv(path)) == [
+        {"trans_num": "t0", "amt": 12.5, "city_pop": 300, "zip": "", "merchant": "a, b"}]
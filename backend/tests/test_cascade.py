@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from fraud_detection.cascade import LinearPrescreen, cascade_report, tune_threshold
+
+
+def labelled_scores(n, seed):
+    """Fraud labels, 0/1 decisions of a "full model" and prescreen probabilities that track both."""
+    rng = np.random.default_rng(seed)
+    risk = rng.normal(size=n)
+    y = (rng.random(n) < 1 / (1 + np.exp(-(3 * risk - 4)))).astype(int)
+    full_predictions = ((3 * risk + rng.normal(size=n) > 3) | (y & (rng.random(n) < 0.3))).astype(int)
+    prescreen_probabilities = 1 / (1 + np.exp(-(2 * risk + rng.normal(scale=0.7, size=n) - 2)))
+    return prescreen_probabilities, full_predictions, y
+
+
+@pytest.mark.parametrize("max_recall_loss", [0.0, 0.005, 0.02, 0.1])
+def test_tuned_threshold_meets_target_recall_on_held_out_rows(max_recall_loss):
+    probabilities, full_predictions, y = labelled_scores(200_000, seed=0)
+    tune, held_out = np.arange(len(y)) % 2 == 0, np.arange(len(y)) % 2 == 1
+
+    threshold = tune_threshold(probabilities[tune], full_predictions[tune], y[tune], max_recall_loss)
+    tuned = cascade_report(probabilities[tune], full_predictions[tune], y[tune], threshold)
+    assert tuned["recall_full"] - tuned["recall_cascade"] <= max_recall_loss
+    assert tuned["short_circuit_fraction"] > 0
+
+    # Out of sample the loss may exceed the target only by sampling noise (~12k frauds per half)
+    report = cascade_report(probabilities[held_out], full_predictions[held_out], y[held_out], threshold)
+    assert report["recall_full"] - report["recall_cascade"] <= max_recall_loss + 0.005
+    assert report["recall_full"] > 0.5
+
+
+def test_threshold_is_the_highest_within_the_loss():
+    probabilities, full_predictions, y = labelled_scores(20_000, seed=1)
+    threshold = tune_threshold(probabilities, full_predictions, y, 0.01)
+    # Any higher threshold clears one more fraud the full model catches
+    higher = np.nextafter(threshold, 1)
+    report = cascade_report(probabilities, full_predictions, y, higher)
+    assert report["recall_full"] - report["recall_cascade"] > 0.01
+
+
+def test_no_frauds_to_lose_clears_everything():
+    assert tune_threshold([0.2, 0.9], [0, 0], [0, 1], 0.5) == 1.0
+
+
+@pytest.mark.parametrize("threshold", [None, 0.25])
+def test_load_model_only_uses_a_tuned_prescreen(app_module, tmp_path, threshold):
+    from fraud_detection import ml_model
+    from fraud_detection.artifact import save_artifact
+
+    bundle = ml_model.get_bundle()
+    prescreen = LinearPrescreen(np.full(bundle.n_features, 0.1), -1.0, threshold)
+    save_artifact(str(tmp_path), bundle.model, bundle.scaler_mean, bundle.scaler_scale, bundle.feature_names,
+                  bundle.best_threshold, prescreen)
+
+    loaded = ml_model.load_model(str(tmp_path), engine="xgboost")
+    if threshold is None:
+        assert loaded.prescreen is None
+    else:
+        assert loaded.prescreen.threshold == threshold
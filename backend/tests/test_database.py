@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+import sqlalchemy as sa
+
+from database import rollups
+from database.db_setup import Transaction, parse_trans_time
+from database.migrations import MIGRATIONS, run_migrations
+
+TABLE = Transaction.__tablename__
+
+
+def transaction_rows(n, seed, start="2020-06-21 00:00:00", days=10):
+    """Rows spread over `days` days from start, with a few categories and states."""
+    rng = np.random.default_rng(seed)
+    start = parse_trans_time(start)
+    rows = []
+    for i, ts in enumerate(np.sort(start + rng.integers(0, int(days * 86400), size=n))):
+        trans_time = np.datetime64(int(ts), "s").astype(str).replace("T", " ")
+        rows.append({
+            "trans_date_trans_time": trans_time, "cc_num": str(rng.integers(100)), "merchant": "m",
+            "category": str(rng.choice(["grocery_pos", "travel", "misc_net"])),
+            "amt": round(float(rng.uniform(1, 500)), 2),
+            "first": "a", "last": "b", "gender": "F", "street": "s", "city": "c",
+            "state": str(rng.choice(["CA", "NY", "TX"])), "zip": 1, "lat": 0.0, "long": 0.0, "city_pop": 1,
+            "job": "j", "dob": "1990-01-01", "trans_num": f"t{seed}-{i}", "unix_time": int(ts),
+            "merch_lat": 0.0, "merch_long": 0.0, "fraud_score": 0.5, "is_fraud": bool(rng.random() < 0.2),
+        })
+    return rows
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'transactions.db'}")
+    Transaction.metadata.create_all(engine)
+    run_migrations(engine)
+    return engine
+
+
+def grouped_series(conn, seconds):
+    """The /stats series computed straight from the transaction table (buckets rounded down)."""
+    groups = {}
+    for trans_ts, is_fraud, amt in conn.execute(sa.text(f'SELECT trans_ts, is_fraud, amt FROM "{TABLE}"')):
+        group = groups.setdefault(trans_ts // seconds * seconds, [0, 0, 0.0])
+        group[0] += 1
+        group[1] += is_fraud == 1
+        group[2] += amt
+    starts = sorted(groups)
+    return [starts] + [[groups[start][i] for start in starts] for i in range(3)]
+
+
+def assert_stats_match_table(conn, max_points=None):
+    for resolution, (_, seconds) in rollups.RESOLUTIONS.items():
+        stats = rollups.read_stats(conn, resolution=resolution, max_points=max_points)
+        series = stats["series"]
+        if max_points is not None:
+            assert series["bucket_seconds"] % seconds == 0 and len(series["start"]) <= max_points
+        start, count, fraud_count, amount = grouped_series(conn, series["bucket_seconds"])
+        assert (series["start"], series["count"], series["fraud_count"]) == (start, count, fraud_count), resolution
+        np.testing.assert_allclose(series["amount"], amount, rtol=1e-12)
+
+    totals = conn.execute(sa.text(f'SELECT COUNT(*), SUM(is_fraud = 1), SUM(amt) FROM "{TABLE}"')).one()
+    assert (stats["totals"]["count"], stats["totals"]["fraud_count"]) == tuple(totals[:2])
+    assert stats["totals"]["amount"] == pytest.approx(totals[2])
+    categories = dict(conn.execute(sa.text(f'SELECT category, COUNT(*) FROM "{TABLE}" GROUP BY category')).all())
+    assert {row["category"]: row["count"] for row in stats["categories"]} == categories
+    day_hour = conn.execute(sa.text(
+        f"SELECT (CAST(strftime('%w', trans_ts, 'unixepoch') AS INTEGER) + 6) % 7, "
+        f"CAST(strftime('%H', trans_ts, 'unixepoch') AS INTEGER), COUNT(*) FROM \"{TABLE}\" GROUP BY 1, 2")).all()
+    assert all(stats["day_hour"]["count"][day][hour] == n for day, hour, n in day_hour)
+    assert sum(map(sum, stats["day_hour"]["count"])) == totals[0]
+
+
+def test_triggers_keep_rollups_in_step(engine):
+    with engine.begin() as conn:
+        conn.execute(Transaction.__table__.insert(), transaction_rows(2000, seed=0))
+    with engine.begin() as conn:
+        # A second batch lands in buckets that already exist
+        conn.execute(Transaction.__table__.insert(), transaction_rows(500, seed=1))
+    with engine.connect() as conn:
+        assert_stats_match_table(conn)
+
+
+@pytest.mark.parametrize("max_points", [1, 7, 50])
+def test_max_points_widens_buckets(engine, max_points):
+    with engine.begin() as conn:
+        conn.execute(Transaction.__table__.insert(), transaction_rows(2000, seed=2))
+    with engine.connect() as conn:
+        assert_stats_match_table(conn, max_points=max_points)
+
+
+def test_rebuild_matches_triggers(engine):
+    with engine.begin() as conn:
+        conn.execute(Transaction.__table__.insert(), transaction_rows(1000, seed=3))
+        conn.execute(sa.text(f'DELETE FROM "{TABLE}" WHERE id % 3 = 0'))  # No delete trigger
+        rollups.rebuild(conn)
+    with engine.connect() as conn:
+        assert_stats_match_table(conn)
+
+
+
+def test_times_before_1970_are_bucketed_down(engine):
+    rows = transaction_rows(500, seed=6, start="1969-12-31 22:00:00", days=0.25)
+    rows[0].update(trans_date_trans_time="1969-12-31 23:59:30", unix_time=-30)
+    with engine.begin() as conn:
+        conn.execute(Transaction.__table__.insert(), rows)
+    with engine.connect() as conn:
+        assert_stats_match_table(conn)
+        assert conn.execute(sa.text(f"SELECT MIN(trans_ts) FROM \"{TABLE}\"")).scalar() < 0
+        # 23:59:30 on 31 December 1969 is in the minute from 23:59, not the one from 00:00
+        assert rollups.read_stats(conn, "minute", since=-60, until=0)["series"]["start"] == [-60]
+
+
+def test_migrations_upgrade_a_baseline_database(tmp_path):
+    # The transaction table as the baseline created it: no trans_ts, no indexes
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    baseline = sa.Table(TABLE, sa.MetaData(), *(
+        sa.Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable,
+                  unique=column.unique)
+        for column in Transaction.__table__.columns if column.name != "trans_ts"))
+    baseline.metadata.create_all(engine)
+    rows = transaction_rows(300, seed=4)
+    with engine.begin() as conn:
+        conn.execute(baseline.insert(), rows)
+
+    run_migrations(engine)
+    with engine.connect() as conn:
+        assert conn.execute(sa.text("PRAGMA user_version")).scalar() == MIGRATIONS[-1][0]
+        trans_ts = conn.execute(sa.text(f'SELECT trans_date_trans_time, trans_ts FROM "{TABLE}"')).all()
+        assert all(ts is not None and ts == parse_trans_time(trans_time) for trans_time, ts in trans_ts)
+        indexes = {index["name"] for index in sa.inspect(conn).get_indexes(TABLE)}
+        assert {index.name for index in Transaction.__table__.indexes} <= indexes
+        assert_stats_match_table(conn)
+
+    # Running them again is a no-op, and new rows still go through the triggers
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(Transaction.__table__.insert(), transaction_rows(100, seed=5))
+    with engine.connect() as conn:
+        assert_stats_match_table(conn)
+
+
+def test_slash_dates_are_read_month_first():
+    march_4 = parse_trans_time("2020-03-04 10:00:00")
+    assert parse_trans_time("03/04/2020 10:00") == march_4
+    assert parse_trans_time("03/04/2020 10:00:00") == march_4
+    # Only valid day-first: left empty rather than guessed
+    assert parse_trans_time("13/04/2020 10:00") is None
+    assert parse_trans_time("2020-03-04T10:00:00+00:00") == march_4
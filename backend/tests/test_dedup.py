@@ -0,0 +1,43 @@
+import numpy as np
+
+from serving.dedup import BloomFilter, DedupIndex
+
+
+def test_keys_added_in_bulk_are_found_one_by_one():
+    keys = [f"txn-{i}" for i in range(5000)] + [12345, "ünïcode"]
+    bulk = BloomFilter(capacity=len(keys), false_positive_rate=0.01)
+    bulk.update(keys)
+    assert all(key in bulk for key in keys)
+
+    # Both paths set the same bits
+    single = BloomFilter(capacity=len(keys), false_positive_rate=0.01)
+    for key in keys:
+        single.add(key)
+    assert np.array_equal(bulk.bits, single.bits)
+    assert bulk.count == single.count == len(keys)
+
+
+def test_false_positive_rate_at_capacity():
+    capacity, rate = 20_000, 0.01
+    bloom = BloomFilter(capacity, rate)
+    bloom.update(f"stored-{i}" for i in range(capacity))
+    false_positives = sum(f"new-{i}" in bloom for i in range(capacity))
+    assert false_positives / capacity < 2 * rate
+
+
+def test_lookup_falls_back_to_fetch_after_eviction():
+    stored = {f"t{i}": (i / 10, i % 2) for i in range(3)}
+    fetched = []
+
+    def fetch(trans_nums):
+        fetched.append(list(trans_nums))
+        return {trans_num: stored[trans_num] for trans_num in trans_nums if trans_num in stored}
+
+    index = DedupIndex(fetch, capacity=100, recent_size=2)
+    index.add((trans_num, *result) for trans_num, result in stored.items())
+
+    # t0 was evicted from the recent results, the filter still knows it
+    assert index.lookup(["t0", "t1", "t2", "unseen"]) == stored
+    assert fetched == [["t0"]]
+    stats = index.stats()
+    assert (stats["recent_hits"], stats["stored_hits"], stats["false_positives"]) == (2, 1, 0)
@@ -0,0 +1,178 @@
+"""
+Parity of the shared feature pipeline (fraud_detection.features) with independent
+references: the previous pandas implementation of model/generate_model.py for the
+stateless features, and per-card time-based rolling windows in pandas for the
+velocity features. compute_batch, compute_one row by row and FeatureStream over
+chunks must all return the same values.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+from benchmarks.bench_features import load_frame, pandas_reference
+from fraud_detection import features
+from fraud_detection.card_state import CardStateStore
+from fraud_detection.velocity import MERCHANT_WINDOW, VELOCITY_FEATURES, WINDOWS, VelocityEngine
+
+
+def velocity_reference(df, history_size=config.VELOCITY_HISTORY_SIZE):
+    """
+    Velocity features from pandas rolling windows over each card's rows (in time order).
+    A window holds the rows in (t - window, t], but at most the card's last history_size
+    rows, which the engine keeps.
+    """
+    frame = pd.DataFrame({
+        # The engine keeps amounts as float32
+        "amt": df["amt"].to_numpy(np.float32).astype(np.float64),
+        "merchant": pd.factorize(df["merchant"])[0].astype(np.float64),
+        "row": np.arange(len(df)),
+    }, index=pd.to_datetime(df["unix_time"].to_numpy(), unit="s"))
+
+    def distinct(ids):
+        return len(np.unique(ids))
+
+    columns = {feat: np.zeros(len(df)) for feat in VELOCITY_FEATURES}
+    for _, card in frame.groupby(df["cc_num"].astype(str).to_numpy()):
+        rows = card["row"].to_numpy()
+        last_rows = card.rolling(history_size, min_periods=1)
+        for name, seconds in WINDOWS:
+            window = card["amt"].rolling(pd.Timedelta(seconds=seconds), closed="right")
+            capped = window.count().to_numpy() > history_size
+            columns[f"txn_count_{name}"][rows] = np.minimum(window.count(), history_size)
+            columns[f"amt_sum_{name}"][rows] = np.where(capped, last_rows["amt"].sum(), window.sum())
+        merchants = card["merchant"].rolling(pd.Timedelta(seconds=MERCHANT_WINDOW), closed="right")
+        capped = merchants.count().to_numpy() > history_size
+        columns["distinct_merchants_24h"][rows] = np.where(
+            capped, last_rows["merchant"].apply(distinct, raw=True), merchants.apply(distinct, raw=True))
+    return columns
+
+
+@pytest.fixture(scope="module")
+def frame():
+    return load_frame(rows=5000, seed=7)
+
+
+@pytest.fixture(scope="module")
+def reference(frame):
+    reference = pandas_reference(frame, velocity=False)
+    for feat, values in velocity_reference(frame).items():
+        reference[feat] = values
+    return reference
+
+
+def assert_same(reference, computed):
+    for feat in features.FEATURE_NAMES:
+        expected = reference[feat].to_numpy(np.float64)
+        actual = np.asarray(computed[feat], dtype=np.float64)
+        assert len(actual) == len(expected), f"{feat} has {len(actual)} rows, expected {len(expected)}"
+        if feat.startswith("amt_sum_"):
+            # Rolling sums add and subtract, the engine sums each window afresh
+            np.testing.assert_allclose(actual, expected, rtol=1e-9, err_msg=feat)
+        else:
+            np.testing.assert_array_equal(actual, expected, err_msg=feat)
+
+
+def test_batch_matches_reference(frame, reference):
+    columns = {field: frame[field].to_numpy() for field in features.FIELDS}
+    assert_same(reference, features.compute_batch(columns, features.FEATURE_NAMES))
+
+
+def test_single_matches_reference(frame, reference):
+    state = features.FeatureState()
+    rows = [features.compute_one(row, features.FEATURE_NAMES, state) for row in frame.to_dict("records")]
+    assert_same(reference, {feat: [row[feat] for row in rows] for feat in features.FEATURE_NAMES})
+
+
+@pytest.mark.parametrize("chunk_size", [1, 777, 5000])
+def test_streaming_matches_reference(frame, reference, chunk_size):
+    columns = {field: frame[field].to_numpy() for field in features.FIELDS}
+    stream = features.FeatureStream(features.FEATURE_NAMES)
+    chunks = [stream.process({field: values[start:start + chunk_size] for field, values in columns.items()})
+              for start in range(0, len(frame), chunk_size)]
+    assert_same(reference, {feat: np.concatenate([chunk[feat] for chunk in chunks])
+                            for feat in features.FEATURE_NAMES})
+
+
+def test_window_counts_saturate_at_history_size():
+    engine = VelocityEngine(history_size=4)
+    n = 6
+    columns = engine.compute_batch(["1"] * n, 1_000_000 + np.arange(n), np.ones(n), ["m"] * n)
+    assert columns["txn_count_1h"].tolist() == [1, 2, 3, 4, 4, 4]
+    assert columns["amt_sum_1h"].tolist() == [1, 2, 3, 4, 4, 4]
+    assert columns["distinct_merchants_24h"].tolist() == [1] * n
+
+
+def engine_state(engine):
+    """Each card's ring buffer oldest first, in LRU order."""
+    state = []
+    for key, slot in engine._slots.items():
+        count, head = int(engine._counts[slot]), int(engine._heads[slot])
+        ring = [(head - count + i) % engine.history_size for i in range(count)]
+        state.append((key, engine._times[slot, ring].tolist(), engine._amts[slot, ring].tolist(),
+                      engine._merchants[slot, ring].tolist()))
+    return state
+
+
+@pytest.mark.parametrize("history_size, max_cards", [(4, 1000), (32, 1000), (8, 30)])
+def test_batch_matches_row_by_row_updates(history_size, max_cards):
+    rng = np.random.default_rng(history_size)
+    n = 3000
+    cards = rng.integers(0, 40, size=n).astype(str)
+    # Mostly forward in time, with repeated times and some jumps back
+    times = 1_600_000_000 + np.cumsum(rng.choice([0, 30, 600, 5000, -7200], size=n, p=[.1, .4, .3, .15, .05]))
+    amts = rng.uniform(1, 3000, size=n).round(2)
+    merchants = rng.choice([f"merchant_{i}" for i in range(12)], size=n)
+
+    batched = VelocityEngine(history_size=history_size, max_cards=max_cards, initial_capacity=4)
+    single = VelocityEngine(history_size=history_size, max_cards=max_cards, initial_capacity=4)
+    # Two batches, so the second starts from stored history
+    for rows in (slice(0, 1000), slice(1000, n)):
+        columns = batched.compute_batch(cards[rows], times[rows], amts[rows], merchants[rows])
+        expected = [single.update(*row) for row in zip(cards[rows], times[rows], amts[rows], merchants[rows])]
+        for feat in VELOCITY_FEATURES:
+            np.testing.assert_array_equal(columns[feat], [row[feat] for row in expected], err_msg=feat)
+        assert engine_state(batched) == engine_state(single)
+
+
+def test_times_outside_the_ring_buffer_range_are_rejected():
+    engine = VelocityEngine()
+    with pytest.raises(ValueError):
+        engine.update("1", -1, 10.0, "m")
+    with pytest.raises(ValueError):
+        engine.compute_batch(["1", "2"], [1_600_000_000, 2 ** 32], [1.0, 2.0], ["m", "m"])
+    assert len(engine) == 0
+
+
+@pytest.mark.parametrize("history_size, max_cards", [(4, 1000), (8, 30)])
+def test_batch_undo_matches_row_by_row_undo(history_size, max_cards):
+    rng = np.random.default_rng(history_size)
+    n = 600
+    cards = rng.integers(0, 40, size=n).astype(str)
+    times = 1_600_000_000 + np.cumsum(rng.choice([0, 30, 600, 5000], size=n))
+    amts = rng.uniform(1, 3000, size=n).round(2)
+    merchants = rng.choice([f"merchant_{i}" for i in range(12)], size=n)
+    # Rows that end up not stored, reverted newest first as the app does
+    rejected = sorted(rng.choice(n, size=60, replace=False), reverse=True)
+
+    engines = []
+    for batch in (True, False):
+        engine = VelocityEngine(history_size=history_size, max_cards=max_cards, initial_capacity=4)
+        last_seen = CardStateStore(max_cards=max_cards)
+        engine.compute_batch(cards[:100], times[:100], amts[:100], merchants[:100])
+        last_seen.observe_batch(cards[:100], times[:100])
+        undo_logs = [[] for _ in range(n - 100)]
+        rows = slice(100, n)
+        if batch:
+            engine.compute_batch(cards[rows], times[rows], amts[rows], merchants[rows], undo_logs=undo_logs)
+            last_seen.observe_batch(cards[rows], times[rows], undo_logs=undo_logs)
+        else:
+            for undo_log, row in zip(undo_logs, zip(cards[rows], times[rows], amts[rows], merchants[rows])):
+                engine.update(*row, undo_log=undo_log)
+                last_seen.observe(row[0], row[1], undo_log)
+        for i in rejected:
+            if i >= 100:
+                features.rollback(undo_logs[i - 100])
+        engines.append((engine_state(engine), list(last_seen._last_seen.items())))
+
+    assert engines[0] == engines[1]
@@ -0,0 +1,85 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from serving.micro_batcher import MicroBatcher
+
+
+class Recorder:
+    """score_batch that doubles its items and records the batches it got."""
+
+    def __init__(self, gate=None):
+        self.batches = []
+        self.gate = gate
+
+    def __call__(self, items):
+        if self.gate is not None:
+            self.gate.wait()
+        self.batches.append(list(items))
+        return [item * 2 for item in items]
+
+
+def test_full_batch_is_scored_without_waiting():
+    recorder = Recorder()
+    batcher = MicroBatcher(recorder, max_batch_size=4, max_wait_ms=60_000)
+    try:
+        with ThreadPoolExecutor(4) as pool:
+            assert sorted(pool.map(lambda i: batcher.submit(i, timeout=5), range(4))) == [0, 2, 4, 6]
+        assert [sorted(batch) for batch in recorder.batches] == [[0, 1, 2, 3]]
+        assert batcher.stats()["max_batch_size_seen"] == 4
+    finally:
+        batcher.shutdown()
+
+
+def test_partial_batch_is_scored_after_max_wait():
+    recorder = Recorder()
+    batcher = MicroBatcher(recorder, max_batch_size=64, max_wait_ms=50)
+    try:
+        start = time.perf_counter()
+        assert batcher.submit(21, timeout=5) == 42
+        assert 0.04 <= time.perf_counter() - start < 5
+        assert recorder.batches == [[21]]
+    finally:
+        batcher.shutdown()
+
+
+@pytest.mark.parametrize("score_batch", [lambda items: 1 / 0, lambda items: items[:-1]])
+def test_failed_batch_reaches_every_caller(score_batch):
+    batcher = MicroBatcher(score_batch, max_batch_size=3, max_wait_ms=60_000)
+    try:
+        def submit(i):
+            try:
+                batcher.submit(i, timeout=5)
+            except Exception as e:
+                return type(e)
+        with ThreadPoolExecutor(3) as pool:
+            errors = list(pool.map(submit, range(3)))
+        assert len(set(errors)) == 1 and errors[0] in (ZeroDivisionError, RuntimeError)
+
+        # The batcher keeps going after a failed batch
+        batcher.score_batch = Recorder()
+        with ThreadPoolExecutor(3) as pool:
+            assert sorted(pool.map(lambda i: batcher.submit(i, timeout=5), range(3))) == [0, 2, 4]
+    finally:
+        batcher.shutdown()
+
+
+def test_shutdown_scores_pending_items():
+    gate = threading.Event()
+    recorder = Recorder(gate)
+    batcher = MicroBatcher(recorder, max_batch_size=1, max_wait_ms=1)
+    with ThreadPoolExecutor(5) as pool:
+        results = [pool.submit(batcher.submit, i, 5) for i in range(5)]
+        # The first batch is held at the gate while the others queue up behind it
+        deadline = time.monotonic() + 5
+        while batcher._queue.qsize() < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stopping = pool.submit(batcher.shutdown)
+        gate.set()
+        stopping.result(timeout=5)
+        assert sorted(result.result(timeout=5) for result in results) == [0, 2, 4, 6, 8]
+    assert len(recorder.batches) == 5
+    with pytest.raises(RuntimeError):
+        batcher.submit(1)
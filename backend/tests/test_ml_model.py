@@ -0,0 +1,106 @@
+import copy
+
+import pytest
+
+from fraud_detection.velocity import VELOCITY_FEATURES
+
+
+@pytest.fixture
+def reload_after_first_call(app_module, client, monkeypatch):
+    """
+    Simulates a hot reload landing while a prediction runs: only the first
+    get_bundle() call returns the current model, later ones a model without the
+    velocity features.
+    """
+    from fraud_detection import ml_model
+    bundle = ml_model.get_bundle()
+    reloaded = copy.copy(bundle)
+    reloaded.feature_names = [feat for feat in bundle.feature_names if feat not in VELOCITY_FEATURES]
+    calls = iter([bundle])
+    monkeypatch.setattr(ml_model, "get_bundle", lambda: next(calls, reloaded))
+    return ml_model
+
+
+def test_predict_fraud_uses_one_bundle(reload_after_first_call):
+    from benchmarks.suite import synthetic_transactions
+    result = reload_after_first_call.predict_fraud(dict(synthetic_transactions(1, seed=5)[0]))
+    assert "error" not in result
+
+
+def test_predict_fraud_batch_uses_one_bundle(reload_after_first_call):
+    from benchmarks.suite import synthetic_transactions
+    results = reload_after_first_call.predict_fraud_batch([dict(txn) for txn in synthetic_transactions(3, seed=5)])
+    assert all("error" not in result for result in results)
+
+
+def score_both_ways(ml_model, transactions):
+    """predict_fraud row by row and predict_fraud_batch, each from empty card state."""
+    results = []
+    for score in (lambda txns: [ml_model.predict_fraud(txn) for txn in txns], ml_model.predict_fraud_batch):
+        ml_model.card_state.clear()
+        ml_model.velocity_engine.clear()
+        results.append(score([dict(txn) for txn in transactions]))
+    return results
+
+
+@pytest.mark.parametrize("prescreen", [False, True])
+def test_single_and_batch_scores_agree(app_module, client, monkeypatch, prescreen):
+    import numpy as np
+    from benchmarks.suite import synthetic_transactions
+    from fraud_detection import ml_model
+    from fraud_detection.cascade import LinearPrescreen
+
+    bundle = copy.copy(ml_model.get_bundle())
+    if prescreen:
+        # Clears about half the rows
+        coef = np.random.default_rng(0).normal(scale=0.5, size=bundle.n_features)
+        bundle.prescreen = LinearPrescreen(coef, 0.0, threshold=0.5)
+    monkeypatch.setattr(ml_model, "get_bundle", lambda: bundle)
+
+    before = ml_model.cascade_stats.stats()
+    single, batch = score_both_ways(ml_model, synthetic_transactions(300, seed=9))
+    after = ml_model.cascade_stats.stats()
+    assert all("error" not in result for result in single + batch)
+    assert [result["is_fraud"] for result in single] == [result["is_fraud"] for result in batch]
+    np.testing.assert_allclose([result["fraud_score"] for result in single],
+                               [result["fraud_score"] for result in batch], rtol=0, atol=1e-6)
+    if prescreen:
+        screened = after["screened"] - before["screened"]
+        short_circuited = after["short_circuited"] - before["short_circuited"]
+        assert screened == 2 * len(batch) and 0 < short_circuited < screened
+
+
+def card_states(ml_model):
+    """Time-since-last and velocity state per card, in LRU order."""
+    engine = ml_model.velocity_engine
+    rings = []
+    for key, slot in engine._slots.items():
+        count, head = int(engine._counts[slot]), int(engine._heads[slot])
+        ring = [(head - count + i) % engine.history_size for i in range(count)]
+        rings.append((key, engine._times[slot, ring].tolist(), engine._amts[slot, ring].tolist(),
+                      engine._merchants[slot, ring].tolist()))
+    return list(ml_model.card_state._last_seen.items()), rings
+
+
+def test_batch_leaves_the_same_features_and_card_state(app_module, client):
+    from benchmarks.suite import synthetic_transactions
+    from fraud_detection import features, ml_model
+
+    stateful = [feat for feat in ml_model.get_bundle().feature_names
+                if feat in features.FEATURES and features.FEATURES[feat].stateful]
+    assert stateful
+    # Two batches, so the second starts from the card state the first left
+    batches = [synthetic_transactions(300, seed=9)[:150], synthetic_transactions(300, seed=9)[150:]]
+    filled, states = [], []
+    for score in (lambda txns: [ml_model.predict_fraud(txn) for txn in txns], ml_model.predict_fraud_batch):
+        ml_model.card_state.clear()
+        ml_model.velocity_engine.clear()
+        transactions = [[dict(txn) for txn in batch] for batch in batches]
+        for batch in transactions:
+            assert all("error" not in result for result in score(batch))
+        filled.append([[(feat, txn[feat], type(txn[feat])) for feat in stateful] for batch in transactions
+                       for txn in batch])
+        states.append(card_states(ml_model))
+
+    assert filled[0] == filled[1]
+    assert states[0] == states[1]
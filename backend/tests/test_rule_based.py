@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from fraud_detection import rule_based
+from fraud_detection.rule_based import RULES, RuleSet, geodesic_km, haversine_km
+
+
+@pytest.fixture(scope="module")
+def transactions():
+    """Generated transactions, many of them pushed onto or just past a rule threshold."""
+    from benchmarks.suite import synthetic_transactions
+    transactions = [dict(txn) for txn in synthetic_transactions(400, seed=11)]
+    rng = np.random.default_rng(11)
+    for txn in transactions:
+        txn["amt"] = float(rng.choice([txn["amt"], 5000, 5000.01, 7200.5]))
+        txn["category"] = str(rng.choice([txn["category"], "Casino", "Luxury Goods", "grocery_pos"]))
+        txn["city_pop"] = int(rng.choice([txn["city_pop"], 5_000_000, 5_000_001]))
+        # Merchants due north, from well inside to well outside the 100 km radius
+        txn["merch_lat"] = txn["lat"] + rng.uniform(0.8, 1.0)
+        txn["merch_long"] = txn["long"]
+    return transactions
+
+
+@pytest.mark.parametrize("distance", ["haversine", "geodesic"])
+def test_scalar_and_vectorized_rules_agree(transactions, distance):
+    scores, hits = RuleSet(distance=distance).evaluate_transactions(transactions)
+    assert scores.tolist() == [RuleSet(distance=distance).score(txn) for txn in transactions]
+    for rule in RULES:
+        single = RuleSet([rule], distance=distance)
+        expected = [single.score(txn) > 0 for txn in transactions]
+        assert hits[rule["name"]].tolist() == expected, rule["name"]
+        assert 0 < sum(expected) < len(transactions), f"{rule['name']} does not split the rows"
+
+
+def test_module_functions_agree(transactions):
+    scores, _ = rule_based.detect_fraud_batch(transactions)
+    assert scores.tolist() == [rule_based.detect_fraud(txn) for txn in transactions]
+
+
+def test_distance_modes_agree_away_from_the_threshold(transactions):
+    location = [np.array([txn[key] for txn in transactions]) for key in rule_based.LOCATION_FIELDS]
+    haversine, geodesic = haversine_km(*location), geodesic_km(*location)
+    np.testing.assert_allclose(haversine, geodesic, rtol=0.005)
+
+    _, haversine_hits = RuleSet(distance="haversine").evaluate_transactions(transactions)
+    _, geodesic_hits = RuleSet(distance="geodesic").evaluate_transactions(transactions)
+    clear = np.abs(geodesic - 100) > 0.005 * 100
+    assert (haversine_hits["location_mismatch"] == geodesic_hits["location_mismatch"])[clear].all()
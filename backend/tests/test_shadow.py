@@ -0,0 +1,28 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from fraud_detection import tree_engine
+from fraud_detection.artifact import load_artifact
+from serving.shadow import ShadowScorer
+
+
+@pytest.mark.skipif(tree_engine.njit is None, reason="numba is not installed")
+def test_shadow_native_bundle_stays_serial(app_module, monkeypatch):
+    bundle = load_artifact(os.environ["MODEL_PATH"], engine="native")
+    X = np.random.default_rng(0).normal(size=(tree_engine.PARALLEL_MIN_ROWS, bundle.n_features))
+    expected = bundle.model.predict_proba(X)
+
+    shadow = ShadowScorer(lambda: bundle)
+    deadline = time.monotonic() + 5
+    while shadow.bundle is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert shadow.bundle is bundle
+
+    def parallel_kernel(*args):
+        raise AssertionError("the shadow model used the parallel kernel")
+
+    monkeypatch.setattr(tree_engine, "_traverse_parallel", parallel_kernel)
+    assert np.array_equal(bundle.model.predict_proba(X), expected)
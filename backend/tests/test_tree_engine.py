@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import xgboost as xgb
+
+from fraud_detection import tree_engine
+from fraud_detection.tree_engine import CompiledTreeEnsemble
+
+needs_numba = pytest.mark.skipif(tree_engine.njit is None, reason="numba is not installed")
+
+
+@pytest.fixture(scope="module")
+def model():
+    """A small booster trained with missing values, so default directions matter."""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(3000, 8)).astype(np.float32)
+    X[rng.random(X.shape) < 0.1] = np.nan
+    y = ((np.nan_to_num(X[:, 0]) + np.isnan(X[:, 1]) + 0.5 * rng.normal(size=len(X))) > 0.8).astype(int)
+    return xgb.XGBClassifier(n_estimators=40, max_depth=5, learning_rate=0.1, tree_method="hist",
+                             random_state=0).fit(X, y)
+
+
+@pytest.fixture(scope="module")
+def rows():
+    """More rows than PARALLEL_MIN_ROWS, with missing values throughout."""
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(tree_engine.PARALLEL_MIN_ROWS * 2, 8)).astype(np.float32)
+    X[rng.random(X.shape) < 0.1] = np.nan
+    return X
+
+
+def assert_matches(model, engine, X):
+    np.testing.assert_allclose(engine.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-6)
+
+
+def test_numpy_traversal_matches_xgboost(model, rows):
+    assert_matches(model, CompiledTreeEnsemble.from_booster(model, use_numba=False), rows)
+
+
+@needs_numba
+def test_serial_kernel_matches_xgboost(model, rows, monkeypatch):
+    engine = CompiledTreeEnsemble.from_booster(model)
+    monkeypatch.setattr(tree_engine, "_traverse_parallel", None)  # Fails if it were used
+    assert_matches(model, engine, rows[:tree_engine.PARALLEL_MIN_ROWS - 1])
+    assert_matches(model, engine, rows[:1])
+    assert_matches(model, engine.set_params(n_jobs=1), rows)
+
+
+@needs_numba
+def test_parallel_kernel_matches_xgboost(model, rows, monkeypatch):
+    engine = CompiledTreeEnsemble.from_booster(model)
+    monkeypatch.setattr(tree_engine, "_traverse_compiled", None)  # Fails if it were used
+    assert len(rows) >= tree_engine.PARALLEL_MIN_ROWS
+    assert_matches(model, engine, rows)
+
+
+@needs_numba
+def test_kernels_are_cached_apart():
+    # numba names cache files after the function; a shared name lets the serial kernel
+    # load the parallel one (and its thread pool) from the cache
+    serial, parallel = tree_engine._traverse_compiled.py_func, tree_engine._traverse_parallel.py_func
+    assert serial.__qualname__ != parallel.__qualname__
+
+
+@pytest.mark.parametrize("use_numba", [pytest.param(True, marks=needs_numba), False])
+def test_saved_ensemble_matches_xgboost(model, rows, tmp_path, use_numba):
+    CompiledTreeEnsemble.from_booster(model).save(tmp_path)
+    engine = CompiledTreeEnsemble.load(tmp_path, use_numba=use_numba)
+    assert isinstance(engine.value, np.memmap)
+    assert_matches(model, engine, rows)
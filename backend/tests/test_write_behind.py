@@ -0,0 +1,198 @@
+import queue
+import threading
+
+import pytest
+import sqlalchemy as sa
+
+from serving.write_behind import WriteBehindWriter
+
+
+def stalled_writer(engine, table, **kwargs):
+    """A writer whose commits wait until the returned event is set, so its queue fills up."""
+    writer = WriteBehindWriter(engine, table, flush_interval_ms=1, put_timeout=0.05, **kwargs)
+    release = threading.Event()
+    write = writer._write
+
+    def wait_and_write(batch):
+        release.wait()
+        write(batch)
+
+    writer._write = wait_and_write
+    return writer, release
+
+
+@pytest.fixture
+def table(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'rows.db'}")
+    table = sa.Table("rows", sa.MetaData(), sa.Column("trans_num", sa.String, primary_key=True),
+                     sa.Column("fraud_score", sa.Float), sa.Column("is_fraud", sa.Integer))
+    table.metadata.create_all(engine)
+    return engine, table
+
+
+def rows(prefix, n):
+    return [{"trans_num": f"{prefix}{i}", "fraud_score": 0.1, "is_fraud": 0} for i in range(n)]
+
+
+def stored(engine, table):
+    with engine.connect() as conn:
+        return sorted(row[0] for row in conn.execute(sa.select(table.c.trans_num)))
+
+
+def test_enqueue_is_all_or_nothing(table):
+    engine, rows_table = table
+    writer, release = stalled_writer(engine, rows_table, max_queue_size=4)
+    try:
+        writer.enqueue(rows("a", 3))
+        with pytest.raises(queue.Full):
+            writer.enqueue(rows("b", 2))
+        writer.enqueue(rows("c", 1))
+        assert writer.stats()["queue_depth"] == 4
+
+        release.set()
+        writer.flush()
+        assert stored(engine, rows_table) == ["a0", "a1", "a2", "c0"]
+        assert writer.stats()["queue_depth"] == 0
+
+        # A batch larger than the queue is let in once the queue is empty
+        writer.enqueue(rows("d", 6))
+        writer.flush()
+        assert len(stored(engine, rows_table)) == 10
+    finally:
+        release.set()
+        writer.shutdown()
+
+
+def card_snapshot(ml_model):
+    """Per-card state as scoring sees it: last-seen times and each card's velocity history."""
+    engine = ml_model.velocity_engine
+    history = {key: (int(engine._heads[slot]), int(engine._counts[slot]), engine._times[slot].tolist(),
+                     engine._amts[slot].tolist(), engine._merchants[slot].tolist())
+               for key, slot in engine._slots.items()}
+    return dict(ml_model.card_state._last_seen), history
+
+
+def test_full_queue_leaves_no_state_behind(app_module, client, monkeypatch):
+    from benchmarks.suite import synthetic_transactions
+    from database.db_setup import Transaction, db
+    from fraud_detection import ml_model
+
+    with app_module.app.app_context():
+        writer, release = stalled_writer(db.engine, Transaction.__table__, max_queue_size=4)
+    monkeypatch.setattr(app_module, "writer", writer)
+    try:
+        transactions = synthetic_transactions(7, seed=3)
+        first, rejected, single = transactions[:3], transactions[3:6], transactions[6]
+
+        response = client.post('/detect_fraud/batch', json=[dict(txn) for txn in first])
+        assert response.status_code == 200 and response.get_json()["inserted"] == 3
+
+        # The queue has room for one more row: neither request fits, nothing of them may stick
+        before = card_snapshot(ml_model)
+        assert client.post('/detect_fraud/batch', json=[dict(txn) for txn in rejected]).status_code == 503
+        assert card_snapshot(ml_model) == before
+        with app_module.app.app_context():
+            assert app_module.dedup.lookup([txn["trans_num"] for txn in rejected]) == {}
+
+        release.set()
+        writer.flush()
+        with app_module.app.app_context():
+            assert sorted(row[0] for row in db.session.query(Transaction.trans_num)) == \
+                sorted(txn["trans_num"] for txn in first)
+
+        # The retry is scored from the same state as the first attempt and stored
+        response = client.post('/detect_fraud/batch', json=[dict(txn) for txn in rejected])
+        assert response.status_code == 200 and response.get_json()["inserted"] == 3
+        assert client.post('/detect_fraud', json=dict(single)).status_code == 200
+        writer.flush()
+        with app_module.app.app_context():
+            assert db.session.query(Transaction).count() == 7
+    finally:
+        release.set()
+        writer.shutdown()
+
+
+def test_duplicates_are_reported_to_on_rejected(table):
+    engine, rows_table = table
+    with engine.begin() as conn:
+        conn.execute(rows_table.insert(), [{"trans_num": "a0", "fraud_score": 0.9, "is_fraud": 1}])
+    rejected = []
+    writer = WriteBehindWriter(engine, rows_table, flush_interval_ms=1,
+                               on_rejected=lambda *args: rejected.append(args))
+    try:
+        writer.enqueue(rows("a", 2) + rows("a", 1), undo_logs=["log0", "log1", "log2"])
+        writer.flush()
+        assert stored(engine, rows_table) == ["a0", "a1"]
+        # Both copies of a0 get the result stored before the batch
+        assert rejected == [(rows("a", 1)[0], (0.9, 1), "log0"), (rows("a", 1)[0], (0.9, 1), "log2")]
+        assert writer.stats()["rows_ignored"] == 2
+
+        # A copy later in the same batch gets the result of the first
+        writer.enqueue(rows("b", 1) * 2)
+        writer.flush()
+        assert rejected[-1] == (rows("b", 1)[0], (0.1, 0), None)
+        assert writer.stats()["rows_ignored"] == 3
+    finally:
+        writer.shutdown()
+
+
+def test_group_mode_duplicate_reverts_state(app_module, client, monkeypatch):
+    from benchmarks.suite import synthetic_transactions
+    from database.db_setup import Transaction, db
+    from fraud_detection import ml_model
+
+    with app_module.app.app_context():
+        writer = WriteBehindWriter(db.engine, Transaction.__table__, flush_interval_ms=1,
+                                   on_rejected=app_module.writer_rejected)
+    monkeypatch.setattr(app_module, "writer", writer)
+    try:
+        backfilled, later = synthetic_transactions(2, seed=4)
+        # Stored behind the duplicate index's back, as a backfill would
+        with app_module.app.app_context():
+            db.session.add(Transaction(**app_module.transaction_row(backfilled, 0.75, 1)))
+            db.session.commit()
+
+        before = card_snapshot(ml_model)
+        response = client.post('/detect_fraud', json=dict(backfilled))
+        assert response.status_code == 200 and not response.get_json().get("duplicate")
+        writer.flush()
+
+        assert card_snapshot(ml_model) == before
+        assert writer.stats()["rows_ignored"] == 1
+        response = client.post('/detect_fraud', json=dict(backfilled)).get_json()
+        assert response["duplicate"] and response["fraud_score"] == 0.75 and response["is_fraud"] == 1
+
+        assert client.post('/detect_fraud', json=dict(later)).status_code == 200
+        writer.flush()
+        with app_module.app.app_context():
+            assert db.session.query(Transaction).count() == 2
+    finally:
+        writer.shutdown()
+
+
+def test_stream_only_gets_stored_rows(app_module, client, monkeypatch):
+    from benchmarks.suite import synthetic_transactions
+    from database.db_setup import Transaction, db
+
+    with app_module.app.app_context():
+        writer = WriteBehindWriter(db.engine, Transaction.__table__, flush_interval_ms=1,
+                                   on_rejected=app_module.writer_rejected,
+                                   on_stored=app_module.publish_stored)
+    monkeypatch.setattr(app_module, "writer", writer)
+    subscription = app_module.broadcaster.subscribe()
+    try:
+        backfilled, later = synthetic_transactions(2, seed=8)
+        with app_module.app.app_context():
+            db.session.add(Transaction(**app_module.transaction_row(backfilled, 0.75, 1)))
+            db.session.commit()
+
+        # The duplicate is answered with a fresh score, but rejected at commit
+        for txn in (backfilled, later):
+            assert client.post('/detect_fraud', json=dict(txn)).status_code == 200
+        writer.flush()
+
+        events, dropped = subscription.wait(timeout=0)
+        assert dropped == 0 and [event["trans_num"] for event in events] == [later["trans_num"]]
+    finally:
+        app_module.broadcaster.unsubscribe(subscription)
+        writer.shutdown()
@@ -0,0 +1,129 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+DAYS_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+class DashboardAggregates:
+    """
+    Running dashboard state, updated only with each refresh's new transactions.
+
+    Counters, the 7x24 day/hour heatmap, category counts and a bucketed amount time
+    series cover everything received; raw rows (for the table and the row-level
+    charts) are kept for the most recent `window_size` transactions only. Refresh
+    cost therefore depends on the number of new rows, not on how long we've streamed.
+    """
+
+    def __init__(self, window_size=5000, bucket_seconds=60, max_buckets=2000):
+        self.window_size = window_size
+        self.initial_bucket_seconds = bucket_seconds
+        self.max_buckets = max_buckets
+        self.reset()
+
+    def reset(self):
+        self.total_transactions = 0
+        self.fraud_count = 0
+        self.total_amount = 0.0
+        self.heatmap = np.zeros((7, 24), dtype=np.int64)  # Monday..Sunday x hour
+        self.category_counts = Counter()
+        self.bucket_seconds = self.initial_bucket_seconds
+        self.amount_series = pd.Series(dtype=np.float64)  # Bucket index -> amount sum
+        self.recent = pd.DataFrame()
+
+    def update(self, new_transactions):
+        """
+        Folds new transactions into the aggregates.
+        :return: The new rows with parsed times (rows with invalid times dropped).
+        """
+        if new_transactions.empty:
+            return new_transactions
+
+        new_transactions = new_transactions.copy()
+        new_transactions['trans_date_trans_time'] = pd.to_datetime(
+            new_transactions['trans_date_trans_time'],
+            format='mixed',  # Handle mixed datetime formats
+            errors='coerce'  # Coerce invalid parsing to NaT (Not a Time)
+        )
+        new_transactions = new_transactions.dropna(subset=['trans_date_trans_time'])
+        if new_transactions.empty:
+            return new_transactions
+
+        times = new_transactions['trans_date_trans_time']
+        new_transactions['hour'] = times.dt.hour
+        new_transactions['day_of_week'] = times.dt.day_name()
+
+        # Counters
+        self.total_transactions += len(new_transactions)
+        self.fraud_count += int((new_transactions['is_fraud'] == 1).sum())
+        self.total_amount += float(new_transactions['amt'].sum())
+
+        # Day x hour heatmap and categories
+        np.add.at(self.heatmap, (times.dt.dayofweek.values, times.dt.hour.values), 1)
+        self.category_counts.update(new_transactions['category'].value_counts().to_dict())
+
+        # Amount time series in fixed-width buckets
+        epoch_seconds = (times - pd.Timestamp(0)).dt.total_seconds().astype(np.int64)
+        sums = new_transactions['amt'].groupby(epoch_seconds.values // self.bucket_seconds).sum()
+        self.amount_series = self.amount_series.add(sums, fill_value=0)
+        while len(self.amount_series) > self.max_buckets:
+            self._coarsen()
+
+        # Bounded raw window
+        self.recent = pd.concat([self.recent, new_transactions], ignore_index=True).tail(self.window_size)
+
+        return new_transactions
+
+    def _coarsen(self):
+        """Doubles the bucket width so the series stays within max_buckets."""
+        index = self.amount_series.index.values * self.bucket_seconds // (self.bucket_seconds * 2)
+        self.bucket_seconds *= 2
+        self.amount_series = self.amount_series.groupby(index).sum()
+
+    @property
+    def fraud_percentage(self):
+        return (self.fraud_count / self.total_transactions) * 100 if self.total_transactions > 0 else 0
+
+    def heatmap_frame(self):
+        return pd.DataFrame(self.heatmap, index=DAYS_ORDER, columns=range(24))
+
+    def category_frame(self):
+        return pd.DataFrame(list(self.category_counts.items()), columns=['category', 'count'])
+
+    def amount_series_frame(self):
+        """Amount per bucket, with bucket start times."""
+        return pd.DataFrame({
+            'trans_date_trans_time': pd.to_datetime(self.amount_series.index.values * self.bucket_seconds, unit='s'),
+            'amt': self.amount_series.values
+        })
+
+
+class ServerStats:
+    """
+    The backend's /stats rollups, exposed like DashboardAggregates so the summary
+    charts can render from either. Covers every stored transaction, not just those
+    this dashboard has received.
+    """
+
+    def __init__(self, payload):
+        totals = payload["totals"]
+        self.total_transactions = totals["count"]
+        self.fraud_count = totals["fraud_count"]
+        self.fraud_percentage = totals["fraud_percentage"]
+        self.total_amount = totals["amount"]
+        self.payload = payload
+
+    def heatmap_frame(self):
+        day_hour = self.payload["day_hour"]
+        return pd.DataFrame(day_hour["count"], index=day_hour["days"], columns=range(24))
+
+    def category_frame(self):
+        return pd.DataFrame(self.payload["categories"], columns=['category', 'count'])
+
+    def amount_series_frame(self):
+        series = self.payload["series"]
+        return pd.DataFrame({
+            'trans_date_trans_time': pd.to_datetime(series["start"], unit='s'),
+            'amt': series["amount"]
+        })
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb(x, y, max_points):
+    """
+    Largest-Triangle-Three-Buckets: picks max_points indices that keep the visual
+    shape of a line (peaks and dips survive, flat stretches are thinned).
+    :param x: Increasing x values (numbers or datetimes).
+    :return: Sorted indices into x/y, always including the first and last point.
+             Points with a missing x or y are only returned when nothing is dropped.
+    """
+    n = len(x)
+    if max_points >= n or n <= 2:
+        return np.arange(n)
+    max_points = max(max_points, 3)
+
+    x = np.asarray(x)
+    missing = np.zeros(n, dtype=bool)
+    if np.issubdtype(x.dtype, np.datetime64):
+        missing = np.isnat(x)
+        x = x.astype('datetime64[ns]').astype(np.int64)
+    x = x.astype(np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    missing |= np.isnan(x) | np.isnan(y)
+    if missing.any():
+        present = np.flatnonzero(~missing)
+        return present[lttb(x[present], y[present], max_points)]
+
+    every = (n - 2) / (max_points - 2)
+    indices = np.empty(max_points, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    a = 0  # Point picked in the previous bucket
+    for i in range(max_points - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+
+        # Average of the next bucket is the third corner of the triangle
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+
+    return indices
+
+
+def downsample_series(frame, x, y, max_points):
+    """Rows of a time series frame (sorted by x) chosen by LTTB."""
+    if len(frame) <= max_points:
+        return frame
+    frame = frame.sort_values(x)
+    return frame.iloc[lttb(frame[x].values, frame[y].values, max_points)]
+
+
+def stratified_sample(frame, max_points, stratum='is_fraud', keep=1, random_state=0):
+    """
+    At most max_points rows, keeping every row whose stratum equals keep (fraud
+    points are rare and the ones worth seeing) and sampling the rest uniformly.
+    Every other stratum keeps at least one row, even when the kept rows alone
+    would fill max_points.
+    """
+    if len(frame) <= max_points:
+        return frame
+    kept_mask = frame[stratum] == keep
+
+    # Other rows in random order, with the first row of each stratum up front
+    others = frame[~kept_mask].sample(frac=1, random_state=random_state)
+    first_of_stratum = ~others[stratum].duplicated()
+    others = pd.concat([others[first_of_stratum], others[~first_of_stratum]])
+
+    kept = frame[kept_mask]
+    n_kept = min(len(kept), max(max_points - int(first_of_stratum.sum()), 0))
+    if n_kept < len(kept):
+        kept = kept.sample(n_kept, random_state=random_state)
+    return pd.concat([kept, others.iloc[:max_points - n_kept]]).sort_index()
+
+
+def grid_bin(frame, max_points, lat='latitude', lon='longitude'):
+    """
+    Collapses points into at most max_points grid cells over the data's bounding box.
+    :return: One row per non-empty cell: mean lat/lon and the number of points in it.
+    """
+    points = frame[[lat, lon]].dropna()
+    if len(points) <= max_points:
+        return points.assign(count=1)
+
+    cells = max(int(np.sqrt(max_points)), 1)  # Per axis
+    lat_values, lon_values = points[lat].values, points[lon].values
+    lat_span = max(lat_values.max() - lat_values.min(), 1e-9)
+    lon_span = max(lon_values.max() - lon_values.min(), 1e-9)
+    row = np.minimum(((lat_values - lat_values.min()) / lat_span * cells).astype(np.int64), cells - 1)
+    col = np.minimum(((lon_values - lon_values.min()) / lon_span * cells).astype(np.int64), cells - 1)
+
+    binned = points.groupby(row * cells + col).agg(**{
+        lat: (lat, 'mean'),
+        lon: (lon, 'mean'),
+        'count': (lat, 'size'),
+    })
+    return binned.reset_index(drop=True)
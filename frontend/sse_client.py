@@ -0,0 +1,85 @@
+import json
+import threading
+import time
+from collections import deque
+
+import requests
+
+
+class SSEConsumer:
+    """
+    Reads the backend's /stream of scored transactions on a background thread.
+
+    Each dashboard rerun calls drain() to take everything received since the last
+    one. If the server reported lag, the local buffer overflowed or the connection
+    dropped, drain() says so and the caller should reload /transactions to resync.
+    """
+
+    def __init__(self, url, max_buffer=10_000, reconnect_delay=2.0):
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self._events = deque(maxlen=max_buffer)
+        self._lock = threading.Lock()
+        self._lagged = False
+        self._stopped = threading.Event()
+        self.connected = False
+
+        self._thread = threading.Thread(target=self._run, name="sse-consumer", daemon=True)
+        self._thread.start()
+
+    def drain(self):
+        """:return: (transactions received since the last call, whether any were lost)."""
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+            lagged, self._lagged = self._lagged, False
+        return events, lagged
+
+    def close(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                with requests.get(self.url, stream=True, timeout=(5, 60)) as response:
+                    response.raise_for_status()
+                    self.connected = True
+                    self._read(response)
+            except requests.RequestException:
+                pass
+
+            # Anything sent while we were disconnected is missing
+            self.connected = False
+            with self._lock:
+                self._lagged = True
+            self._stopped.wait(self.reconnect_delay)
+
+    def _read(self, response):
+        event_type, data = "message", []
+        for line in response.iter_lines(decode_unicode=True):
+            if self._stopped.is_set():
+                return
+            if line:
+                if line.startswith(":"):
+                    continue  # Keep-alive comment
+                field, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field == "event":
+                    event_type = value
+                elif field == "data":
+                    data.append(value)
+                continue
+
+            # A blank line ends the event
+            if data:
+                self._dispatch(event_type, "\n".join(data))
+            event_type, data = "message", []
+
+    def _dispatch(self, event_type, data):
+        with self._lock:
+            if event_type == "transaction":
+                if len(self._events) == self._events.maxlen:
+                    self._lagged = True
+                self._events.append(json.loads(data))
+            elif event_type == "lag":
+                self._lagged = True
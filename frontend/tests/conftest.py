@@ -0,0 +1,8 @@
+"""
+Run from the frontend directory:
+    python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
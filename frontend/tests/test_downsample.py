@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsample import downsample_series, grid_bin, lttb, stratified_sample
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    x = pd.date_range("2020-06-21", periods=5000, freq="min").values
+    return x, np.cumsum(rng.normal(size=len(x)))
+
+
+@pytest.mark.parametrize("max_points", [3, 100, 4999])
+def test_lttb_keeps_ends_and_extremes(series, max_points):
+    x, y = series
+    indices = lttb(x, y, max_points)
+    assert len(indices) == max_points
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert np.all(np.diff(indices) > 0)
+    if max_points >= 100:
+        assert {int(np.argmax(y)), int(np.argmin(y))} <= set(indices.tolist())
+
+
+@pytest.mark.parametrize("max_points", [5000, 10_000])
+def test_lttb_returns_short_input_unchanged(series, max_points):
+    x, y = series
+    assert np.array_equal(lttb(x, y, max_points), np.arange(len(x)))
+    frame = pd.DataFrame({"t": x, "amt": y})
+    assert downsample_series(frame, "t", "amt", max_points) is frame
+
+
+def test_lttb_skips_missing_points(series):
+    x, y = series
+    y = y.copy()
+    y[[0, 10, 2000, len(y) - 1]] = np.nan
+    x = x.copy()
+    x[50] = np.datetime64("NaT")
+    indices = lttb(x, y, 200)
+    assert len(indices) == 200
+    assert not np.isnan(y[indices]).any() and not np.isnat(x[indices]).any()
+    # The first and last points that have values
+    assert indices[0] == 1 and indices[-1] == len(y) - 2
+
+
+@pytest.fixture
+def transactions():
+    rng = np.random.default_rng(1)
+    n = 10_000
+    return pd.DataFrame({
+        "is_fraud": (rng.random(n) < 0.01).astype(int),
+        "latitude": rng.uniform(25, 49, n),
+        "longitude": rng.uniform(-124, -67, n),
+    })
+
+
+def test_stratified_sample_keeps_every_fraud(transactions):
+    sample = stratified_sample(transactions, 500)
+    assert len(sample) == 500 and sample.index.is_monotonic_increasing
+    assert sample["is_fraud"].sum() == transactions["is_fraud"].sum()
+    assert stratified_sample(transactions, len(transactions)) is transactions
+
+
+def test_stratified_sample_keeps_every_stratum(transactions):
+    # More fraud rows than max_points, and two rare strata besides the legitimate rows
+    strata = np.where(transactions.index % 50 == 0, 1, np.where(transactions.index % 1000 == 1, 2, 0))
+    frame = transactions.assign(is_fraud=strata.astype(float))
+    frame.loc[3, "is_fraud"] = np.nan
+    sample = stratified_sample(frame, 50)
+    assert len(sample) == 50
+    assert sample["is_fraud"].fillna(-1).value_counts().to_dict() == {1: 47, 0: 1, 2: 1, -1: 1}
+
+
+def test_grid_bin_preserves_points(transactions):
+    frame = transactions.copy()
+    frame.loc[:9, "latitude"] = np.nan
+    binned = grid_bin(frame, 100)
+    assert len(binned) <= 100
+    assert binned["count"].sum() == len(frame) - 10
+    assert binned["latitude"].between(25, 49).all() and binned["longitude"].between(-124, -67).all()
+
+    small = grid_bin(frame.iloc[:50], 100)
+    assert len(small) == 40 and (small["count"] == 1).all()
@@ -0,0 +1,409 @@
+"""
+Seeded synthetic transaction generator in the Kaggle fraudTrain.csv schema.
+
+Every card has a home, a spending profile (transaction rate, preferred categories
+and merchants, typical amount) and produces a Poisson stream of transactions over
+the simulated period. Fraud arrives the way it does in the Kaggle data: a card is
+compromised and shows a short burst of larger, mostly online or late-night
+purchases. The overall fraud rate is configurable.
+
+Rows are generated a time window at a time, in time order, and written chunk by
+chunk, so memory stays flat however many rows are requested. The same seed and
+settings always produce the same file.
+
+transaction_payloads() yields the same transactions as API payloads instead, for
+scripts/load_generator.py and backend/benchmarks/suite.py.
+
+Examples:
+    python generate_transactions.py ../data/fraudTrain.csv --rows 1300000
+    python generate_transactions.py ../data/fraudTest.csv --rows 550000 --seed 2 --start 2020-06-21
+    python generate_transactions.py ../data/big.jsonl --rows 10000000 --fraud-rate 0.01
+    python generate_transactions.py ../data/big.parquet --rows 10000000
+    python generate_transactions.py ../data/transactions.json --rows 20000 --split-fraud
+
+The format follows the extension: .csv, .jsonl/.ndjson, .json (one array) or
+.parquet (needs pyarrow). --split-fraud writes fraud_<name> and non_fraud_<name>
+instead. From ../data/transactions.json these are fraud_transactions.json and
+non_fraud_transactions.json, the files real_time_data.py reads. insert_historical_data.py
+reads ../data/fraud.json and non_fraud.json by default; pass it the two files instead:
+    python insert_historical_data.py ../data/fraud_transactions.json ../data/non_fraud_transactions.json
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.csv
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Kaggle column order; the unnamed first column is the row index
+COLUMNS = ["trans_date_trans_time", "cc_num", "merchant", "category", "amt", "first", "last",
+           "gender", "street", "city", "state", "zip", "lat", "long", "city_pop", "job", "dob",
+           "trans_num", "unix_time", "merch_lat", "merch_long", "is_fraud"]
+
+# Category -> (share of legitimate spend, median amount)
+CATEGORIES = {
+    "gas_transport": (0.10, 60), "grocery_pos": (0.09, 100), "home": (0.09, 50),
+    "shopping_pos": (0.09, 70), "kids_pets": (0.09, 45), "shopping_net": (0.08, 60),
+    "entertainment": (0.07, 50), "food_dining": (0.07, 35), "personal_care": (0.07, 30),
+    "health_fitness": (0.07, 50), "misc_pos": (0.06, 40), "misc_net": (0.05, 40),
+    "grocery_net": (0.04, 50), "travel": (0.03, 20),
+}
+# Fraudulent bursts favour these categories, with much larger amounts
+FRAUD_CATEGORIES = {"shopping_net": (0.25, 900), "grocery_pos": (0.25, 310), "misc_net": (0.15, 800),
+                    "shopping_pos": (0.15, 870), "gas_transport": (0.10, 12), "misc_pos": (0.10, 220)}
+
+CITIES = [  # (city, state, lat, long, population)
+    ("New York", "NY", 40.71, -74.01, 8_336_817), ("Los Angeles", "CA", 34.05, -118.24, 3_979_576),
+    ("Houston", "TX", 29.76, -95.37, 2_320_268), ("Phoenix", "AZ", 33.45, -112.07, 1_680_992),
+    ("Philadelphia", "PA", 39.95, -75.17, 1_584_064), ("Columbus", "OH", 39.96, -83.00, 898_553),
+    ("Denver", "CO", 39.74, -104.99, 727_211), ("Nashville", "TN", 36.16, -86.78, 670_820),
+    ("Portland", "OR", 45.52, -122.68, 654_741), ("Omaha", "NE", 41.26, -95.93, 478_192),
+    ("Tulsa", "OK", 36.15, -95.99, 401_190), ("Des Moines", "IA", 41.59, -93.62, 214_237),
+    ("Burlington", "VT", 44.48, -73.21, 42_819), ("Helena", "MT", 46.59, -112.04, 32_091),
+    ("Moab", "UT", 38.57, -109.55, 5_366), ("Westfir", "OR", 43.76, -122.49, 253),
+    ("Grand Ridge", "FL", 30.71, -85.02, 892), ("Sutton", "AK", 61.71, -148.89, 1_355),
+    ("Bradley", "SC", 34.05, -82.24, 141), ("Elmira", "NY", 42.09, -76.81, 27_054),
+]
+FIRST_NAMES = {"F": ["Jennifer", "Mary", "Linda", "Patricia", "Susan", "Jessica", "Ashley", "Amanda"],
+               "M": ["Christopher", "Robert", "Michael", "David", "James", "John", "William", "Daniel"]}
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+              "Rodriguez", "Martinez", "Wilson", "Anderson", "Thomas", "Moore", "Martin", "Lee"]
+STREET_NAMES = ["Oak", "Maple", "Cedar", "Pine", "Elm", "Washington", "Lake", "Hill", "Park", "River"]
+STREET_TYPES = ["Street", "Avenue", "Road", "Lane", "Drive", "Court"]
+JOBS = ["Nurse, adult", "Engineer, civil", "Teacher, primary school", "Accountant, chartered",
+        "Film/video editor", "Exploration geologist", "Therapist, occupational", "Surveyor, land",
+        "Designer, furniture", "IT trainer", "Paramedic", "Librarian, public"]
+MERCHANT_WORDS = ["Rippin", "Kub", "Mann", "Heller", "Gutmann", "Zieme", "Lind", "Buckridge",
+                  "Kiehn", "Emmerich", "Schoen", "Haley", "Kutch", "Hermann", "Cormier", "Bins"]
+MERCHANTS_PER_CATEGORY = 50
+FAVOURITE_MERCHANTS = 6
+
+BURST_SIZE = 8  # Mean fraudulent transactions per compromised card
+BURST_GAP = 1800  # Mean seconds between them
+
+
+class CardPopulation:
+    """Static per-card attributes, drawn once from the seed."""
+
+    def __init__(self, n_cards, rng):
+        self.n = n_cards
+        self.cc_num = rng.integers(10 ** 11, 10 ** 16, size=n_cards)
+        self.gender = rng.choice(["F", "M"], size=n_cards)
+        self.first = np.array([rng.choice(FIRST_NAMES[g]) for g in self.gender])
+        self.last = rng.choice(LAST_NAMES, size=n_cards)
+        self.street = np.array([f"{rng.integers(1, 9999)} {rng.choice(STREET_NAMES)} {rng.choice(STREET_TYPES)}"
+                                for _ in range(n_cards)])
+        self.zip = rng.integers(1001, 99950, size=n_cards)
+        self.job = rng.choice(JOBS, size=n_cards)
+        birth = rng.integers(np.datetime64("1930-01-01").astype(int), np.datetime64("2004-12-31").astype(int),
+                             size=n_cards).astype("datetime64[D]")
+        self.dob = np.datetime_as_string(birth)
+
+        home = rng.integers(0, len(CITIES), size=n_cards)
+        self.city = np.array([CITIES[i][0] for i in home])
+        self.state = np.array([CITIES[i][1] for i in home])
+        self.lat = np.round(np.array([CITIES[i][2] for i in home]) + rng.normal(0, 0.3, n_cards), 4)
+        self.long = np.round(np.array([CITIES[i][3] for i in home]) + rng.normal(0, 0.3, n_cards), 4)
+        self.city_pop = np.array([CITIES[i][4] for i in home])
+
+        # Spending profile: heavy-tailed activity, own category mix, favourite merchants
+        self.activity = rng.lognormal(0, 0.8, n_cards)
+        self.activity /= self.activity.sum()
+        shares = np.array([share for share, _ in CATEGORIES.values()])
+        self.category_weights = rng.dirichlet(shares * 20, size=n_cards)
+        self.amount_scale = rng.lognormal(0, 0.3, n_cards)
+        self.favourites = rng.integers(0, MERCHANTS_PER_CATEGORY, size=(n_cards, len(CATEGORIES), FAVOURITE_MERCHANTS))
+
+
+def merchant_names(rng):
+    """Kaggle-style merchant names ("fraud_Rippin, Kub and Mann"), a fixed pool per category."""
+    names = {}
+    for category in list(CATEGORIES):
+        words = rng.choice(MERCHANT_WORDS, size=(MERCHANTS_PER_CATEGORY, 3))
+        names[category] = np.array([f"fraud_{a}, {b} and {c}" if i % 2 else f"fraud_{a}-{b}"
+                                    for i, (a, b, c) in enumerate(words)])
+    return names
+
+
+def _weighted_choice(rng, weights):
+    """One index per row of a (rows, options) weight matrix."""
+    cumulative = np.cumsum(weights, axis=1)
+    draws = rng.random(len(weights)) * cumulative[:, -1]
+    return (cumulative < draws[:, None]).sum(axis=1)
+
+
+def _time_of_day_shift(rng, times, night_share):
+    """Moves a share of the timestamps to between 22:00 and 04:00 on the same day."""
+    night = rng.random(len(times)) < night_share
+    day_start = times - times % 86400
+    night_offset = (22 * 3600 + rng.integers(0, 6 * 3600, size=len(times))) % 86400
+    return np.where(night, day_start + night_offset, times)
+
+
+def _datetime_strings(times):
+    """'YYYY-MM-DD HH:MM:SS' for epoch seconds, without a per-row Python call."""
+    text = np.datetime_as_string(times.astype("datetime64[s]"), unit="s").astype("S19")
+    chars = text.view(np.uint8).reshape(len(times), 19).copy()
+    chars[:, 10] = ord(" ")
+    return chars.view("S19").ravel().astype(str)
+
+
+def generate_window(cards, merchants, rng, start, end, legit_per_second, fraud_rate):
+    """All transactions of cards in [start, end) (whole days), in time order."""
+    legit_expected = legit_per_second * (end - start)
+    counts = rng.poisson(cards.activity * legit_expected)
+    card = np.repeat(np.arange(cards.n), counts)
+    # Most legitimate spending happens in the daytime
+    times = _time_of_day_shift(rng, rng.integers(start, end, size=len(card)), night_share=0.15)
+    category = _weighted_choice(rng, cards.category_weights[card])
+    medians = np.array([median for _, median in CATEGORIES.values()])
+    amount = rng.lognormal(np.log(medians[category] * cards.amount_scale[card]), 0.7)
+    merchant = np.where(rng.random(len(card)) < 0.7,
+                        cards.favourites[card, category, rng.integers(0, FAVOURITE_MERCHANTS, size=len(card))],
+                        rng.integers(0, MERCHANTS_PER_CATEGORY, size=len(card)))
+    is_fraud = np.zeros(len(card), dtype=np.int8)
+
+    # Compromised cards: bursts of fraud at exponential gaps from a random start
+    bursts = rng.poisson(fraud_rate / (1 - fraud_rate) * legit_expected / BURST_SIZE)
+    if bursts:
+        sizes = 1 + rng.poisson(BURST_SIZE - 1, size=bursts)
+        fraud_card = np.repeat(rng.integers(0, cards.n, size=bursts), sizes)
+        gaps = rng.exponential(BURST_GAP, size=len(fraud_card)).astype(np.int64)
+        elapsed = np.cumsum(gaps)
+        burst_first = np.cumsum(sizes) - sizes
+        elapsed -= np.repeat(elapsed[burst_first] - gaps[burst_first], sizes)  # Restart at each burst
+        fraud_times = np.minimum(np.repeat(rng.integers(start, end, size=bursts), sizes) + elapsed, end - 1)
+
+        fraud_pick = rng.choice(len(FRAUD_CATEGORIES), size=len(fraud_card),
+                                p=[share for share, _ in FRAUD_CATEGORIES.values()])
+        fraud_medians = np.array([median for _, median in FRAUD_CATEGORIES.values()])
+        category_index = np.array([list(CATEGORIES).index(name) for name in FRAUD_CATEGORIES])
+
+        card = np.concatenate([card, fraud_card])
+        times = np.concatenate([times, _time_of_day_shift(rng, fraud_times, night_share=0.6)])
+        category = np.concatenate([category, category_index[fraud_pick]])
+        amount = np.concatenate([amount, rng.lognormal(np.log(fraud_medians[fraud_pick]), 0.4)])
+        merchant = np.concatenate([merchant, rng.integers(0, MERCHANTS_PER_CATEGORY, size=len(fraud_card))])
+        is_fraud = np.concatenate([is_fraud, np.ones(len(fraud_card), dtype=np.int8)])
+
+    order = np.argsort(times, kind="stable")
+    card, times, category = card[order], times[order], category[order]
+    n = len(card)
+    return pd.DataFrame({
+        "trans_date_trans_time": _datetime_strings(times),
+        "cc_num": cards.cc_num[card],
+        "merchant": merchants[category, merchant[order]],
+        "category": np.array(list(CATEGORIES))[category],
+        "amt": np.round(np.maximum(amount[order], 1.0), 2),
+        "first": cards.first[card],
+        "last": cards.last[card],
+        "gender": cards.gender[card],
+        "street": cards.street[card],
+        "city": cards.city[card],
+        "state": cards.state[card],
+        "zip": cards.zip[card],
+        "lat": cards.lat[card],
+        "long": cards.long[card],
+        "city_pop": cards.city_pop[card],
+        "job": cards.job[card],
+        "dob": cards.dob[card],
+        "trans_num": np.frombuffer(rng.bytes(16 * n).hex().encode(), dtype="S32").astype(str),
+        "unix_time": times,
+        "merch_lat": np.round(cards.lat[card] + rng.uniform(-1, 1, n), 6),
+        "merch_long": np.round(cards.long[card] + rng.uniform(-1, 1, n), 6),
+        "is_fraud": is_fraud[order],
+    })
+
+
+# === Writers ===
+class CsvWriter:
+    """
+    Written through pyarrow when it is installed, about ten times faster than pandas.
+    It quotes every string field, which CSV readers parse to the same values.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None if pyarrow else open(path, "w", newline="")
+        self.writer = None
+
+    def write(self, frame):
+        # Kaggle's files start with an unnamed row-number column
+        if pyarrow is None:
+            frame.to_csv(self.file, header=self.writer is None, index=True, index_label="")
+            self.writer = True
+            return
+        table = pyarrow.Table.from_pandas(frame.rename_axis("").reset_index(), preserve_index=False)
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = pyarrow.csv.CSVWriter(self.path, self.schema)
+        self.writer.write_table(table.cast(self.schema))
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        elif self.writer is not None:
+            self.writer.close()
+
+
+class JsonlWriter:
+    def __init__(self, path):
+        self.file = open(path, "w")
+
+    def write(self, frame):
+        if len(frame):
+            self.file.write(frame.to_json(orient="records", lines=True).rstrip("\n") + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class JsonArrayWriter:
+    """One JSON array, the format of the app's fraud/non_fraud files, written chunk by chunk."""
+
+    def __init__(self, path):
+        self.file = open(path, "w")
+        self.file.write("[")
+        self.empty = True
+
+    def write(self, frame):
+        if len(frame):
+            self.file.write(("" if self.empty else ",") + frame.to_json(orient="records")[1:-1])
+            self.empty = False
+
+    def close(self):
+        self.file.write("]")
+        self.file.close()
+
+
+class ParquetWriter:
+    """One row group per chunk."""
+
+    def __init__(self, path):
+        if pyarrow is None:
+            raise SystemExit("❌ Parquet output needs pyarrow: pip install pyarrow")
+        self.path = path
+        self.writer = None
+
+    def write(self, frame):
+        table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table.cast(self.writer.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+WRITERS = {".csv": CsvWriter, ".jsonl": JsonlWriter, ".ndjson": JsonlWriter,
+           ".json": JsonArrayWriter, ".parquet": ParquetWriter}
+
+
+def open_writer(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in WRITERS:
+        raise SystemExit(f"❌ Unknown output format {extension!r}, use one of {', '.join(WRITERS)}")
+    return WRITERS[extension](path)
+
+
+def _simulation(seed, cards, start):
+    """(rng, card population, merchant names per category, first window start) for a seed."""
+    rng = np.random.default_rng(seed)
+    population = CardPopulation(cards, rng)
+    names = merchant_names(rng)
+    merchants = np.stack([names[category] for category in CATEGORIES])
+    window_start = int(datetime.strptime(start, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
+    return rng, population, merchants, window_start
+
+
+def transaction_payloads(seed=42, cards=1000, rows_per_day=2000, fraud_rate=0.0058, start="2019-01-01"):
+    """
+    Endless stream of transactions as /detect_fraud payloads (every column but
+    is_fraud), in time order, generated a simulated day at a time.
+    """
+    rng, population, merchants, window_start = _simulation(seed, cards, start)
+    legit_per_second = rows_per_day * (1 - fraud_rate) / 86400
+    while True:
+        frame = generate_window(population, merchants, rng, window_start, window_start + 86400,
+                                legit_per_second, fraud_rate)
+        window_start += 86400
+        yield from frame.drop(columns="is_fraud").to_dict("records")
+
+
+def generate(path, rows, seed=42, fraud_rate=0.0058, cards=None, start="2019-01-01", days=537,
+             chunk_size=100_000, split_fraud=False):
+    """
+    Writes `rows` transactions to path.
+    :param fraud_rate: Share of fraudulent rows (fraudTrain.csv has 0.58%).
+    :param cards: Number of cards; defaults to one per 1300 rows, as in fraudTrain.csv.
+    :param days: Length of the simulated period the rows are spread over.
+    """
+    rng, population, merchants, window_start = _simulation(seed, cards or max(rows // 1300, 50), start)
+
+    if split_fraud:
+        directory, name = os.path.split(path)
+        writers = {1: open_writer(os.path.join(directory, f"fraud_{name}")),
+                   0: open_writer(os.path.join(directory, f"non_fraud_{name}"))}
+    else:
+        writers = {None: open_writer(path)}
+
+    legit_per_second = rows * (1 - fraud_rate) / (days * 86400)
+    # Whole days per window, sized to produce about chunk_size rows
+    window = max(round(chunk_size / (rows / days)), 1) * 86400
+
+    written = fraud = 0
+    started = time.perf_counter()
+    try:
+        while written < rows:
+            frame = generate_window(population, merchants, rng, window_start, window_start + window,
+                                    legit_per_second, fraud_rate)
+            frame = frame.iloc[:rows - written]
+            frame.index = pd.RangeIndex(written, written + len(frame))
+            window_start += window
+
+            for label, writer in writers.items():
+                writer.write(frame if label is None else frame[frame["is_fraud"] == label])
+            written += len(frame)
+            fraud += int(frame["is_fraud"].sum())
+            print(f"  {written:,} rows ({written / (time.perf_counter() - started):,.0f} rows/s)")
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {written:,} transactions ({fraud:,} fraud, {fraud / max(written, 1):.2%}) written in "
+          f"{elapsed:.1f}s ({written / elapsed:,.0f} rows/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Output file; the extension selects the format")
+    parser.add_argument("--rows", type=int, default=1_296_675, help="Rows to write (default: fraudTrain.csv size)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--fraud-rate", type=float, default=0.0058, help="Share of fraudulent rows")
+    parser.add_argument("--cards", type=int, help="Number of cards (default: one per 1300 rows)")
+    parser.add_argument("--start", default="2019-01-01", help="First day of the simulated period")
+    parser.add_argument("--days", type=int, default=537, help="Length of the simulated period")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="Rows generated and written at a time")
+    parser.add_argument("--split-fraud", action="store_true",
+                        help="Write fraud_<name> and non_fraud_<name> instead of one file "
+                             "(e.g. fraud_transactions.json for real_time_data.py)")
+    args = parser.parse_args()
+
+    if not 0 <= args.fraud_rate < 1:
+        parser.error("--fraud-rate must be in [0, 1)")
+    generate(args.path, args.rows, args.seed, args.fraud_rate, args.cards, args.start, args.days,
+             args.chunk_size, args.split_fraud)
+
+
+if __name__ == "__main__":
+    main()
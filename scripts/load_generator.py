@@ -0,0 +1,332 @@
+"""
+Open-loop load generator for the fraud detection API.
+
+Requests are sent on a fixed arrival schedule whether or not earlier ones have
+returned, so a slow server cannot slow the generator down and hide its own latency
+(coordinated omission). Latency is measured from each request's intended send time
+for every attempt, failed ones included, and separately for successful ones only;
+the pure service time (from the actual send) is reported alongside. Requests dropped
+because the client backlog is full count at the timeout.
+
+Examples (the backend must be running):
+    python load_generator.py --rate 200 --duration 60
+    python load_generator.py --profile "30:10-500,60:500,15:500-0" --concurrency 128
+    python load_generator.py --mode batch --batch-size 64 --rate 20 --json-out run.json
+
+A profile is a comma-separated list of DURATION:RATE (constant) or
+DURATION:START-END (linear ramp) stages, in seconds and requests per second.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+import uuid
+from collections import Counter
+
+import aiohttp
+from dotenv import load_dotenv
+
+from generate_transactions import transaction_payloads
+
+load_dotenv()
+
+PERCENTILES = [50, 75, 90, 95, 99, 99.9, 99.99, 100]
+
+
+class LatencyHistogram:
+    """
+    HdrHistogram-style log-linear histogram of microsecond values: every power of two
+    is split into 2**sub_bucket_bits linear sub-buckets, so any recorded value is
+    reported within 1/2**sub_bucket_bits of its true value, in constant memory.
+    """
+
+    def __init__(self, sub_bucket_bits=7, max_exponent=40):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts = [0] * ((max_exponent + 1) << sub_bucket_bits)
+        self.total = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0
+
+    def _index(self, value):
+        exponent = value.bit_length() - 1
+        if exponent < self.sub_bucket_bits:
+            return value  # Small values are exact
+        sub_bucket = (value >> (exponent - self.sub_bucket_bits)) & ((1 << self.sub_bucket_bits) - 1)
+        return (exponent << self.sub_bucket_bits) + sub_bucket
+
+    def _highest_equivalent(self, index):
+        """Largest value that falls in the bucket (what HdrHistogram reports)."""
+        if index < (1 << self.sub_bucket_bits):
+            return index
+        exponent = index >> self.sub_bucket_bits
+        sub_bucket = index & ((1 << self.sub_bucket_bits) - 1)
+        width = 1 << (exponent - self.sub_bucket_bits)
+        return (1 << exponent) + sub_bucket * width + width - 1
+
+    def record(self, micros):
+        value = max(int(micros), 1)
+        self.counts[min(self._index(value), len(self.counts) - 1)] += 1
+        self.total += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, percentile):
+        if not self.total:
+            return 0
+        if percentile >= 100:
+            return self.max
+        target = max(math.ceil(percentile / 100 * self.total), 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max)
+        return self.max
+
+    def buckets(self):
+        """Non-empty buckets as [highest equivalent value in us, count]."""
+        return [[self._highest_equivalent(index), count] for index, count in enumerate(self.counts) if count]
+
+    def summary(self):
+        """Percentiles, mean and max in milliseconds."""
+        result = {f"p{p:g}": self.percentile(p) / 1000 for p in PERCENTILES if p < 100}
+        result["max"] = self.max / 1000
+        result["mean"] = self.sum / self.total / 1000 if self.total else 0
+        return result
+
+
+def parse_profile(profile):
+    """'30:10-200,60:200' -> [(30.0, 10.0, 200.0), (60.0, 200.0, 200.0)]"""
+    stages = []
+    for stage in profile.split(","):
+        duration, rates = stage.strip().split(":")
+        start, _, end = rates.partition("-")
+        stages.append((float(duration), float(start), float(end or start)))
+    return stages
+
+
+def arrival_times(stages):
+    """
+    Intended send offsets (seconds from the start) for piecewise-linear rate stages.
+    The k-th request of a stage is sent when the expected arrival count
+    start_rate * t + (end_rate - start_rate) * t**2 / (2 * duration) reaches k.
+    """
+    stage_start = 0.0
+    for duration, start_rate, end_rate in stages:
+        a = (end_rate - start_rate) / (2 * duration)
+        k = 0
+        while True:
+            if a == 0:
+                if start_rate <= 0:
+                    break
+                t = k / start_rate
+            else:
+                discriminant = start_rate ** 2 + 4 * a * k
+                if discriminant < 0:
+                    break  # A ramp down has sent all it will
+                t = (-start_rate + math.sqrt(discriminant)) / (2 * a)
+            if t >= duration:
+                break
+            yield stage_start + t
+            k += 1
+        stage_start += duration
+
+
+def synthetic_transactions(run_id, cards=1000, seed=0):
+    """
+    Endless stream of payloads from generate_transactions.py, with unique trans_nums
+    and the current time as transaction time.
+    """
+    sequence = 0
+    for transaction in transaction_payloads(seed, cards):
+        now = int(time.time())
+        yield dict(transaction, trans_num=f"lg-{run_id}-{sequence}", unix_time=now,
+                   trans_date_trans_time=time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(now)))
+        sequence += 1
+
+
+def file_transactions(path, run_id):
+    """Cycles through a JSON array or JSONL file, making trans_nums unique per send."""
+    with open(path) as f:
+        transactions = [json.loads(line) for line in f if line.strip()] if path.endswith(".jsonl") else json.load(f)
+    sequence = 0
+    while True:
+        for transaction in transactions:
+            yield dict(transaction, trans_num=f"{transaction.get('trans_num', 'lg')}-{run_id}-{sequence}")
+            sequence += 1
+
+
+class LoadStats:
+    def __init__(self):
+        self.response_time = LatencyHistogram()  # From the intended send time, every attempt
+        self.ok_response_time = LatencyHistogram()  # From the intended send time, successes only
+        self.service_time = LatencyHistogram()  # From the actual send time, successes only
+        self.errors = Counter()
+        self.sent = 0
+        self.ok = 0
+        self.transactions_ok = 0
+        self.row_errors = 0
+        self.max_dispatch_lag = 0.0
+
+
+async def send(session, url, payload, intended, stats, loop):
+    sent = loop.time()
+    try:
+        async with session.post(url, json=payload) as response:
+            body = await response.read()
+            status = response.status
+    except asyncio.TimeoutError:
+        error = "timeout"
+    except aiohttp.ClientError as e:
+        error = type(e).__name__
+    else:
+        error = None if status == 200 else f"HTTP {status}"
+
+    # Failures count too: leaving them out would hide the slowest requests
+    done = loop.time()
+    stats.response_time.record((done - intended) * 1e6)
+    if error is not None:
+        stats.errors[error] += 1
+        return
+
+    stats.ok += 1
+    stats.ok_response_time.record((done - intended) * 1e6)
+    stats.service_time.record((done - sent) * 1e6)
+    if isinstance(payload, list):
+        result = json.loads(body)
+        stats.row_errors += result.get("failed", 0)
+        stats.transactions_ok += result.get("inserted", 0)
+    else:
+        stats.transactions_ok += 1
+
+
+async def run(url, stages, payloads, concurrency, timeout, max_backlog):
+    """Fires requests on schedule; at most `concurrency` are on the wire, the rest wait (and count)."""
+    stats = LoadStats()
+    loop = asyncio.get_running_loop()
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    in_flight = set()
+
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        start = loop.time()
+        for offset in arrival_times(stages):
+            intended = start + offset
+            delay = intended - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                stats.max_dispatch_lag = max(stats.max_dispatch_lag, -delay)
+
+            stats.sent += 1
+            if len(in_flight) >= max_backlog:
+                stats.errors["client backlog full"] += 1  # Not sent; the server is far behind
+                stats.response_time.record(timeout * 1e6)
+                continue
+            task = asyncio.create_task(send(session, url, next(payloads), intended, stats, loop))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        if in_flight:
+            await asyncio.wait(in_flight)
+        elapsed = loop.time() - start
+
+    return stats, elapsed
+
+
+def print_histogram(title, histogram):
+    print(f"\n{title}")
+    print(f"  {'Percentile':>10}  {'Value (ms)':>11}  {'1/(1-p)':>9}")
+    for percentile in PERCENTILES:
+        inverse = "inf" if percentile >= 100 else f"{1 / (1 - percentile / 100):,.0f}"
+        print(f"  {percentile:>9g}%  {histogram.percentile(percentile) / 1000:>11.3f}  {inverse:>9}")
+    if histogram.total:
+        print(f"  mean {histogram.sum / histogram.total / 1000:.3f} ms, {histogram.total} samples")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("API_URL", "http://localhost:5000/detect_fraud"),
+                        help="The /detect_fraud endpoint (batch mode posts to <url>/batch)")
+    parser.add_argument("--mode", choices=["single", "batch"], default="single")
+    parser.add_argument("--batch-size", type=int, default=32, help="Transactions per request in batch mode")
+    parser.add_argument("--rate", type=float, default=50, help="Requests per second (without --profile)")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds (without --profile)")
+    parser.add_argument("--profile", help="Ramp profile, e.g. '30:10-200,60:200'")
+    parser.add_argument("--concurrency", type=int, default=64, help="Maximum open connections")
+    parser.add_argument("--max-backlog", type=int, default=10_000,
+                        help="Requests waiting for a connection before new ones are dropped")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds")
+    parser.add_argument("--input", help="JSON array or JSONL file of transactions (default: synthetic)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json-out", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    stages = parse_profile(args.profile) if args.profile else [(args.duration, args.rate, args.rate)]
+    run_id = uuid.uuid4().hex[:8]
+    transactions = file_transactions(args.input, run_id) if args.input else synthetic_transactions(run_id, seed=args.seed)
+
+    if args.mode == "batch":
+        url = f"{args.url.rstrip('/')}/batch"
+        payloads = ([next(transactions) for _ in range(args.batch_size)] for _ in iter(int, 1))
+    else:
+        url = args.url
+        payloads = transactions
+
+    planned = sum(duration * (start + end) / 2 for duration, start, end in stages)
+    print(f"Sending ~{planned:,.0f} requests to {url} over {sum(stage[0] for stage in stages):g}s "
+          f"(concurrency {args.concurrency})")
+
+    stats, elapsed = asyncio.run(run(url, stages, payloads, args.concurrency, args.timeout, args.max_backlog))
+
+    errors = sum(stats.errors.values())
+    achieved_rps = stats.ok / elapsed if elapsed else 0
+    print(f"\nRequests: {stats.sent} scheduled, {stats.ok} ok, {errors} failed in {elapsed:.1f}s")
+    print(f"Achieved: {achieved_rps:,.1f} req/s ({stats.transactions_ok / elapsed:,.1f} transactions/s), "
+          f"target {stats.sent / elapsed:,.1f} req/s")
+    if stats.max_dispatch_lag > 0.01:
+        print(f"⚠️ The generator fell up to {stats.max_dispatch_lag * 1000:.0f} ms behind schedule; "
+              f"results understate the target rate")
+
+    print_histogram("Response time (from intended send, corrected for coordinated omission; every attempt)",
+                    stats.response_time)
+    print_histogram("Response time of successful requests (from intended send)", stats.ok_response_time)
+    print_histogram("Service time of successful requests (from actual send)", stats.service_time)
+
+    if stats.errors or stats.row_errors:
+        print("\nErrors:")
+        for kind, count in stats.errors.most_common():
+            print(f"  {kind}: {count}")
+        if stats.row_errors:
+            print(f"  rows rejected inside batches: {stats.row_errors}")
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({
+                "config": vars(args) | {"stages": stages, "url": url},
+                "elapsed_s": elapsed,
+                "requests": {"scheduled": stats.sent, "ok": stats.ok, "failed": errors},
+                "achieved_rps": achieved_rps,
+                "transactions_per_s": stats.transactions_ok / elapsed if elapsed else 0,
+                "max_dispatch_lag_ms": stats.max_dispatch_lag * 1000,
+                "latency_ms": {
+                    "response_time": stats.response_time.summary(),
+                    "ok_response_time": stats.ok_response_time.summary(),
+                    "service_time": stats.service_time.summary(),
+                },
+                "errors": dict(stats.errors),
+                "row_errors": stats.row_errors,
+                "histogram_us": {
+                    "response_time": stats.response_time.buckets(),
+                    "ok_response_time": stats.ok_response_time.buckets(),
+                    "service_time": stats.service_time.buckets(),
+                },
+            }, f, indent=2)
+        print(f"\nResults written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()